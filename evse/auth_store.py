@@ -0,0 +1,287 @@
+"""
+Local authorization lists and the authorization cache.
+
+Both are shared by every charger in the process: a fleet gets the same
+SendLocalList from the CSMS for every charger, so it is applied once and
+the other chargers find it already applied. Each charger keeps its own list
+version, and only answers from the shared list while it is at that version.
+A charger that is sent a different list gets a list of its own.
+
+A list can be backed by a file with one line per id tag:
+
+    <id tag>\\t<status>\\t<expiry date>\\t<parent id tag>
+
+and `#version <n>` lines. A full update rewrites the file, a differential
+update appends its entries, a `-` status removes a tag. The file is
+rewritten once the appended lines outnumber the tags in the list.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ocpp.v16.enums import AuthorizationStatus, UpdateStatus, UpdateType
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_SIZE = 10_000
+REMOVED = "-"
+REMEMBERED_UPDATES = 16
+
+
+def update_digest(update_type: UpdateType, entries: List[Dict]) -> str:
+    """Fingerprint of a SendLocalList, to tell if it was applied already."""
+    content = json.dumps([update_type, entries], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class IdTagInfo(NamedTuple):
+    status: str
+    expiry_date: Optional[str] = None
+    parent_id_tag: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, id_tag_info: Dict) -> "IdTagInfo":
+        """From the snake or camel case idTagInfo of a payload."""
+        return cls(
+            id_tag_info["status"],
+            id_tag_info.get("expiry_date", id_tag_info.get("expiryDate")),
+            id_tag_info.get("parent_id_tag", id_tag_info.get("parentIdTag")),
+        )
+
+    def is_valid(self, now: datetime) -> bool:
+        if self.status != AuthorizationStatus.accepted:
+            return False
+        if self.expiry_date is None:
+            return True
+        expiry_date = datetime.fromisoformat(self.expiry_date)
+        if expiry_date.tzinfo is None:
+            expiry_date = expiry_date.replace(tzinfo=timezone.utc)
+        return expiry_date > now
+
+    def as_dict(self) -> Dict:
+        id_tag_info = {"status": self.status}
+        if self.expiry_date is not None:
+            id_tag_info["expiry_date"] = self.expiry_date
+        if self.parent_id_tag is not None:
+            id_tag_info["parent_id_tag"] = self.parent_id_tag
+        return id_tag_info
+
+
+class LocalAuthList:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.version = 0
+        self._tags: Dict[str, IdTagInfo] = {}
+        self._appended = 0
+        self.updates: OrderedDict[int, Tuple[str, Optional[int]]] = OrderedDict()
+        """updates: digest and base version of the last updates, by version"""
+        if path is not None and path.exists():
+            self.load()
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __contains__(self, id_tag: str):
+        return id_tag in self._tags
+
+    def get(self, id_tag: str) -> Optional[IdTagInfo]:
+        return self._tags.get(id_tag)
+
+    def applied(self, list_version: int, digest: str, base_version: int) -> bool:
+        """Whether this update was applied on top of `base_version` already."""
+        try:
+            applied_digest, applied_base = self.updates[list_version]
+        except KeyError:
+            return False
+        # a full update does not depend on what the list held before
+        return applied_digest == digest and applied_base in (None, base_version)
+
+    def update(
+        self,
+        list_version: int,
+        update_type: UpdateType,
+        entries: Iterable[Dict],
+        max_length: Optional[int] = None,
+        digest: Optional[str] = None,
+    ) -> UpdateStatus:
+        """Apply a SendLocalList with snake case entries."""
+        if list_version < self.version:
+            return UpdateStatus.version_mismatch
+        changes = {
+            entry["id_tag"]: (
+                IdTagInfo.from_dict(entry["id_tag_info"])
+                if entry.get("id_tag_info")
+                else None
+            )
+            for entry in entries
+        }
+        if update_type == UpdateType.full:
+            tags = {tag: info for tag, info in changes.items() if info is not None}
+        else:
+            tags = self._tags.copy()
+            for tag, info in changes.items():
+                if info is None:
+                    tags.pop(tag, None)
+                else:
+                    tags[tag] = info
+        if max_length is not None and len(tags) > max_length:
+            return UpdateStatus.failed
+        self._tags = tags
+        if digest is not None:
+            base_version = None if update_type == UpdateType.full else self.version
+            self.updates[list_version] = (digest, base_version)
+            if len(self.updates) > REMEMBERED_UPDATES:
+                self.updates.popitem(last=False)
+        self.version = list_version
+        if self.path is not None:
+            if update_type == UpdateType.full or self._appended + len(changes) > len(
+                tags
+            ):
+                self._write()
+            else:
+                self._append(changes)
+        return UpdateStatus.accepted
+
+    def load(self):
+        tags: Dict[str, IdTagInfo] = {}
+        version, lines = 0, 0
+        with self.path.open() as file:
+            for line in file:
+                if line.startswith("#version "):
+                    version = int(line[9:])
+                    continue
+                tag, status, expiry_date, parent_id_tag = line.rstrip("\n").split("\t")
+                lines += 1
+                if status == REMOVED:
+                    tags.pop(tag, None)
+                else:
+                    tags[tag] = IdTagInfo(
+                        status, expiry_date or None, parent_id_tag or None
+                    )
+        self._tags, self.version = tags, version
+        self._appended = lines - len(tags)
+        logger.debug(
+            "Loaded %s tags at version %s from %s", len(tags), version, self.path
+        )
+
+    def _write(self):
+        temporary = self.path.with_suffix(".tmp")
+        with temporary.open("w") as file:
+            file.writelines(self._line(tag, info) for tag, info in self._tags.items())
+            file.write(f"#version {self.version}\n")
+        os.replace(temporary, self.path)
+        self._appended = 0
+
+    def _append(self, changes: Dict[str, Optional[IdTagInfo]]):
+        with self.path.open("a") as file:
+            file.writelines(self._line(tag, info) for tag, info in changes.items())
+            file.write(f"#version {self.version}\n")
+        self._appended += len(changes)
+
+    @staticmethod
+    def _line(tag: str, info: Optional[IdTagInfo]) -> str:
+        if info is None:
+            return f"{tag}\t{REMOVED}\t\t\n"
+        return f"{tag}\t{info.status}\t{info.expiry_date or ''}\t{info.parent_id_tag or ''}\n"
+
+
+class AuthorizationCache:
+    """idTagInfo of recently authorized tags, least recently used out first."""
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._tags: OrderedDict[str, IdTagInfo] = OrderedDict()
+
+    def __len__(self):
+        return len(self._tags)
+
+    def get(self, id_tag: str) -> Optional[IdTagInfo]:
+        info = self._tags.get(id_tag)
+        if info is not None:
+            self._tags.move_to_end(id_tag)
+        return info
+
+    def put(self, id_tag: str, id_tag_info: Dict):
+        self._tags[id_tag] = IdTagInfo.from_dict(id_tag_info)
+        self._tags.move_to_end(id_tag)
+        if len(self._tags) > self.max_size:
+            self._tags.popitem(last=False)
+
+    def clear(self):
+        self._tags.clear()
+
+
+class AuthStore:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory) if directory else None
+        self.lists: Dict[str, LocalAuthList] = {}
+        self.cache = AuthorizationCache()
+        self.local_hits = 0
+        self.remote_lookups = 0
+
+    def list(self, name: str = "default") -> LocalAuthList:
+        try:
+            return self.lists[name]
+        except KeyError:
+            pass
+        path = None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{name}.authlist"
+        local_list = self.lists[name] = LocalAuthList(path)
+        return local_list
+
+    def apply(
+        self,
+        local_list: LocalAuthList,
+        version: int,
+        owner: str,
+        list_version: int,
+        update_type: UpdateType,
+        entries: List[Dict],
+        max_length: Optional[int] = None,
+    ) -> Tuple[UpdateStatus, LocalAuthList]:
+        """
+        Apply a SendLocalList for a charger at `version` of `local_list`.
+
+        Returns the status and the list the charger uses from now on: the
+        shared list when the update is the one it holds already or moves it
+        on from the charger's version, otherwise a list of the `owner`.
+        """
+        digest = update_digest(update_type, entries)
+        if local_list.applied(list_version, digest, version):
+            logger.debug("Local list version %s was applied already", list_version)
+            return UpdateStatus.accepted, local_list
+        own_list = self.lists.get(owner)
+        if local_list is not own_list and (
+            version != local_list.version or list_version <= local_list.version
+        ):
+            if list_version < version:
+                return UpdateStatus.version_mismatch, local_list
+            if update_type == UpdateType.differential:
+                # the shared list does not hold what this charger was sent
+                return UpdateStatus.failed, local_list
+            local_list = self.list(owner)
+        status = local_list.update(
+            list_version, update_type, entries, max_length, digest=digest
+        )
+        return status, local_list
+
+    def stats(self) -> Dict:
+        return {
+            "lists": {
+                name: {"version": local_list.version, "size": len(local_list)}
+                for name, local_list in self.lists.items()
+            },
+            "cache_size": len(self.cache),
+            "local_hits": self.local_hits,
+            "remote_lookups": self.remote_lookups,
+        }
+
+
+store = AuthStore(os.getenv("EVSE_AUTH_LIST_DIR"))
@@ -0,0 +1,66 @@
+"""
+Actions per second driven through `client.FleetClient`, in the same process
+as the chargers and an in-process CSMS, with no HTTP in between.
+
+Every charger sends its MeterValues one after the other, and waits for each
+CallResult, while all chargers run at once.
+
+Run from the `evse` directory:
+
+    $ python -m benchmarks.bench_client --chargers 100 --actions 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from client import ChargerClient, FleetClient
+from ocpp.v16.enums import Action
+from websockets.server import serve
+
+
+async def csms(websocket):
+    async for message in websocket:
+        frame = json.loads(message)
+        if frame[0] == 2:
+            await websocket.send(json.dumps([3, frame[1], {}]))
+
+
+async def measure(chargers: int, actions: int, compression: str) -> float:
+    async with serve(
+        csms, "127.0.0.1", 0, subprotocols=["ocpp1.6"], compression=None
+    ) as server:
+        url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        fleet = FleetClient(
+            ChargerClient.create(f"bench-{i}", 1, "password") for i in range(chargers)
+        )
+        failures = await fleet.connect(url, compression)
+        if failures:
+            raise RuntimeError(f"{len(failures)} chargers failed to connect")
+
+        async def drive(client: ChargerClient):
+            for current in range(actions):
+                await client.send(Action.MeterValues, connector_id=1, current=current)
+
+        start = time.perf_counter()
+        await fleet.map(drive)
+        elapsed = time.perf_counter() - start
+        await fleet.close()
+    return chargers * actions / elapsed
+
+
+if __name__ == "__main__":
+    import connections
+    import log_config
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chargers", type=int, default=100)
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--compression", default="off")
+    args = parser.parse_args()
+    log_config.configure(log_config.LogMode.off)
+    connections.dialer.configure(
+        rate=10_000, burst=args.chargers, concurrency=args.chargers
+    )
+    rate = asyncio.run(measure(args.chargers, args.actions, args.compression))
+    print(f"{rate:.0f} actions/s")
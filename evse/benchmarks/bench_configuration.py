@@ -0,0 +1,48 @@
+"""
+Cost of replying to a GetConfiguration for all keys, with and without the
+serialized payload each charger keeps, and the memory it keeps per charger.
+
+Run from the `evse` directory:
+
+    $ python -m benchmarks.bench_configuration
+"""
+import sys
+import time
+
+from configuration import ConfigurationRegistry
+from frames import SerializedPayload
+from handler import ChargerHandler
+from ocpp.messages import Call
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action
+
+REPLIES = 20_000
+
+
+def full_path(handler: ChargerHandler, configuration: ConfigurationRegistry, msg):
+    entries, _ = configuration.get_configuration()
+    payload = call_result.GetConfigurationPayload(configuration_key=entries)
+    return handler.prepare_response(msg, payload).to_json()
+
+
+def cached(handler: ChargerHandler, configuration: ConfigurationRegistry, msg):
+    payload = SerializedPayload(configuration.serialized_configuration())
+    return handler.prepare_response(msg, payload).to_json()
+
+
+if __name__ == "__main__":
+    import log_config
+
+    log_config.configure(log_config.LogMode.off)
+    handler = ChargerHandler("bench", connection=None)
+    configuration = ConfigurationRegistry()
+    msg = Call("1", Action.GetConfiguration, {})
+    assert full_path(handler, configuration, msg) == cached(handler, configuration, msg)
+    for reply in (full_path, cached):
+        start = time.perf_counter()
+        for _ in range(REPLIES):
+            reply(handler, configuration, msg)
+        elapsed = time.perf_counter() - start
+        print(f"{reply.__name__:<10} {elapsed / REPLIES * 1e6:>7.1f}us per reply")
+    payload = configuration.serialized_configuration()
+    print(f"kept per charger: {sys.getsizeof(payload)} bytes")
@@ -0,0 +1,57 @@
+"""
+Calls per second out of ChargerHandler.create_call, with and without frame
+templates, including what the controller does with each Call before it is
+sent: tracking it in the correlation table and serializing it.
+
+Run from the `evse` directory:
+
+    $ python -m benchmarks.bench_frames
+"""
+import time
+
+from correlation import CorrelationTable
+
+CALLS = 20_000
+
+
+def payloads(handler, count):
+    for i in range(count):
+        match i % 3:
+            case 0:
+                yield handler.create_payload("Heartbeat")
+            case 1:
+                yield handler.create_payload(
+                    "StatusNotification", connector_id=i % 2 + 1, status="Available"
+                )
+            case 2:
+                yield handler.create_payload(
+                    "MeterValues",
+                    connector_id=i % 2 + 1,
+                    transaction_id=i,
+                    voltage=230,
+                    current=i % 32,
+                )
+
+
+def measure(handler, count):
+    batch = list(payloads(handler, count))
+    correlation = CorrelationTable(max_size=count)
+    start = time.perf_counter()
+    for i, payload in enumerate(batch):
+        call = handler.create_call(payload, str(i))
+        correlation.add(call.unique_id, call.action, call)
+        call.to_json()
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import frames
+    import log_config
+    from handler import ChargerHandler
+
+    log_config.configure(log_config.LogMode.off)
+    handler = ChargerHandler("bench", connection=None)
+    frames.templates = frames.FrameTemplates(max_size=0)
+    print(f"full path: {measure(handler, CALLS):.0f} calls/s")
+    frames.templates = frames.FrameTemplates()
+    print(f"templates: {measure(handler, CALLS):.0f} calls/s")
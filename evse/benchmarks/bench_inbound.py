@@ -0,0 +1,94 @@
+"""
+Inbound frames per second through EVSE.incoming_message_handler, streamed
+from a memory-mapped corpus of generated OCPP traffic.
+
+Run from the `evse` directory, with a corpus made by `python -m corpus`:
+
+    $ python -m benchmarks.bench_inbound /tmp/corpus.ndjson
+
+or without one to generate a corpus of valid and invalid frames first.
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+FRAMES = 20_000
+INVALID = 0.05
+
+
+class EndOfFrames(Exception):
+    pass
+
+
+class CorpusConnection:
+    """Connection that receives the frames of a corpus and drops replies."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.closed = False
+        self.sent = 0
+
+    async def recv(self):
+        try:
+            return next(self.frames).decode()
+        except StopIteration:
+            raise EndOfFrames
+
+    async def send(self, message):
+        self.sent += 1
+
+
+async def replay(path: Path):
+    import controller
+    import corpus
+    from handler import ChargerHandler
+
+    charger = controller.EVSE()
+    charger.connection = CorpusConnection(corpus.read_frames(path))
+    charger.handler = ChargerHandler(
+        charger.abstraction.id, charger.connection, responses=charger.responses
+    )
+    start = time.perf_counter()
+    try:
+        await charger.incoming_message_handler()
+    except EndOfFrames:
+        pass
+    elapsed = time.perf_counter() - start
+    return charger, elapsed
+
+
+def main(path: Path):
+    import corpus
+    import log_config
+
+    log_config.configure(log_config.LogMode.off)
+    metadata = corpus.metadata_path(path)
+    frames = sum(1 for _ in corpus.read_frames(path))
+    charger, elapsed = asyncio.run(replay(path))
+    print(f"{frames} frames ({path.stat().st_size} bytes) from {path}")
+    if metadata.exists():
+        print(f"  generated with {metadata.read_text()[:200]}...")
+    print(f"{frames / elapsed:.0f} frames/s")
+    print(f"replies sent: {charger.connection.sent}")
+    print(f"malformed frames: {charger.malformed_frames}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(Path(sys.argv[1]))
+    else:
+        import corpus
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "corpus.ndjson"
+            corpus.write(
+                path,
+                corpus.CorpusGenerator(
+                    invalid=INVALID,
+                    sizes={"SetChargingProfile": 48, "GetConfiguration": 200},
+                ),
+                FRAMES,
+            )
+            main(path)
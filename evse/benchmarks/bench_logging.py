@@ -0,0 +1,87 @@
+"""
+Messages per second through EVSE.incoming_message_handler per logging mode.
+
+Run from the `evse` directory:
+
+    $ python -m benchmarks.bench_logging
+"""
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+MESSAGES = 20_000
+MODES = ["default", "fast", "off"]
+
+
+class EndOfFrames(Exception):
+    pass
+
+
+class ReplayConnection:
+    """Stands in for a websocket, replaying frames and discarding replies."""
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+
+    async def recv(self):
+        try:
+            return next(self.frames)
+        except StopIteration:
+            raise EndOfFrames
+
+    async def send(self, message):
+        pass
+
+
+def frames(count):
+    for i in range(count):
+        yield json.dumps(
+            [
+                2,
+                str(i),
+                "ChangeConfiguration",
+                {"key": "MeterValueSampleInterval", "value": "10"},
+            ]
+        )
+
+
+async def run(count):
+    import controller
+    from handler import ChargerHandler
+
+    charger = controller.EVSE()
+    charger.connection = ReplayConnection(frames(count))
+    charger.handler = ChargerHandler(charger.abstraction.id, charger.connection)
+    start = time.perf_counter()
+    try:
+        await charger.incoming_message_handler()
+    except EndOfFrames:
+        pass
+    return count / (time.perf_counter() - start)
+
+
+def measure(mode):
+    import log_config
+
+    with open(os.devnull, "w") as devnull:
+        sink = log_config.configure(mode, level=logging.INFO, file=devnull)
+        if mode == "default":
+            sys.stdout = devnull
+        rate = asyncio.run(run(MESSAGES))
+        sys.stdout = sys.__stdout__
+        if sink is not None:
+            sink.close(timeout=60)
+    print(f"{mode}: {rate:.0f} messages/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        measure(sys.argv[1])
+    else:
+        # a fresh interpreter per mode, structlog caches its configuration
+        for mode in MODES:
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_logging", mode])
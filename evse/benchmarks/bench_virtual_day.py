@@ -0,0 +1,101 @@
+"""
+A charging day on virtual time, against an in-process CSMS.
+
+Run from the `evse` directory:
+
+    $ python -m benchmarks.bench_virtual_day
+"""
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+
+from ocpp.v16.enums import Action
+from websockets.exceptions import ConnectionClosed
+
+HOURS = 24
+HEARTBEAT_INTERVAL = 300
+
+
+class FakeCSMS:
+    """Accepts everything and counts the Calls it receives."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.received = Counter()
+
+    def response(self, action):
+        match action:
+            case Action.BootNotification:
+                return {
+                    "currentTime": self.clock.timestamp(),
+                    "interval": HEARTBEAT_INTERVAL,
+                    "status": "Accepted",
+                }
+            case Action.Heartbeat:
+                return {"currentTime": self.clock.timestamp()}
+            case Action.StartTransaction:
+                return {"transactionId": 1, "idTagInfo": {"status": "Accepted"}}
+            case Action.Authorize | Action.StopTransaction:
+                return {"idTagInfo": {"status": "Accepted"}}
+        return {}
+
+    async def __call__(self, websocket):
+        try:
+            async for message in websocket:
+                _, unique_id, action, _ = json.loads(message)
+                self.received[action] += 1
+                await websocket.send(json.dumps([3, unique_id, self.response(action)]))
+        except ConnectionClosed:
+            pass
+
+
+async def day(hours):
+    import clock
+    import controller
+    from websockets.server import serve
+
+    virtual_clock = clock.current()
+    csms = FakeCSMS(virtual_clock)
+    async with serve(csms, "127.0.0.1", 0, subprotocols=["ocpp1.6"]) as server:
+        port = server.sockets[0].getsockname()[1]
+        charger = controller.EVSE(clock=virtual_clock)
+        charger.create("virtual", 1, "password")
+        charger.connection = await charger.create_ws_connection(
+            f"ws://127.0.0.1:{port}"
+        )
+        running = asyncio.create_task(charger.run())
+        while charger.handler is None:
+            await asyncio.sleep(0)
+        await charger.send_message_to_backend(
+            Action.BootNotification, charge_point_model="m", charge_point_vendor="v"
+        )
+        await charger.send_message_to_backend(
+            Action.StartTransaction, rfid="tag", connector_id=1, meter_start=0
+        )
+        await asyncio.sleep(hours * 3600)
+        await charger.send_message_to_backend(
+            Action.StopTransaction, connector_id=1, meter_stop=1000
+        )
+        running.cancel()
+        await charger.connection.close()
+    return csms.received
+
+
+if __name__ == "__main__":
+    import clock
+    import log_config
+
+    log_config.configure(log_config.LogMode.off)
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else HOURS
+    virtual_clock = clock.VirtualClock()
+    start = time.perf_counter()
+    # the CSMS is in this process: any reply is readable as soon as it is sent
+    received = clock.run_virtual(
+        day(hours), virtual_clock, real_wait=0, wait_for_replies=False
+    )
+    elapsed = time.perf_counter() - start
+    print(f"{virtual_clock.advanced / 3600:.1f} virtual hours in {elapsed:.1f}s")
+    for action, count in sorted(received.items()):
+        print(f"  {action}: {count}")
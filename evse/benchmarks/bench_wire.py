@@ -0,0 +1,85 @@
+"""
+CPU against bandwidth of each compression profile, on MeterValues.
+
+Frames are the MeterValues Calls of a charger sampling its connectors, sent
+one after the other on a connection, so deflate keeps its context between
+them as it does on a live connection. For each profile, the charger's
+encoding and the CSMS's decoding are timed and the bytes on the wire are
+compared with the raw frames, along with the memory zlib needs for each
+charger's connection.
+
+Run from the `evse` directory:
+
+    $ python -m benchmarks.bench_wire
+"""
+import time
+from typing import List
+
+import wire
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import OP_TEXT, Frame
+
+FRAMES = 5_000
+FLEET = 1_000
+SAMPLE_INTERVAL = 60
+
+
+def meter_values(handler, count) -> List[bytes]:
+    frames = []
+    for i in range(count):
+        payload = handler.create_payload(
+            "MeterValues",
+            connector_id=i % 2 + 1,
+            transaction_id=1000 + i % 2,
+            voltage=228 + i % 5,
+            current=i % 32,
+        )
+        frames.append(handler.create_call(payload, str(i)).to_json().encode())
+    return frames
+
+
+def endpoints(profile: wire.CompressionProfile):
+    """The charger's and the CSMS's end of a connection on `profile`."""
+    client_bits = profile.client_max_window_bits or 15
+    server_bits = profile.server_max_window_bits or 15
+    settings = {"level": profile.level, "memLevel": profile.mem_level}
+    charger = PerMessageDeflate(False, False, server_bits, client_bits, settings)
+    csms = PerMessageDeflate(False, False, client_bits, server_bits)
+    return charger, csms
+
+
+def measure(profile: wire.CompressionProfile, frames: List[bytes]):
+    raw = sum(len(frame) for frame in frames)
+    if not profile.deflate:
+        return raw, raw, 0.0, 0.0
+    charger, csms = endpoints(profile)
+    start = time.process_time()
+    encoded = [charger.encode(Frame(OP_TEXT, frame)) for frame in frames]
+    encoding = time.process_time() - start
+    start = time.process_time()
+    for frame in encoded:
+        csms.decode(frame)
+    decoding = time.process_time() - start
+    return raw, sum(len(frame.data) for frame in encoded), encoding, decoding
+
+
+if __name__ == "__main__":
+    import log_config
+    from handler import ChargerHandler
+
+    log_config.configure(log_config.LogMode.off)
+    frames = meter_values(ChargerHandler("bench", connection=None), FRAMES)
+    print(
+        f"{'profile':<10} {'bytes/msg':>9} {'ratio':>6} {'encode':>9} "
+        f"{'decode':>9} {'memory':>8} {f'kbit/s per {FLEET} chargers':>28}"
+    )
+    for profile in wire.PROFILES.values():
+        raw, sent, encoding, decoding = measure(profile, frames)
+        # one MeterValues per charger every SAMPLE_INTERVAL seconds
+        uplink = sent / len(frames) * FLEET / SAMPLE_INTERVAL * 8 / 1000
+        print(
+            f"{profile.name:<10} {sent / len(frames):>9.1f} {sent / raw:>6.2f} "
+            f"{encoding / len(frames) * 1e6:>7.1f}us "
+            f"{decoding / len(frames) * 1e6:>7.1f}us "
+            f"{profile.memory // 1024:>6}kB {uplink:>28.1f}"
+        )
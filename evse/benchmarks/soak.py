@@ -0,0 +1,362 @@
+"""
+Soak test: a fleet charging for hours against an in-process CSMS, watched
+for anything that keeps growing.
+
+Every `interval` seconds the harness samples the RSS of the process, live
+objects by type, pending asyncio tasks and the size of the structures the
+emulator keeps (history, correlation tables, outbound queues, scheduler,
+transaction index, ...). After a warm-up, each series gets a least squares
+fit: one that is clearly linear and grew by more than `threshold` of where
+it started fails the run.
+
+Run from the `evse` directory, on virtual time by default:
+
+    $ python -m benchmarks.soak --chargers 20 --hours 48
+    $ python -m benchmarks.soak --chargers 5 --hours 0.5 --real-time
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.bench_virtual_day import FakeCSMS
+from ocpp.messages import MessageType
+from ocpp.v16.enums import Action
+from websockets.exceptions import ConnectionClosed
+
+INTERVAL = 600
+WARMUP = 0.2
+"""WARMUP: share of the samples left out of the fit"""
+THRESHOLD = 0.1
+LINEARITY = 0.8
+"""LINEARITY: r² a series needs to count as linear growth"""
+HISTORY_ROWS = 10_000
+SESSION = 3600
+CSMS_CALL_INTERVAL = 900
+MIN_OBJECTS = 1000
+
+
+@dataclass
+class Probe:
+    name: str
+    read: Callable[[], float]
+    min_growth: float = 10
+    """min_growth: growth below this never fails, i.e.: a few tasks"""
+
+
+@dataclass
+class Growth:
+    name: str
+    start: float
+    end: float
+    slope: float
+    """slope: growth per hour of the fitted line"""
+    r2: float
+    failed: bool
+
+
+@dataclass
+class Report:
+    duration: float
+    samples: int
+    growth: List[Growth] = field(default_factory=list)
+
+    @property
+    def failed(self) -> List[Growth]:
+        return [growth for growth in self.growth if growth.failed]
+
+
+def rss() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # peak rather than current outside of Linux, still never shrinks on a leak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def objects_by_type(minimum: int = MIN_OBJECTS // 10) -> Dict[str, int]:
+    # only the common types, a full count per sample would grow the process
+    counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return {name: total for name, total in counts.items() if total >= minimum}
+
+
+def fit(
+    times: List[float], values: List[float], threshold: float, min_growth: float
+) -> Optional[Growth]:
+    """Least squares line through a series, and whether its growth fails."""
+    if len(times) < 3:
+        return None
+    n = len(times)
+    mean_t, mean_v = sum(times) / n, sum(values) / n
+    var_t = sum((t - mean_t) ** 2 for t in times)
+    var_v = sum((v - mean_v) ** 2 for v in values)
+    cov = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values))
+    if var_t == 0:
+        return None
+    slope = cov / var_t
+    r2 = cov * cov / (var_t * var_v) if var_v else 0.0
+    start = mean_v + slope * (times[0] - mean_t)
+    grown = slope * (times[-1] - times[0])
+    failed = (
+        r2 >= LINEARITY
+        and grown > min_growth
+        and grown > threshold * max(abs(start), 1)
+    )
+    return Growth("", start, start + grown, slope * 3600, r2, failed)
+
+
+class Sampler:
+    def __init__(self, probes: List[Probe], objects: bool = True):
+        self.probes = probes
+        self.objects = objects
+        self.times: List[float] = []
+        self.values: Dict[str, List[float]] = {probe.name: [] for probe in probes}
+        self.object_counts: List[Dict[str, int]] = []
+
+    def sample(self, now: float):
+        self.times.append(now)
+        for probe in self.probes:
+            self.values[probe.name].append(probe.read())
+        if self.objects:
+            self.object_counts.append(objects_by_type())
+
+    def report(self, threshold: float = THRESHOLD, warmup: float = WARMUP) -> Report:
+        skip = int(len(self.times) * warmup)
+        times = self.times[skip:]
+        report = Report(self.times[-1] - self.times[0], len(self.times))
+        series = [
+            (probe.name, self.values[probe.name][skip:], probe.min_growth)
+            for probe in self.probes
+        ]
+        if self.object_counts:
+            last = self.object_counts[-1]
+            series.extend(
+                (
+                    f"objects.{name}",
+                    [counts.get(name, 0) for counts in self.object_counts[skip:]],
+                    MIN_OBJECTS,
+                )
+                for name, total in last.items()
+                if total >= MIN_OBJECTS
+            )
+        for name, values, min_growth in series:
+            growth = fit(times, values, threshold, min_growth)
+            if growth is not None:
+                growth.name = name
+                report.growth.append(growth)
+        return report
+
+
+class SoakCSMS(FakeCSMS):
+    """Accepts everything, and keeps sending Calls to every charger."""
+
+    def __init__(self, clock, call_interval: float = CSMS_CALL_INTERVAL):
+        super().__init__(clock)
+        self.call_interval = call_interval
+        self.transaction_ids = count(1)
+        self.ids = count()
+        self.replies = 0
+
+    def response(self, action):
+        if action == Action.StartTransaction:
+            return {
+                "transactionId": next(self.transaction_ids),
+                "idTagInfo": {"status": "Accepted"},
+            }
+        return super().response(action)
+
+    async def calls(self, websocket):
+        while True:
+            await asyncio.sleep(self.call_interval)
+            for action, payload in (
+                (
+                    "TriggerMessage",
+                    {"requestedMessage": "StatusNotification", "connectorId": 1},
+                ),
+                ("GetConfiguration", {}),
+            ):
+                await websocket.send(
+                    json.dumps(
+                        [MessageType.Call, f"csms-{next(self.ids)}", action, payload]
+                    )
+                )
+
+    async def __call__(self, websocket):
+        calls = asyncio.create_task(self.calls(websocket))
+        try:
+            async for message in websocket:
+                frame = json.loads(message)
+                if frame[0] != MessageType.Call:
+                    self.replies += 1
+                    continue
+                _, unique_id, action, _ = frame
+                self.received[action] += 1
+                await websocket.send(json.dumps([3, unique_id, self.response(action)]))
+        except ConnectionClosed:
+            pass
+        finally:
+            calls.cancel()
+
+
+def fleet_probes(chargers: List) -> List[Probe]:
+    import auth_store
+    import frames
+    import history
+    import liveness
+    import scheduler
+    import transactions
+
+    def total(read):
+        return lambda: sum(read(charger) for charger in chargers)
+
+    return [
+        Probe("rss", rss, min_growth=8 * 2**20),
+        Probe("tasks", lambda: len(asyncio.all_tasks())),
+        Probe("history", lambda: len(history.exchanges)),
+        Probe("follow_tasks", total(lambda charger: len(charger.follow_tasks))),
+        Probe("correlation", total(lambda charger: len(charger.correlation))),
+        Probe("outbound", total(lambda charger: len(charger.outbound))),
+        Probe("scheduler", lambda: len(scheduler.scheduler)),
+        Probe("transactions", lambda: len(transactions.index)),
+        Probe("frames", lambda: len(frames.templates)),
+        Probe("auth_cache", lambda: len(auth_store.store.cache)),
+        Probe("fleet", lambda: len(liveness.fleet)),
+    ]
+
+
+async def charge(charger, session: float):
+    """Charge on connector 1, one session after the other."""
+    meter = 0
+    while True:
+        await charger.send_message_to_backend(
+            Action.StartTransaction, rfid="soak", connector_id=1, meter_start=meter
+        )
+        await asyncio.sleep(session)
+        meter += 10_000
+        await charger.send_message_to_backend(
+            Action.StopTransaction, connector_id=1, meter_stop=meter
+        )
+
+
+async def soak(
+    chargers: int,
+    duration: float,
+    interval: float = INTERVAL,
+    session: float = SESSION,
+    extra_probes: Optional[List[Probe]] = None,
+    objects: bool = True,
+) -> Sampler:
+    import clock
+    import controller
+    import history
+    import scheduler
+    from websockets.server import serve
+
+    current = clock.current()
+    # a fresh process: nothing recorded, nothing scheduled
+    history.exchanges.clear()
+    scheduler.scheduler.clear()
+    csms = SoakCSMS(current)
+    fleet: List[controller.EVSE] = []
+    tasks: List[asyncio.Task] = []
+    sampler = Sampler(fleet_probes(fleet) + (extra_probes or []), objects)
+    async with serve(csms, "127.0.0.1", 0, subprotocols=["ocpp1.6"]) as server:
+        port = server.sockets[0].getsockname()[1]
+        for i in range(chargers):
+            charger = controller.EVSE(clock=current)
+            charger.create(f"soak-{i}", 1, "password")
+            charger.connection = await charger.create_ws_connection(
+                f"ws://127.0.0.1:{port}"
+            )
+            fleet.append(charger)
+            tasks.append(asyncio.create_task(charger.run()))
+            while charger.handler is None:
+                await asyncio.sleep(0)
+            await charger.send_message_to_backend(
+                Action.BootNotification,
+                charge_point_model="soak",
+                charge_point_vendor="soak",
+            )
+            tasks.append(asyncio.create_task(charge(charger, session)))
+        start = current.monotonic()
+        while True:
+            sampler.sample(current.monotonic() - start)
+            if current.monotonic() - start >= duration:
+                break
+            await asyncio.sleep(interval)
+        for task in tasks:
+            task.cancel()
+        for charger in fleet:
+            await charger.connection.close()
+    return sampler
+
+
+def run(
+    chargers: int,
+    duration: float,
+    virtual: bool = True,
+    **kwargs,
+) -> Sampler:
+    import clock
+
+    if virtual:
+        # the CSMS is in this process: any reply is readable as soon as it is sent
+        return clock.run_virtual(
+            soak(chargers, duration, **kwargs),
+            clock.VirtualClock(),
+            real_wait=0,
+            wait_for_replies=False,
+        )
+    return asyncio.run(soak(chargers, duration, **kwargs))
+
+
+def print_report(report: Report):
+    print(f"{report.samples} samples over {report.duration / 3600:.1f}h")
+    for growth in sorted(report.growth, key=lambda growth: not growth.failed):
+        if growth.failed or not growth.name.startswith("objects."):
+            print(
+                f"  {'FAIL' if growth.failed else 'ok  '} {growth.name}: "
+                f"{growth.start:.0f} -> {growth.end:.0f} "
+                f"({growth.slope:+.1f}/h, r²={growth.r2:.2f})"
+            )
+
+
+if __name__ == "__main__":
+    import history
+    import log_config
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chargers", type=int, default=10)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--interval", type=float, default=INTERVAL)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--real-time", action="store_true")
+    parser.add_argument(
+        "--history-rows",
+        type=int,
+        default=HISTORY_ROWS,
+        help="bound of the history, small enough to be reached during the run",
+    )
+    args = parser.parse_args()
+    log_config.configure(log_config.LogMode.off)
+    history.exchanges.max_rows = args.history_rows
+    start = time.perf_counter()
+    sampler = run(
+        args.chargers,
+        args.hours * 3600,
+        virtual=not args.real_time,
+        interval=args.interval,
+    )
+    report = sampler.report(args.threshold)
+    print(f"ran in {time.perf_counter() - start:.1f}s")
+    print_report(report)
+    sys.exit(1 if report.failed else 0)
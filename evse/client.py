@@ -0,0 +1,349 @@
+"""
+Emulated chargers driven from Python, in the same process.
+
+`ChargerClient` wraps a `controller.EVSE`: it connects the charger, sends
+its Calls and returns the CSMS's replies as the `ocpp.v16.call_result`
+payloads they validate into, and lets a scenario wait on the Calls the CSMS
+sends. `FleetClient` does the same for many chargers at once, i.e.: the
+provisioned fleet. The FastAPI app in `main` is a thin adapter over a
+`ChargerClient`.
+
+    async with ChargerClient.create("CP1", 2, "secret") as client:
+        await client.connect("ws://localhost:8765")
+        await client.boot_notification()
+        with client.subscribe(Action.RemoteStartTransaction) as calls:
+            remote_start = await calls.get(timeout=60)
+
+Calls a charger can't send, i.e.: StopTransaction on a connector without a
+transaction, raise instead of being dropped. A Call the CSMS rejects with a
+CallError, or doesn't reply to in time, returns None.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+import controller
+import models
+import provisioning
+import wire
+from clock import Clock
+from ocpp.messages import Call, CallResult
+from ocpp.v16 import call_result
+from ocpp.v16.enums import (
+    Action,
+    ChargePointErrorCode,
+    ChargePointStatus,
+    DiagnosticsStatus,
+    FirmwareStatus,
+    Reason,
+)
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SUBSCRIPTION_SIZE = int(os.getenv("EVSE_SUBSCRIPTION_SIZE", 1000))
+
+T = TypeVar("T")
+
+
+@dataclass
+class InboundCall:
+    call: Call
+    reply: Optional[CallResult]
+    """reply: what the charger replied, None if it replied with a CallError"""
+
+
+class Subscription:
+    """
+    Calls from the CSMS to one charger, of the given actions or all of them.
+
+    At most `max_size` Calls wait to be read, the oldest are dropped first.
+    """
+
+    def __init__(
+        self,
+        evse: controller.EVSE,
+        actions: Iterable[str] = (),
+        max_size: int = DEFAULT_SUBSCRIPTION_SIZE,
+    ):
+        self.evse = evse
+        self.actions = frozenset(actions)
+        self.queue: asyncio.Queue[InboundCall] = asyncio.Queue(max_size)
+        self.dropped = 0
+        evse.inbound_listeners.append(self.deliver)
+
+    def deliver(self, call: Call, reply: Optional[CallResult]):
+        if self.actions and call.action not in self.actions:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(InboundCall(call, reply))
+
+    async def get(self, timeout: Optional[float] = None) -> InboundCall:
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        if self.deliver in self.evse.inbound_listeners:
+            self.evse.inbound_listeners.remove(self.deliver)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> InboundCall:
+        return await self.queue.get()
+
+
+class ChargerClient:
+    def __init__(self, evse: Optional[controller.EVSE] = None):
+        self.evse = evse if evse is not None else controller.EVSE()
+        self.running: Optional[asyncio.Task] = None
+        """running: the charger's message loop, while connected"""
+
+    @classmethod
+    def create(
+        cls,
+        charger_id: str,
+        number_connectors: int,
+        password: Optional[str] = None,
+        clock: Optional[Clock] = None,
+    ) -> "ChargerClient":
+        client = cls(controller.EVSE(clock=clock))
+        client.setup(charger_id, number_connectors, password)
+        return client
+
+    @classmethod
+    def for_charger(
+        cls, abstraction: models.Charger, clock: Optional[Clock] = None
+    ) -> "ChargerClient":
+        evse = controller.EVSE(clock=clock)
+        evse.use(abstraction)
+        return cls(evse)
+
+    @property
+    def id(self) -> str:
+        return self.abstraction.id
+
+    @property
+    def abstraction(self) -> models.Charger:
+        return self.evse.abstraction
+
+    def setup(
+        self, charger_id: str, number_connectors: int, password: Optional[str] = None
+    ):
+        self.evse.create(charger_id, number_connectors, password)
+
+    async def connect(self, backend_url: str, compression: Optional[str] = None):
+        """
+        Connect to the CSMS and start handling its messages. Raises a
+        ConnectionRefusedError when the CSMS doesn't accept the charger.
+        """
+        if compression is not None:
+            wire.profile(compression)
+            self.abstraction.compression = compression
+        await self.close()
+        self.evse.connection = await self.evse.create_ws_connection(backend_url)
+        # the handler of the previous connection, if any, can't send on this one
+        self.evse.handler = None
+        self.running = asyncio.create_task(self.evse.run())
+        while self.evse.handler is None:
+            if self.running.done():
+                raise ConnectionError(f"{self.id} stopped right after connecting")
+            await asyncio.sleep(0)
+
+    async def close(self):
+        if self.running is not None:
+            self.running.cancel()
+            try:
+                await self.running
+            except asyncio.CancelledError:
+                pass
+            self.running = None
+        if self.evse.connection is not None:
+            await self.evse.connection.close()
+
+    async def __aenter__(self) -> "ChargerClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def is_up(self) -> bool:
+        return await self.evse.is_up()
+
+    async def send(self, action: Action, **kwargs):
+        """Send a Call once the ones queued before it are through."""
+        if self.running is None or self.evse.handler is None:
+            raise ConnectionError(f"{self.id} is not connected")
+        return await self.evse.enqueue(action, **kwargs)
+
+    def subscribe(
+        self, *actions: str, max_size: int = DEFAULT_SUBSCRIPTION_SIZE
+    ) -> Subscription:
+        """Calls from the CSMS from now on, of `actions` or of any action."""
+        return Subscription(self.evse, actions, max_size)
+
+    async def boot_notification(
+        self, model: Optional[str] = None, vendor: Optional[str] = None
+    ) -> Optional[call_result.BootNotificationPayload]:
+        kwargs = {}
+        if model is not None:
+            kwargs["charge_point_model"] = model
+        if vendor is not None:
+            kwargs["charge_point_vendor"] = vendor
+        return await self.send(Action.BootNotification, **kwargs)
+
+    async def heartbeat(self) -> Optional[call_result.HeartbeatPayload]:
+        return await self.send(Action.Heartbeat)
+
+    async def authorize(self, id_tag: str) -> Optional[call_result.AuthorizePayload]:
+        """Authorize a tag locally if possible, otherwise with the CSMS."""
+        id_tag_info = self.abstraction.authorize_locally(id_tag)
+        if id_tag_info is not None:
+            return call_result.AuthorizePayload(id_tag_info=id_tag_info)
+        return await self.send(Action.Authorize, id_tag=id_tag)
+
+    async def status_notification(
+        self,
+        status: ChargePointStatus,
+        connector_id: int = 0,
+        error: Optional[ChargePointErrorCode] = None,
+    ) -> Optional[call_result.StatusNotificationPayload]:
+        return await self.send(
+            Action.StatusNotification,
+            connector_id=connector_id,
+            status=status,
+            error=error or ChargePointErrorCode.no_error,
+        )
+
+    async def start_transaction(
+        self, rfid: str, connector_id: int = 1, meter_start: int = 0
+    ) -> Optional[call_result.StartTransactionPayload]:
+        return await self.send(
+            Action.StartTransaction,
+            rfid=rfid,
+            connector_id=connector_id,
+            meter_start=meter_start,
+        )
+
+    async def stop_transaction(
+        self,
+        transaction_id: Optional[int] = None,
+        connector_id: Optional[int] = None,
+        meter_stop: Optional[int] = None,
+        reason: Optional[Reason] = None,
+        id_tag: Optional[str] = None,
+    ) -> Optional[call_result.StopTransactionPayload]:
+        return await self.send(
+            Action.StopTransaction,
+            transaction_id=transaction_id,
+            connector_id=connector_id,
+            meter_stop=meter_stop,
+            reason=reason,
+            id_tag=id_tag,
+        )
+
+    async def meter_values(
+        self, connector_id: int = 1, voltage: int = 230, current: int = 0
+    ) -> Optional[call_result.MeterValuesPayload]:
+        return await self.send(
+            Action.MeterValues,
+            connector_id=connector_id,
+            voltage=voltage,
+            current=current,
+        )
+
+    async def diagnostics_status_notification(
+        self, status: Optional[DiagnosticsStatus] = None
+    ) -> Optional[call_result.DiagnosticsStatusNotificationPayload]:
+        kwargs = {} if status is None else {"status": status}
+        return await self.send(Action.DiagnosticsStatusNotification, **kwargs)
+
+    async def firmware_status_notification(
+        self, status: Optional[FirmwareStatus] = None
+    ) -> Optional[call_result.FirmwareStatusNotificationPayload]:
+        kwargs = {} if status is None else {"status": status}
+        return await self.send(Action.FirmwareStatusNotification, **kwargs)
+
+
+class FleetClient:
+    """Many chargers driven together, each call returns results by charger id."""
+
+    def __init__(self, clients: Iterable[ChargerClient] = ()):
+        self.clients: Dict[str, ChargerClient] = {
+            client.id: client for client in clients
+        }
+
+    @classmethod
+    def provisioned(
+        cls,
+        fleet: provisioning.Provisioner = provisioning.fleet,
+        clock: Optional[Clock] = None,
+    ) -> "FleetClient":
+        return cls(
+            ChargerClient.for_charger(abstraction, clock)
+            for abstraction in fleet.chargers.values()
+        )
+
+    def __len__(self):
+        return len(self.clients)
+
+    def __iter__(self) -> Iterator[ChargerClient]:
+        return iter(self.clients.values())
+
+    def __getitem__(self, charger_id: str) -> ChargerClient:
+        return self.clients[charger_id]
+
+    async def map(
+        self, operation: Callable[[ChargerClient], Awaitable[T]]
+    ) -> Dict[str, Union[T, BaseException]]:
+        """
+        Run `operation` on every charger at once. A charger it failed on has
+        the exception instead of a result.
+        """
+        results = await asyncio.gather(
+            *(operation(client) for client in self.clients.values()),
+            return_exceptions=True,
+        )
+        return dict(zip(self.clients, results))
+
+    async def connect(
+        self, backend_url: str, compression: Optional[str] = None
+    ) -> Dict[str, BaseException]:
+        """Connect every charger, paced by `connections.dialer`; the failures."""
+        results = await self.map(
+            lambda client: client.connect(backend_url, compression)
+        )
+        failures = {
+            charger_id: result
+            for charger_id, result in results.items()
+            if isinstance(result, BaseException)
+        }
+        if failures:
+            logger.warning(
+                "%s of %s chargers failed to connect", len(failures), len(self)
+            )
+        return failures
+
+    async def send(self, action: Action, **kwargs) -> Dict[str, object]:
+        """The same Call from every charger."""
+        return await self.map(lambda client: client.send(action, **kwargs))
+
+    async def close(self):
+        await self.map(lambda client: client.close())
@@ -0,0 +1,150 @@
+"""
+Clocks of the emulator.
+
+`Clock` is the wall clock. A `VirtualClock` only moves when it is advanced,
+which `VirtualTimeLoop` does whenever every task waits on a timer: instead of
+sleeping until the next timer is due, the loop jumps to it. Heartbeats, meter
+values, reservation expiries and response timeouts then happen as fast as
+the loop can process them, i.e.:
+
+    clock = VirtualClock()
+    run_virtual(scenario(EVSE(clock=clock)), clock)
+
+runs a day long scenario in seconds.
+
+While a Call waits for its reply, see `Clock.in_flight`, the loop waits for
+the next timer in real time before jumping to it, so a slow CSMS isn't timed
+out early. Against a CSMS in the same process, whose replies are readable as
+soon as they are sent, `wait_for_replies=False` keeps jumping.
+"""
+import asyncio
+import contextlib
+import selectors
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Optional, TypeVar
+
+DEFAULT_REAL_WAIT = 0.01
+"""Real seconds to wait for I/O before jumping to the next timer"""
+
+T = TypeVar("T")
+
+
+class Clock:
+    def time(self) -> float:
+        """Seconds since the epoch."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time(), timezone.utc)
+
+    def timestamp(self) -> str:
+        """Current time as an OCPP date."""
+        return self.now().isoformat()
+
+    @contextlib.contextmanager
+    def in_flight(self):
+        """Around the wait for the reply to a Call, only virtual time minds it."""
+        yield
+
+
+class VirtualClock(Clock):
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.time() if start is None else start
+        self.advanced = 0.0
+        """advanced: virtual seconds skipped so far"""
+        self.calls_in_flight = 0
+
+    def time(self) -> float:
+        return self.start + self.advanced
+
+    def monotonic(self) -> float:
+        # kept small: the loop compares timers with a nanosecond resolution
+        return self.advanced
+
+    def advance(self, seconds: float):
+        self.advanced += seconds
+
+    @contextlib.contextmanager
+    def in_flight(self):
+        self.calls_in_flight += 1
+        try:
+            yield
+        finally:
+            self.calls_in_flight -= 1
+
+
+class _VirtualTimeSelector:
+    """Selector that advances the clock instead of waiting for a timer."""
+
+    def __init__(
+        self,
+        selector: selectors.BaseSelector,
+        clock: VirtualClock,
+        real_wait: float,
+        wait_for_replies: bool,
+    ):
+        self._selector = selector
+        self._clock = clock
+        self._real_wait = real_wait
+        self._wait_for_replies = wait_for_replies
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is None or timeout <= 0:
+            # no timers, or callbacks are ready: only I/O can wake the loop
+            return self._selector.select(timeout)
+        # a reply on its way gets until the next timer in real time, the
+        # clock still only moves to timers so they are due exactly
+        in_flight = self._wait_for_replies and self._clock.calls_in_flight
+        real_wait = timeout if in_flight else self._real_wait
+        events = self._selector.select(min(timeout, real_wait))
+        if not events:
+            self._clock.advance(timeout)
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(
+        self,
+        clock: Optional[VirtualClock] = None,
+        real_wait: float = DEFAULT_REAL_WAIT,
+        wait_for_replies: bool = True,
+    ):
+        super().__init__()
+        self.clock = clock if clock is not None else VirtualClock()
+        self._selector = _VirtualTimeSelector(
+            self._selector, self.clock, real_wait, wait_for_replies
+        )
+
+    def time(self) -> float:
+        return self.clock.monotonic()
+
+
+def run_virtual(
+    main: Awaitable[T],
+    clock: Optional[VirtualClock] = None,
+    real_wait: float = DEFAULT_REAL_WAIT,
+    wait_for_replies: bool = True,
+) -> T:
+    """Like `asyncio.run`, on virtual time."""
+    with asyncio.Runner(
+        loop_factory=lambda: VirtualTimeLoop(clock, real_wait, wait_for_replies)
+    ) as runner:
+        return runner.run(main)
+
+
+def current() -> Clock:
+    """Clock of the running loop, the wall clock outside of virtual time."""
+    try:
+        return getattr(asyncio.get_running_loop(), "clock", wall_clock)
+    except RuntimeError:
+        return wall_clock
+
+
+wall_clock = Clock()
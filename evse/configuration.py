@@ -0,0 +1,233 @@
+import functools
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ocpp.v16.enums import ConfigurationStatus
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+
+class KeyType(Enum):
+    boolean = "boolean"
+    integer = "integer"
+    string = "string"
+    csl = "csl"
+    """comma separated list"""
+
+    def parse(self, value: str) -> Any:
+        """Parse the value of a ChangeConfiguration, raising ValueError."""
+        match self:
+            case KeyType.boolean:
+                if value.lower() not in ("true", "false"):
+                    raise ValueError(f"{value} is not a boolean")
+                return value.lower() == "true"
+            case KeyType.integer:
+                if int(value) < 0:
+                    raise ValueError(f"{value} is negative")
+                return int(value)
+            case KeyType.csl:
+                return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
+    def format(self, value: Any) -> str:
+        match self:
+            case KeyType.boolean:
+                return "true" if value else "false"
+            case KeyType.csl:
+                return ",".join(value)
+        return str(value)
+
+
+@dataclass(frozen=True, eq=False)
+class ConfigurationKey:
+    key: str
+    type: KeyType
+    default: Any
+    readonly: bool = False
+
+
+@functools.lru_cache(maxsize=None)
+def default_entry(definition: ConfigurationKey) -> Dict:
+    """Entry of a key with its default value, shared by every charger."""
+    return {
+        "key": definition.key,
+        "readonly": definition.readonly,
+        "value": definition.type.format(definition.default),
+    }
+
+
+STANDARD_KEYS: Dict[str, ConfigurationKey] = {
+    definition.key: definition
+    for definition in [
+        # Core profile
+        ConfigurationKey("AllowOfflineTxForUnknownId", KeyType.boolean, False),
+        ConfigurationKey("AuthorizationCacheEnabled", KeyType.boolean, True),
+        ConfigurationKey("AuthorizeRemoteTxRequests", KeyType.boolean, False),
+        ConfigurationKey("ClockAlignedDataInterval", KeyType.integer, 0),
+        ConfigurationKey("ConnectionTimeOut", KeyType.integer, 60),
+        ConfigurationKey("ConnectorPhaseRotation", KeyType.csl, ["NotApplicable"]),
+        ConfigurationKey("GetConfigurationMaxKeys", KeyType.integer, 50, True),
+        ConfigurationKey("HeartbeatInterval", KeyType.integer, 3600),
+        ConfigurationKey("LocalAuthorizeOffline", KeyType.boolean, True),
+        ConfigurationKey("LocalPreAuthorize", KeyType.boolean, True),
+        ConfigurationKey("MeterValuesAlignedData", KeyType.csl, []),
+        ConfigurationKey(
+            "MeterValuesSampledData", KeyType.csl, ["Power.Active.Import"]
+        ),
+        ConfigurationKey("MeterValueSampleInterval", KeyType.integer, 30),
+        ConfigurationKey("NumberOfConnectors", KeyType.integer, 1, True),
+        ConfigurationKey("ResetRetries", KeyType.integer, 3),
+        ConfigurationKey("StopTransactionOnEVSideDisconnect", KeyType.boolean, True),
+        ConfigurationKey("StopTransactionOnInvalidId", KeyType.boolean, True),
+        ConfigurationKey("StopTxnAlignedData", KeyType.csl, []),
+        ConfigurationKey("StopTxnSampledData", KeyType.csl, []),
+        ConfigurationKey(
+            "SupportedFeatureProfiles",
+            KeyType.csl,
+            [
+                "Core",
+                "FirmwareManagement",
+                "SmartCharging",
+                "RemoteTrigger",
+                "LocalAuthListManagement",
+                "Reservation",
+            ],
+            True,
+        ),
+        ConfigurationKey("TransactionMessageAttempts", KeyType.integer, 3),
+        ConfigurationKey("TransactionMessageRetryInterval", KeyType.integer, 60),
+        ConfigurationKey("UnlockConnectorOnEVSideDisconnect", KeyType.boolean, True),
+        ConfigurationKey("WebSocketPingInterval", KeyType.integer, 0),
+        # Local Auth List Management profile
+        ConfigurationKey("LocalAuthListEnabled", KeyType.boolean, True),
+        ConfigurationKey("LocalAuthListMaxLength", KeyType.integer, 1_000_000, True),
+        ConfigurationKey("SendLocalListMaxLength", KeyType.integer, 1_000_000, True),
+        # Reservation profile
+        ConfigurationKey("ReserveConnectorZeroSupported", KeyType.boolean, False, True),
+    ]
+}
+
+
+class ConfigurationRegistry(Mapping):
+    """
+    Configuration keys of a charger, mapping key to its parsed value.
+
+    Key definitions are shared between chargers until a charger defines its
+    own. The key entries of a GetConfiguration.conf are rendered once and
+    kept until the value of that key changes. The reply to a GetConfiguration
+    for all keys is kept serialized, so it is sent without building or
+    encoding anything when nothing changed since the last one. That costs a
+    charger the size of the payload, about 2kB with the standard keys,
+    from its first such request until a value changes; see
+    `python -m benchmarks.bench_configuration`.
+    """
+
+    def __init__(
+        self,
+        definitions: Dict[str, ConfigurationKey] = STANDARD_KEYS,
+        overrides: Optional[Dict[str, Any]] = None,
+    ):
+        self._definitions = definitions
+        self._values: Dict[str, Any] = {
+            key: definition.default for key, definition in definitions.items()
+        }
+        self._entries: Dict[str, Dict] = {}
+        self._all_entries: Optional[List[Dict]] = None
+        self._all_payload: Optional[str] = None
+        for key, value in (overrides or {}).items():
+            self.override(key, value)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def definition(self, key: str) -> ConfigurationKey:
+        return self._definitions[key]
+
+    def define(self, definition: ConfigurationKey, value: Any = None):
+        """Add a custom key, or replace the definition of an existing one."""
+        if self._definitions is STANDARD_KEYS:
+            self._definitions = dict(STANDARD_KEYS)
+        self._definitions[definition.key] = definition
+        self._values[definition.key] = definition.default if value is None else value
+        self._invalidate(definition.key)
+
+    def override(self, key: str, value: Any):
+        """Set a value from within the charger, readonly keys included."""
+        if key not in self._definitions:
+            raise KeyError(key)
+        self._values[key] = value
+        self._invalidate(key)
+
+    def change(self, key: str, value: str) -> ConfigurationStatus:
+        """Set a value as requested by a ChangeConfiguration."""
+        try:
+            definition = self._definitions[key]
+        except KeyError:
+            return ConfigurationStatus.not_supported
+        if definition.readonly:
+            return ConfigurationStatus.rejected
+        try:
+            parsed = definition.type.parse(value)
+        except ValueError as error:
+            logger.debug("Rejected %s for %s: %s", value, key, error)
+            return ConfigurationStatus.rejected
+        self.override(key, parsed)
+        return ConfigurationStatus.accepted
+
+    def get_configuration(
+        self, keys: Optional[Iterable[str]] = None
+    ) -> Tuple[List[Dict], List[str]]:
+        """Known key entries and unknown keys for a GetConfiguration."""
+        if not keys:
+            if self._all_entries is None:
+                self._all_entries = [self._entry(key) for key in self._values]
+            return self._all_entries, []
+        entries, unknown = [], []
+        for key in keys:
+            if key in self._values:
+                entries.append(self._entry(key))
+            else:
+                unknown.append(key)
+        return entries, unknown
+
+    def serialized_configuration(self) -> str:
+        """JSON payload of the CallResult to a GetConfiguration for all keys."""
+        if self._all_payload is None:
+            entries, _ = self.get_configuration()
+            # an empty list is left out, as the full path removes it
+            payload = {"configurationKey": entries} if entries else {}
+            self._all_payload = json.dumps(payload, separators=(",", ":"))
+        return self._all_payload
+
+    def _entry(self, key: str) -> Dict:
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+        definition = self._definitions[key]
+        value = self._values[key]
+        if value is definition.default:
+            entry = default_entry(definition)
+        else:
+            entry = {
+                "key": key,
+                "readonly": definition.readonly,
+                "value": definition.type.format(value),
+            }
+        self._entries[key] = entry
+        return entry
+
+    def _invalidate(self, key: str):
+        self._entries.pop(key, None)
+        self._all_entries = None
+        self._all_payload = None
@@ -0,0 +1,240 @@
+"""
+Websocket connects to the CSMS, paced for the whole fleet.
+
+When a fleet starts, or the CSMS comes back after an outage, every charger
+dials at once. The `dialer` shared by all chargers lets connects through a
+token bucket (`rate` per second, up to `burst` at once) and keeps at most
+`concurrency` handshakes in flight.
+
+All `wss` connects share one `SSLContext`, so CA certificates are loaded
+once for the fleet instead of once per charger, and the TLS session of the
+last connect to a host is offered again to resume it on the next one.
+
+Configured at startup with `EVSE_CONNECT_RATE`, `EVSE_CONNECT_BURST`,
+`EVSE_CONNECT_CONCURRENCY` and `EVSE_CA_FILE`, or at runtime with
+`Dialer.configure`.
+"""
+import asyncio
+import os
+import ssl
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional
+
+import clock
+import websockets.client
+import websockets.exceptions
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_RATE = 50.0
+DEFAULT_BURST = 50
+DEFAULT_CONCURRENCY = 100
+DEFAULT_OPEN_TIMEOUT = 10
+LATENCY_WINDOW = 1024
+MIN_WAIT = 1e-6
+"""Shortest wait for a token, above the resolution of the loop's clock"""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for a token, in arrival order."""
+        async with self._lock:
+            while True:
+                now = clock.current().monotonic()
+                if self._updated is not None:
+                    # a loop on another clock, i.e.: virtual time, starts over
+                    elapsed = max(now - self._updated, 0)
+                    self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated = now
+                # float residue must not leave a token just short of whole
+                if self._tokens >= 1 - 1e-9:
+                    self._tokens = max(self._tokens - 1, 0.0)
+                    return
+                await asyncio.sleep(max((1 - self._tokens) / self.rate, MIN_WAIT))
+
+    def configure(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = min(self._tokens, float(burst))
+
+
+class ResumingContext(ssl.SSLContext):
+    """Client context that offers the last session of a host when dialing it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sessions: Dict[str, ssl.SSLSession] = {}
+
+    def wrap_bio(
+        self,
+        incoming,
+        outgoing,
+        server_side=False,
+        server_hostname=None,
+        session=None,
+    ):
+        if session is None and not server_side:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session
+        )
+
+    def keep_session(self, connection: websockets.client.WebSocketClientProtocol):
+        ssl_object = connection.transport.get_extra_info("ssl_object")
+        if ssl_object is not None and ssl_object.session is not None:
+            self.sessions[ssl_object.server_hostname] = ssl_object.session
+
+
+def failure_reason(error: BaseException) -> str:
+    match error:
+        case websockets.exceptions.InvalidStatusCode():
+            return f"http {error.status_code}"
+        case websockets.exceptions.InvalidHandshake():
+            return "handshake"
+        case ssl.SSLCertVerificationError():
+            return "certificate"
+        case ssl.SSLError():
+            return "tls"
+        case ConnectionRefusedError():
+            return "refused"
+        case asyncio.TimeoutError():
+            return "timeout"
+        case OSError():
+            return "network"
+    return type(error).__name__
+
+
+class Dialer:
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ca_file: Optional[str] = None,
+        open_timeout: float = DEFAULT_OPEN_TIMEOUT,
+    ):
+        self.ca_file = ca_file
+        self.open_timeout = open_timeout
+        self._ssl_context: Optional[ResumingContext] = None
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.configure(rate, burst, concurrency)
+        self.connected = 0
+        self.resumed = 0
+        self.failures: Counter = Counter()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        """latencies: seconds from dialing until the websocket is open"""
+
+    def configure(self, rate: float, burst: int, concurrency: int):
+        if rate <= 0 or burst < 1 or concurrency < 1:
+            raise ValueError("rate, burst and concurrency must be positive")
+        self.bucket.configure(rate, burst)
+        # handshakes in flight keep their slot, a larger limit lets waiters in
+        self.concurrency = concurrency
+        self._wake()
+
+    @property
+    def ssl_context(self) -> ResumingContext:
+        if self._ssl_context is None:
+            context = ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+            if self.ca_file is None:
+                context.load_default_certs()
+            else:
+                context.load_verify_locations(cafile=self.ca_file)
+            self._ssl_context = context
+        return self._ssl_context
+
+    async def _enter(self):
+        while self.in_flight >= self.concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # pass on a wake up this waiter won't use
+                self._wake()
+                raise
+        self.in_flight += 1
+
+    def _leave(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self.concurrency - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def connect(
+        self, url: str, **kwargs
+    ) -> websockets.client.WebSocketClientProtocol:
+        """Open a websocket once the fleet's pace allows it."""
+        if url.startswith("wss://"):
+            kwargs.setdefault("ssl", self.ssl_context)
+        await self.bucket.acquire()
+        await self._enter()
+        start = clock.current().monotonic()
+        try:
+            connection = await websockets.client.connect(
+                url, open_timeout=self.open_timeout, **kwargs
+            )
+        except Exception as error:
+            reason = failure_reason(error)
+            self.failures[reason] += 1
+            logger.info("Connect to %s failed: %s (%s)", url, reason, error)
+            raise
+        finally:
+            self._leave()
+        self.latencies.append(clock.current().monotonic() - start)
+        self.connected += 1
+        ssl_object = connection.transport.get_extra_info("ssl_object")
+        if ssl_object is not None:
+            self.resumed += ssl_object.session_reused
+            context = kwargs.get("ssl")
+            if isinstance(context, ResumingContext):
+                context.keep_session(connection)
+        return connection
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+        return {
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "connected": self.connected,
+            "resumed": self.resumed,
+            "failures": dict(self.failures),
+            "handshake_latency": {
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+
+dialer = Dialer(
+    rate=float(os.getenv("EVSE_CONNECT_RATE", DEFAULT_RATE)),
+    burst=int(os.getenv("EVSE_CONNECT_BURST", DEFAULT_BURST)),
+    concurrency=int(os.getenv("EVSE_CONNECT_CONCURRENCY", DEFAULT_CONCURRENCY)),
+    ca_file=os.getenv("EVSE_CA_FILE"),
+)
@@ -1,10 +1,21 @@
 import asyncio
-from typing import List, Optional, Union
+import functools
+from typing import Callable, List, Optional, Set, Union
 
+import connections
+import history
+import liveness
 import models
 import websockets
-from exceptions import NoHandlerImplementedError, NoModelImplementedError
-from handler import ChargerHandler
+import wire
+from clock import Clock, wall_clock
+from correlation import CorrelationTable
+from exceptions import (
+    NoHandlerImplementedError,
+    NoModelImplementedError,
+    TransactionError,
+)
+from handler import ChargerHandler, call_error
 from ocpp.exceptions import OCPPError
 from ocpp.messages import (
     Call,
@@ -14,8 +25,12 @@ from ocpp.messages import (
     unpack,
     validate_payload,
 )
+from ocpp.v16 import call_result
 from ocpp.v16.enums import Action
+from outbound import OutboundQueue
+from responses import ResponseCache
 from structlog import get_logger
+from timeouts import AdaptiveTimeouts
 from websockets.client import WebSocketClientProtocol
 
 logger = get_logger(__name__)
@@ -25,98 +40,233 @@ class EVSE:
     handler: Optional[ChargerHandler] = None
     abstraction: Optional[models.Charger] = None
     connection: Optional[WebSocketClientProtocol] = None
-    exchange_buffer: List = []
 
-    def __init__(self):
+    def __init__(
+        self,
+        timeouts: Optional[AdaptiveTimeouts] = None,
+        clock: Optional[Clock] = None,
+    ):
+        self.clock = clock if clock is not None else wall_clock
         self.abstraction = models.Charger.simple()
         self.handler = None
         self.connection = None
+        self.correlation = CorrelationTable(clock=self.clock.monotonic)
+        self.timeouts = timeouts if timeouts is not None else AdaptiveTimeouts()
+        self.outbound = OutboundQueue()
+        self.outbound_task: Optional[asyncio.Task] = None
+        self.liveness = liveness.Liveness(clock=self.clock.monotonic)
+        self.keepalive_task: Optional[asyncio.Task] = None
+        self.malformed_frames = 0
+        self.responses = ResponseCache(clock=self.clock.monotonic)
+        self.follow_tasks: Set[asyncio.Task] = set()
+        """follow_tasks: follow-ups of CSMS Calls still running"""
+        self.inbound_listeners: List[Callable[[Call, Optional[CallResult]], None]] = []
+        """inbound_listeners: told of every CSMS Call and the reply sent to it"""
+
+        self.abstraction.outbox = self.queue_message
+        self.abstraction.clock = self.clock
 
     def create(
         self, charger_id: str, number_connectors: int, password: str | None = None
     ):
-        self.abstraction = models.Charger.create(
-            charger_id, number_connectors, password
-        )
+        self.use(models.Charger.create(charger_id, number_connectors, password))
+
+    def use(self, abstraction: models.Charger):
+        """Emulate a charger built elsewhere, i.e.: a provisioned one."""
+        self.abstraction = abstraction
+        self.abstraction.outbox = self.queue_message
+        self.abstraction.clock = self.clock
 
     async def run(self):
         if self.abstraction.ready and await self.is_up():
             self.handler = ChargerHandler(
-                self.abstraction.id, connection=self.connection, response_timeout=1
+                self.abstraction.id,
+                connection=self.connection,
+                response_timeout=self.timeouts.ceiling,
+                clock=self.clock,
+                responses=self.responses,
+            )
+            self.outbound_task = asyncio.create_task(self.drain_outbound())
+            self.keepalive_task = asyncio.create_task(
+                self.liveness.keepalive(self.connection)
             )
-            await self.incoming_message_handler()
+            try:
+                await self.incoming_message_handler()
+            finally:
+                self.outbound_task.cancel()
+                self.keepalive_task.cancel()
+                self.liveness.closed()
         else:
             logger.debug("abstraction or connection is not ready")
 
-    def log_payload(self, call: Call):
-        self.exchange_buffer.append(call)
+    def log_payload(
+        self,
+        message: Union[Call, CallError, CallResult],
+        latency: Optional[float] = None,
+        action: Optional[str] = None,
+    ):
+        history.exchanges.record(
+            self.abstraction.id, message, self.clock.time(), latency, action
+        )
 
     async def is_up(self):
-        try:
-            await self.connection.ping()
-            return True
-        except Exception as e:
-            logger.debug(e)
-        return False
+        """Whether the CSMS was heard from lately, without a round trip."""
+        if self.connection is None or self.connection.closed:
+            return False
+        return self.liveness.is_up()
 
     def prepare_payload_for_call(self, action: Action, **kwargs):
         """Prepare a Call originating from the CS."""
-        data = {}
+        data = kwargs
         try:
             data = self.abstraction.create_data_for_payload(action, **kwargs)
         except NoModelImplementedError:
-            logger.warning("Action %s is not implemented", action)
+            logger.debug("Action %s is not implemented by the abstraction", action)
         try:
             return self.handler.create_payload(action, **data)
         except NoHandlerImplementedError:
             logger.warning("Can not create Call for %s", action)
         raise NotImplementedError
 
-    async def send_controlled_call(self, action: Action, payload):
-        call_gen = self.handler.call_generator(payload)
+    async def send_controlled_call(
+        self, action: Action, payload
+    ) -> Union[object, CallError, None]:
+        """Send a Call and return its validated response."""
+        response = None
+        timeout = self.timeouts.timeout_for(self.handler.action_for(payload))
+        call_gen = self.handler.call_generator(payload, timeout=timeout)
+        pending = None
         try:
             call = await call_gen.__anext__()
             self.abstraction.handle_created_call(call)
             self.log_payload(call)
-            self.abstraction.call_message_id_to_action_map[call.unique_id] = call.action
-            response = await call_gen.__anext__()
-            self.abstraction.handle_validated_call_response(response)
-            logger.info("FINISHED SEND CONTROLLED CALL")
+            pending = self.correlation.add(call.unique_id, call.action, call)
+            with self.clock.in_flight():
+                response = await call_gen.__anext__()
+            if response is not None and call.action == Action.Heartbeat:
+                self.liveness.saw_heartbeat()
+            self.abstraction.handle_validated_call_response(call, response)
+            logger.debug("Finished controlled call", action=call.action)
         except StopAsyncIteration:
             logger.warning("Nothing to step into on the async generator")
         except TimeoutError:
             logger.warning("No response in time for action %s", action)
+            self.timeouts.record_timeout(call.action)
+            self.correlation.expire(call.unique_id)
+            self.abstraction.handle_unanswered_call(call)
+        finally:
+            if pending is not None:
+                pending.applied.set()
+        return response
 
-    async def send_message_to_backend(self, action: Action, **kwargs):
+    async def drain_outbound(self):
+        """Send the queued Calls one at a time, highest priority first."""
+        while True:
+            message = await self.outbound.get()
+            response = None
+            try:
+                response = await self.send_controlled_call(
+                    message.action, message.payload
+                )
+            except Exception:
+                logger.exception("Failed to send", action=message.action)
+            finally:
+                if not message.done.done():
+                    message.done.set_result(response)
+
+    def enqueue(self, action: Action, **kwargs) -> asyncio.Future:
+        """
+        Queue a Call, returning a future of its response. Raises when the
+        Call can't be created, i.e.: a TransactionError for a connector
+        without a transaction.
+        """
+        payload = self.prepare_payload_for_call(action, **kwargs)
+        return self.outbound.put(self.handler.action_for(payload), payload)
+
+    def queue_message(self, action: Action, **kwargs) -> Optional[asyncio.Future]:
+        """Queue a Call, returning a future of its response."""
         logger.debug("Action: %s with Kwargs: %s", action, kwargs)
+        if self.handler is None:
+            logger.warning("Can't send Call for %s, not connected", action)
+            return None
         try:
-            payload = self.prepare_payload_for_call(action, **kwargs)
+            return self.enqueue(action, **kwargs)
         except NotImplementedError:
             logger.warning("Can't send Call for %s", action)
-            return
-        await self.send_controlled_call(action, payload)
+            return None
+        except TransactionError as error:
+            logger.warning("Can't send Call for %s: %s", action, error)
+            return None
+
+    async def send_message_to_backend(self, action: Action, **kwargs):
+        queued = self.queue_message(action, **kwargs)
+        if queued is None:
+            return None
+        return await queued
+
+    async def authorize(self, id_tag: str):
+        """Authorize a tag locally if possible, otherwise with the CSMS."""
+        id_tag_info = self.abstraction.authorize_locally(id_tag)
+        if id_tag_info is not None:
+            return call_result.AuthorizePayload(id_tag_info=id_tag_info)
+        return await self.send_message_to_backend(Action.Authorize, id_tag=id_tag)
 
     async def incoming_message_handler(self):
         """Listener Calls from the CSMS."""
         while True:
             response = None
             message = await self.connection.recv()
-            logger.info("%s: received message %s", self.abstraction.id, message)
-            msg: Union[Call, CallError, CallResult] = unpack(message)
+            self.liveness.saw_frame()
             try:
-                validate_payload(msg, ocpp_version=self.handler._ocpp_version)
-            except OCPPError as error:
-                response = msg.create_call_error(error).to_json()
-                await self.handler._send(response)
-                return
-            self.log_payload(msg)
+                msg: Union[Call, CallError, CallResult] = unpack(message)
+            except OCPPError:
+                # without a unique id there is nothing to reply to
+                self.malformed_frames += 1
+                logger.warning("%s: dropped malformed frame", self.abstraction.id)
+                continue
+            logger.debug(
+                "%s: received message %s",
+                self.abstraction.id,
+                message,
+                action=getattr(msg, "action", None),
+            )
+            if msg.message_type_id == MessageType.Call:
+                # a retransmitted Call gets the same reply, without handling it again
+                cached = self.responses.get(msg.unique_id, msg.action)
+                if cached is not None:
+                    await self.handler._send(cached)
+                    continue
+                # CallResults only get their action, and can only be validated,
+                # once they are matched with their Call in the handler
+                try:
+                    validate_payload(msg, ocpp_version=self.handler._ocpp_version)
+                except OCPPError as error:
+                    await self.handler.send_call(call_error(msg, error))
+                    continue
             match msg.message_type_id:
                 case MessageType.Call:
-                    self.abstraction.receive_csms_call(msg)
-                    response = await self.handler.handle_csms_call(msg)
-                    asyncio.create_task(self.follow_incoming_messages(msg, response))
+                    self.log_payload(msg)
+                    data = self.abstraction.receive_csms_call(msg)
+                    response = await self.handler.handle_csms_call(msg, **data)
+                    for listener in self.inbound_listeners:
+                        listener(msg, response)
+                    follow = asyncio.create_task(
+                        self.follow_incoming_messages(msg, response)
+                    )
+                    self.follow_tasks.add(follow)
+                    follow.add_done_callback(self.follow_tasks.discard)
                 case MessageType.CallResult | MessageType.CallError:
+                    pending = self.correlation.resolve(msg.unique_id)
+                    if pending is None:
+                        self.log_payload(msg)
+                        continue
+                    latency = self.correlation.clock() - pending.sent_at
+                    self.log_payload(msg, latency, pending.action)
+                    self.timeouts.observe(pending.action, latency)
                     self.handler.put_in_response_queue(msg)
+                    # the next frame may depend on the response, i.e.: a
+                    # RemoteStopTransaction right after a StartTransaction
+                    await pending.applied.wait()
 
     async def follow_incoming_messages(
         self,
@@ -134,36 +284,53 @@ class EVSE:
             be sent as soon as possible.
         """
         if not hasattr(message, "action"):
-            logger.warning(f"Can not get action from {message.payload}")
+            logger.warning("Can not get action from %s", message.payload)
+            return
+        try:
+            data = self.abstraction.after_cs_response(
+                request=message, response=response
+            )
+            msg = await self.handler.after_cs_response(
+                request=message, response=response, **data
+            )
+        except NotImplementedError:
+            logger.debug("Nothing follows %s", message.action)
+            return
+        except TransactionError as error:
+            logger.warning("Nothing can follow %s: %s", message.action, error)
             return
-        data = self.abstraction.after_cs_response(request=message, response=response)
-        msg = await self.handler.after_cs_response(
-            request=message, response=response, **data
-        )
         if msg is None:
             return
-        send_generator = self.handler.call_generator(payload=msg)
-        async for _ in send_generator:
-            pass
+        await self.outbound.put(self.handler.action_for(msg), msg)
 
     async def create_ws_connection(self, backend_url):
         backend_url = "/".join([backend_url, self.abstraction.id])
         logger.debug("Connecting to %s", backend_url)
+        meter = wire.MessageMeter(self.abstraction.id)
         try:
-            connection = await websockets.client.connect(
+            connection = await connections.dialer.connect(
                 backend_url,
+                create_protocol=functools.partial(
+                    wire.MeteredClientProtocol, meter=meter
+                ),
+                **wire.profile(self.abstraction.compression).connect_kwargs(),
                 subprotocols=["ocpp1.6"],
-                ssl=None,
+                # the liveness keepalive pings only idle connections
+                ping_interval=None,
                 extra_headers={
                     "Authorization": websockets.headers.build_authorization_basic(
                         self.abstraction.id, self.abstraction.password
                     )
                 },
             )
-            return connection
         except:
             try:
                 connection.close()
             except UnboundLocalError:
                 logger.debug("Connection rejected, can't close unopened connection.")
             raise ConnectionRefusedError
+        # ids are only unique on a connection, replies to the last one are stale
+        self.responses.clear()
+        self.liveness.opened()
+        liveness.fleet.register(self.abstraction.id, self.liveness)
+        return connection
@@ -0,0 +1,384 @@
+"""
+OCPP 1.6 frames generated from the JSON schemas bundled with `ocpp`.
+
+Builds corpora of inbound traffic for benchmarks and fuzzing: Calls the CSMS
+sends to a charger and CallResults to the Calls a charger sends, with a
+share of deliberately invalid frames. Arrays get their length from an
+exponential distribution around a mean, which can be set per action, i.e.:
+large SetChargingProfile schedules and GetConfiguration responses.
+
+A corpus is written one frame per line, so it can be memory-mapped and
+streamed with `read_frames`, next to a `.json` file with its metadata and
+the lines of the invalid frames:
+
+    $ python -m corpus --out /tmp/corpus.ndjson --count 100000 \\
+        --invalid 0.05 --size SetChargingProfile=48 --size GetConfiguration=200
+"""
+import argparse
+import copy
+import functools
+import json
+import mmap
+import random
+import string
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import ocpp
+from ocpp.exceptions import OCPPError
+from ocpp.messages import Call, CallResult, MessageType, validate_payload
+from ocpp.v16.enums import Action
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+OCPP_VERSION = "1.6"
+SCHEMAS = Path(ocpp.__file__).parent / "v16" / "schemas"
+DEFAULT_ARRAY_LENGTH = 4
+DEFAULT_OPTIONAL = 0.5
+MAX_ARRAY_LENGTH = 1000
+
+CSMS_CALLS = [
+    Action.CancelReservation,
+    Action.ChangeAvailability,
+    Action.ChangeConfiguration,
+    Action.ClearCache,
+    Action.ClearChargingProfile,
+    Action.DataTransfer,
+    Action.GetCompositeSchedule,
+    Action.GetConfiguration,
+    Action.GetDiagnostics,
+    Action.GetLocalListVersion,
+    Action.RemoteStartTransaction,
+    Action.RemoteStopTransaction,
+    Action.ReserveNow,
+    Action.Reset,
+    Action.SendLocalList,
+    Action.SetChargingProfile,
+    Action.TriggerMessage,
+    Action.UnlockConnector,
+    Action.UpdateFirmware,
+]
+"""Calls a CSMS sends to a charger"""
+
+CP_CALLS = [
+    Action.Authorize,
+    Action.BootNotification,
+    Action.DataTransfer,
+    Action.DiagnosticsStatusNotification,
+    Action.FirmwareStatusNotification,
+    Action.Heartbeat,
+    Action.MeterValues,
+    Action.StartTransaction,
+    Action.StatusNotification,
+    Action.StopTransaction,
+]
+"""Calls a charger sends, whose CallResults the CSMS sends back"""
+
+MUTATIONS = [
+    "missing_required",
+    "wrong_type",
+    "unknown_property",
+    "bad_enum",
+    "too_long",
+    "malformed",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def schema_for(message_type_id: int, action: str) -> Dict:
+    # read apart from ocpp's validators, which it caches with their float parser
+    name = action + ("Response" if message_type_id == MessageType.CallResult else "")
+    with (SCHEMAS / f"{name}.json").open(encoding="utf-8-sig") as file:
+        return json.load(file)
+
+
+class PayloadGenerator:
+    """Random payloads that follow a JSON schema."""
+
+    def __init__(
+        self,
+        rng: random.Random,
+        array_length: float = DEFAULT_ARRAY_LENGTH,
+        optional: float = DEFAULT_OPTIONAL,
+        start: Optional[datetime] = None,
+    ):
+        self.rng = rng
+        self.array_length = array_length
+        """array_length: mean length of arrays without a maxItems"""
+        self.optional = optional
+        """optional: probability of an optional property being present"""
+        self.start = start or datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def generate(self, schema: Dict, root: Optional[Dict] = None) -> Any:
+        root = schema if root is None else root
+        if "$ref" in schema:
+            return self.generate(self.resolve(schema["$ref"], root), root)
+        if "enum" in schema:
+            return self.rng.choice(schema["enum"])
+        match schema.get("type"):
+            case "object":
+                return self.object(schema, root)
+            case "array":
+                return self.array(schema, root)
+            case "string":
+                return self.string(schema)
+            case "integer":
+                return self.rng.randint(schema.get("minimum", 0), 1000)
+            case "number":
+                return self.number(schema)
+            case "boolean":
+                return self.rng.random() < 0.5
+        return None
+
+    @staticmethod
+    def resolve(reference: str, root: Dict) -> Dict:
+        node = root
+        for part in reference.lstrip("#/").split("/"):
+            node = node[part]
+        return node
+
+    def object(self, schema: Dict, root: Dict) -> Dict:
+        required = set(schema.get("required", ()))
+        return {
+            name: self.generate(property_schema, root)
+            for name, property_schema in schema.get("properties", {}).items()
+            if name in required or self.rng.random() < self.optional
+        }
+
+    def array(self, schema: Dict, root: Dict) -> List:
+        length = (
+            int(self.rng.expovariate(1 / self.array_length)) if self.array_length else 0
+        )
+        length = max(length, schema.get("minItems", 0))
+        length = min(length, schema.get("maxItems", MAX_ARRAY_LENGTH))
+        return [self.generate(schema.get("items", {}), root) for _ in range(length)]
+
+    def string(self, schema: Dict) -> str:
+        match schema.get("format"):
+            case "date-time":
+                moment = self.start + timedelta(seconds=self.rng.randint(0, 86400 * 30))
+                return moment.isoformat()
+            case "uri":
+                return f"http://127.0.0.1:8080/{self.word(16)}"
+        return self.word(self.rng.randint(1, min(schema.get("maxLength", 20), 64)))
+
+    def number(self, schema: Dict) -> float:
+        step = schema.get("multipleOf")
+        if step is None:
+            return round(self.rng.uniform(0, 1000), 3)
+        # a multiple of 0.1 as a JSON number, not 0.30000000000000004
+        return round(self.rng.randint(0, 10000) * step, 1)
+
+    def word(self, length: int) -> str:
+        return "".join(self.rng.choices(string.ascii_letters + string.digits, k=length))
+
+
+class CorpusGenerator:
+    """
+    Frames of random actions, `invalid` of them broken on purpose.
+
+    `sizes` sets the mean array length of the payloads of an action.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        invalid: float = 0.0,
+        sizes: Optional[Dict[str, float]] = None,
+        array_length: float = DEFAULT_ARRAY_LENGTH,
+        call_results: float = 0.5,
+    ):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.invalid = invalid
+        self.sizes = sizes or {}
+        self.array_length = array_length
+        self.call_results = call_results
+        """call_results: share of the valid frames that are CallResults"""
+        self.generator = PayloadGenerator(self.rng, array_length)
+        self.actions: Counter = Counter()
+        self.mutations: Counter = Counter()
+
+    def payload(self, message_type_id: int, action: str) -> Dict:
+        self.generator.array_length = self.sizes.get(action, self.array_length)
+        return self.generator.generate(schema_for(message_type_id, action))
+
+    def message(self) -> Tuple[int, str, Dict]:
+        if self.rng.random() < self.call_results:
+            message_type_id, action = MessageType.CallResult, self.rng.choice(CP_CALLS)
+        else:
+            message_type_id, action = MessageType.Call, self.rng.choice(CSMS_CALLS)
+        action = action.value
+        return message_type_id, action, self.payload(message_type_id, action)
+
+    def frame(self, message_type_id: int, action: str, payload: Dict) -> str:
+        unique_id = str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+        if message_type_id == MessageType.Call:
+            return Call(unique_id, action, payload).to_json()
+        return CallResult(unique_id, payload, action).to_json()
+
+    def frames(self, count: int) -> Iterator[Tuple[str, Optional[str]]]:
+        """Frames with the mutation that broke them, None for valid ones."""
+        for _ in range(count):
+            message_type_id, action, payload = self.message()
+            self.actions[action] += 1
+            mutation = None
+            if self.rng.random() < self.invalid:
+                mutation, payload = self.mutate(message_type_id, action, payload)
+            if mutation == "malformed":
+                frame = self.frame(message_type_id, action, payload)
+                yield frame[: self.rng.randint(1, len(frame) - 1)], mutation
+                continue
+            yield self.frame(message_type_id, action, payload), mutation
+
+    def mutate(
+        self, message_type_id: int, action: str, payload: Dict
+    ) -> Tuple[str, Dict]:
+        """Break a payload so it fails validation, or the frame when it can't."""
+        schema = schema_for(message_type_id, action)
+        for mutation in self.rng.sample(MUTATIONS, len(MUTATIONS)):
+            if mutation == "malformed":
+                break
+            mutated = copy.deepcopy(payload)
+            if getattr(self, f"_{mutation}")(schema, mutated) and not is_valid(
+                message_type_id, action, mutated
+            ):
+                self.mutations[mutation] += 1
+                return mutation, mutated
+        self.mutations["malformed"] += 1
+        return "malformed", payload
+
+    def _missing_required(self, schema: Dict, payload: Dict) -> bool:
+        required = [name for name in schema.get("required", ()) if name in payload]
+        if not required:
+            return False
+        del payload[self.rng.choice(required)]
+        return True
+
+    def _wrong_type(self, schema: Dict, payload: Dict) -> bool:
+        if not payload:
+            return False
+        name = self.rng.choice(list(payload))
+        payload[name] = [] if isinstance(payload[name], str) else "wrong"
+        return True
+
+    def _unknown_property(self, schema: Dict, payload: Dict) -> bool:
+        payload["unknownProperty"] = self.generator.word(8)
+        return True
+
+    def _bad_enum(self, schema: Dict, payload: Dict) -> bool:
+        names = [
+            name
+            for name, property_schema in schema.get("properties", {}).items()
+            if "enum" in property_schema and name in payload
+        ]
+        if not names:
+            return False
+        payload[self.rng.choice(names)] = "NotInEnum"
+        return True
+
+    def _too_long(self, schema: Dict, payload: Dict) -> bool:
+        names = [
+            (name, property_schema["maxLength"])
+            for name, property_schema in schema.get("properties", {}).items()
+            if "maxLength" in property_schema and name in payload
+        ]
+        if not names:
+            return False
+        name, max_length = self.rng.choice(names)
+        payload[name] = "x" * (max_length + 1)
+        return True
+
+    def metadata(self) -> Dict:
+        return {
+            "seed": self.seed,
+            "invalid": self.invalid,
+            "array_length": self.array_length,
+            "sizes": self.sizes,
+            "actions": dict(self.actions),
+            "mutations": dict(self.mutations),
+        }
+
+
+def is_valid(message_type_id: int, action: str, payload: Dict) -> bool:
+    if message_type_id == MessageType.Call:
+        message = Call("0", action, copy.deepcopy(payload))
+    else:
+        message = CallResult("0", copy.deepcopy(payload), action)
+    try:
+        validate_payload(message, OCPP_VERSION)
+    except OCPPError:
+        return False
+    return True
+
+
+def write(path: Path, generator: CorpusGenerator, count: int) -> Dict:
+    """Write `count` frames to `path`, and their metadata next to it."""
+    invalid_lines = []
+    size = 0
+    with path.open("w") as file:
+        for line, (frame, mutation) in enumerate(generator.frames(count)):
+            if mutation is not None:
+                invalid_lines.append(line)
+            # frames are JSON, so they never hold a raw newline
+            file.write(frame)
+            file.write("\n")
+            size += len(frame) + 1
+    metadata = generator.metadata()
+    metadata.update(frames=count, bytes=size, invalid_lines=invalid_lines)
+    metadata_path(path).write_text(json.dumps(metadata))
+    return metadata
+
+
+def metadata_path(path: Path) -> Path:
+    return path.with_name(path.name + ".json")
+
+
+def read_frames(path: Path) -> Iterator[bytes]:
+    """Frames of a corpus, read from a memory map of the file."""
+    with path.open("rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as frames:
+        start = 0
+        while True:
+            end = frames.find(b"\n", start)
+            if end == -1:
+                return
+            yield frames[start:end]
+            start = end + 1
+
+
+def parse_sizes(values: List[str]) -> Dict[str, float]:
+    sizes = {}
+    for value in values:
+        action, _, size = value.partition("=")
+        sizes[action.strip()] = float(size)
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--invalid", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--array-length", type=float, default=DEFAULT_ARRAY_LENGTH)
+    parser.add_argument(
+        "--size", action="append", default=[], help="mean array length, ACTION=N"
+    )
+    args = parser.parse_args()
+    corpus = CorpusGenerator(
+        seed=args.seed,
+        invalid=args.invalid,
+        sizes=parse_sizes(args.size),
+        array_length=args.array_length,
+    )
+    metadata = write(args.out, corpus, args.count)
+    print(
+        f"{metadata['frames']} frames, {len(metadata['invalid_lines'])} invalid, "
+        f"{metadata['bytes']} bytes in {args.out}"
+    )
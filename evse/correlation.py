@@ -0,0 +1,146 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, Optional, Union
+
+from ocpp.messages import Call
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TTL = 120
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_SWEEP_BATCH = 100
+
+
+class RetiredReason(Enum):
+    answered = "answered"
+    expired = "expired"
+    evicted = "evicted"
+
+
+@dataclass
+class PendingCall:
+    unique_id: str
+    action: str
+    sent_at: float
+    request: Union[Call, Dict]
+    """request: the Call, or its payload"""
+    applied: asyncio.Event = field(default_factory=asyncio.Event)
+    """applied: set once the abstraction has seen the response"""
+
+    @property
+    def payload(self) -> Dict:
+        # a rendered Call only parses its frame when its payload is read
+        if isinstance(self.request, Call):
+            return self.request.payload
+        return self.request
+
+
+class CorrelationTable:
+    """
+    Outstanding Calls sent to the CSMS, by unique id.
+
+    Entries are kept in send order, so expired ones are always at the front
+    and a sweep only has to look at a batch of the oldest entries. Ids that
+    left the table are remembered for a while (bounded by `max_size`) so a
+    late or duplicated response can be told apart from an unknown one.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+        sweep_batch: int = DEFAULT_SWEEP_BATCH,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sweep_batch = sweep_batch
+        self.clock = clock
+        self._pending: Dict[str, PendingCall] = {}
+        self._retired: OrderedDict[str, RetiredReason] = OrderedDict()
+        self.late_responses = 0
+        self.duplicate_responses = 0
+        self.unknown_responses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, unique_id: str):
+        return unique_id in self._pending
+
+    def add(
+        self, unique_id: str, action: str, request: Union[Call, Dict]
+    ) -> PendingCall:
+        self.sweep()
+        pending = PendingCall(unique_id, action, self.clock(), request)
+        self._pending[unique_id] = pending
+        while len(self._pending) > self.max_size:
+            self._retire(next(iter(self._pending)), RetiredReason.evicted)
+            self.evicted += 1
+        return pending
+
+    def resolve(self, unique_id: str) -> Optional[PendingCall]:
+        """
+        Remove and return the Call a response belongs to.
+
+        Returns None, and counts the response, when the Call is not
+        outstanding anymore or was never sent.
+        """
+        pending = self._pending.pop(unique_id, None)
+        if pending is not None:
+            self._remember(unique_id, RetiredReason.answered)
+            return pending
+        match self._retired.get(unique_id):
+            case RetiredReason.answered:
+                self.duplicate_responses += 1
+                logger.warning("Duplicate response for %s", unique_id)
+            case RetiredReason.expired | RetiredReason.evicted:
+                self.late_responses += 1
+                logger.warning("Late response for %s", unique_id)
+            case None:
+                self.unknown_responses += 1
+                logger.warning("Response for unknown call %s", unique_id)
+        return None
+
+    def expire(self, unique_id: str):
+        """Give up on a Call, i.e.: after it timed out."""
+        if unique_id in self._pending:
+            self._retire(unique_id, RetiredReason.expired)
+            self.expired += 1
+
+    def sweep(self):
+        """Expire at most `sweep_batch` of the Calls that outlived the TTL."""
+        deadline = self.clock() - self.ttl
+        expired = []
+        for unique_id, pending in self._pending.items():
+            if pending.sent_at > deadline or len(expired) == self.sweep_batch:
+                break
+            expired.append(unique_id)
+        for unique_id in expired:
+            self._retire(unique_id, RetiredReason.expired)
+        self.expired += len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "outstanding": len(self._pending),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "late_responses": self.late_responses,
+            "duplicate_responses": self.duplicate_responses,
+            "unknown_responses": self.unknown_responses,
+        }
+
+    def _retire(self, unique_id: str, reason: RetiredReason):
+        del self._pending[unique_id]
+        self._remember(unique_id, reason)
+
+    def _remember(self, unique_id: str, reason: RetiredReason):
+        self._retired[unique_id] = reason
+        if len(self._retired) > self.max_size:
+            self._retired.popitem(last=False)
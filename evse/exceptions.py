@@ -4,3 +4,11 @@ class NoModelImplementedError(NotImplementedError):
 
 class NoHandlerImplementedError(NotImplementedError):
     pass
+
+
+class TransactionError(Exception):
+    pass
+
+
+class ProvisioningError(ValueError):
+    pass
@@ -5,12 +5,22 @@ RemoteStart
 RemoteStop
 Reset
 """
-from datetime import datetime
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
+import frames
+from clock import Clock, wall_clock
 from ocpp.messages import Call, CallError, CallResult
 from ocpp.v16 import call, call_result
-from ocpp.v16.enums import Action, ChargePointErrorCode, ChargePointStatus, ResetType
+from ocpp.v16.enums import (
+    Action,
+    ChargePointErrorCode,
+    ChargePointStatus,
+    ConfigurationStatus,
+    Measurand,
+    RemoteStartStopStatus,
+    ResetType,
+    UnitOfMeasure,
+)
 from structlog import get_logger
 from utils import HandlerType, handler
 
@@ -20,11 +30,11 @@ logger = get_logger(__name__)
 class CoreFeature:
     model = "unknown"
     vendor = "unknown"
+    clock: Clock = wall_clock
 
     # --------------- SENDING CALLS FROM THE CHARGE POINT
     @handler(Action.BootNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
     def boot_notification_payload(self, **data):
-        print(data)
         model = data.get("charge_point_model", self.model)
         vendor = data.get("charge_point_vendor", self.vendor)
         # get other optional attributes like firmware...
@@ -54,7 +64,40 @@ class CoreFeature:
             connector_id=connector_id,
             id_tag=rfid,
             meter_start=start,
-            timestamp=str(datetime.now()),
+            timestamp=self.clock.timestamp(),
+            reservation_id=kwargs.get("reservation_id", None),
+        )
+
+    @handler(Action.StopTransaction, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_stop_transaction(self, **kwargs):
+        return call.StopTransactionPayload(
+            meter_stop=kwargs["meter_stop"],
+            timestamp=self.clock.timestamp(),
+            transaction_id=kwargs["transaction_id"],
+            reason=kwargs.get("reason", None),
+            id_tag=kwargs.get("id_tag", None),
+        )
+
+    @handler(Action.MeterValues, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_meter_values(self, **kwargs):
+        sampled_value = [
+            {
+                "value": str(kwargs.get("voltage", 230)),
+                "measurand": Measurand.voltage,
+                "unit": UnitOfMeasure.v,
+            },
+            {
+                "value": str(kwargs.get("current", 0)),
+                "measurand": Measurand.current_import,
+                "unit": UnitOfMeasure.a,
+            },
+        ]
+        return call.MeterValuesPayload(
+            connector_id=kwargs.get("connector_id", 1),
+            transaction_id=kwargs.get("transaction_id", None),
+            meter_value=[
+                {"timestamp": self.clock.timestamp(), "sampled_value": sampled_value}
+            ],
         )
 
     @handler(Action.Heartbeat, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
@@ -63,7 +106,9 @@ class CoreFeature:
 
     @handler(Action.Authorize, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
     def on_authorize(self, **kwargs):
-        return call.AuthorizePayload(id_tag=kwargs.get("id_tag", ""))
+        return call.AuthorizePayload(
+            id_tag=kwargs.get("id_tag", kwargs.get("rfid", ""))
+        )
 
     # --------------- RECEIVING CALLS FROM THE CENTRAL SYSTEM
     @handler(Action.BootNotification, HandlerType.ON_CALL_RESPONSE_FROM_CSMS)
@@ -72,62 +117,74 @@ class CoreFeature:
         logger.warning("After receiving BootNotification.CallResult")
 
     @handler(Action.ChangeConfiguration, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
-    def on_change_configuration(self, key: str, value: Any):
-        return call_result.ChangeConfigurationPayload(
-            status=call_result.ConfigurationStatus.accepted
-        )
+    def on_change_configuration(
+        self,
+        key: str,
+        value: Any,
+        status: ConfigurationStatus = ConfigurationStatus.not_supported,
+        **kwargs,
+    ):
+        return call_result.ChangeConfigurationPayload(status=status)
 
     @handler(Action.GetConfiguration, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
-    def on_get_configuration(self, **kwargs):
-        logger.info(f"On get config with {kwargs}")
-        config = {
-            "HeartbeatInterval": 100,
-            "MeterValuesSampledData": 10,
-            "MeterValueSampleInterval": ["Power.Active.Import"],
-            "NumberOfConnectors": 1,
-            "AuthorizeRemoteTxRequests": "false",
-        }
+    def on_get_configuration(
+        self,
+        key: Optional[List[str]] = None,
+        configuration_key: Optional[List[Dict]] = None,
+        unknown_key: Optional[List[str]] = None,
+        serialized: Optional[str] = None,
+        **kwargs,
+    ):
+        logger.debug("On get config with %s", key)
+        if serialized is not None:
+            # the abstraction kept the reply to a request for all keys
+            return frames.SerializedPayload(serialized)
+        if configuration_key is None:
+            # the abstraction did not look at the request, nothing is known
+            unknown_key = key
         return call_result.GetConfigurationPayload(
-            configuration_key=[
-                {"key": k, "readonly": False, "value": str(v)}
-                for k, v in config.items()
-            ]
+            configuration_key=configuration_key or None, unknown_key=unknown_key or None
         )
 
     @handler(Action.RemoteStartTransaction, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
     def on_remote_start_transaction(
+        self,
         id_tag: str,
         connector_id: Optional[int] = None,
         charging_profile: Optional[Dict] = None,
+        **kwargs,
     ):
-        return call_result.RemoteStartTransactionPayload()
+        return call_result.RemoteStartTransactionPayload(
+            status=RemoteStartStopStatus.rejected
+        )
 
     @handler(Action.RemoteStopTransaction, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
-    def on_remote_stop_transaction(transaction_id: str):
-        return call_result.RemoteStopTransactionPayload()
+    def on_remote_stop_transaction(
+        self, transaction_id: int, accepted: bool = False, **kwargs
+    ):
+        status = RemoteStartStopStatus.accepted
+        if not accepted:
+            status = RemoteStartStopStatus.rejected
+        return call_result.RemoteStopTransactionPayload(status=status)
 
     @handler(Action.Reset, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
     def on_reset(type: ResetType):
         return call_result.ResetPayload()
 
     # --------------- ACTIONS AFTER REPLYING TO CENTRAL SYSTEM
-    @handler(Action.StartTransaction, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
-    def handle_start_transaction_response(
-        self, request: Call, response: Union[CallResult, CallError], **kwargs
-    ):
-        pass
-
     @handler(Action.RemoteStartTransaction, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
-    def on_remote_start_transaction(
+    def after_remote_start_transaction(
         self, request: Call, response: Union[CallResult, CallError], **kwargs
     ):
         pass
 
     @handler(Action.RemoteStopTransaction, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
-    def on_remote_stop_transaction(
+    def after_remote_stop_transaction(
         self, request: Call, response: Union[CallResult, CallError], **kwargs
     ):
-        pass
+        if not kwargs:
+            return
+        return self.payload_for_stop_transaction(**kwargs)
 
     @handler(Action.Reset, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
     def after_reset(
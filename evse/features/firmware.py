@@ -0,0 +1,40 @@
+"""
+GetDiagnostics
+UpdateFirmware
+DiagnosticsStatusNotification
+FirmwareStatusNotification
+"""
+from typing import Optional
+
+from ocpp.v16 import call, call_result
+from ocpp.v16.enums import Action, DiagnosticsStatus, FirmwareStatus
+from structlog import get_logger
+from utils import HandlerType, handler
+
+logger = get_logger(__name__)
+
+
+class FirmwareManagementFeature:
+    # --------------- SENDING CALLS FROM THE CHARGE POINT
+    @handler(
+        Action.DiagnosticsStatusNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP
+    )
+    def payload_for_diagnostics_status_notification(self, **kwargs):
+        status = kwargs.get("status", DiagnosticsStatus.idle)
+        return call.DiagnosticsStatusNotificationPayload(status=status)
+
+    @handler(Action.FirmwareStatusNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_firmware_status_notification(self, **kwargs):
+        status = kwargs.get("status", FirmwareStatus.idle)
+        return call.FirmwareStatusNotificationPayload(status=status)
+
+    # --------------- RECEIVING CALLS FROM THE CENTRAL SYSTEM
+    @handler(Action.GetDiagnostics, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def on_get_diagnostics(
+        self, location: str, file_name: Optional[str] = None, **kwargs
+    ):
+        return call_result.GetDiagnosticsPayload(file_name=file_name)
+
+    @handler(Action.UpdateFirmware, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def on_update_firmware(self, location: str, retrieve_date: str, **kwargs):
+        return call_result.UpdateFirmwarePayload()
@@ -0,0 +1,29 @@
+"""
+SendLocalList
+GetLocalListVersion
+"""
+from typing import Dict, List, Optional
+
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action, UpdateStatus, UpdateType
+from structlog import get_logger
+from utils import HandlerType, handler
+
+logger = get_logger(__name__)
+
+
+class LocalAuthListManagementFeature:
+    @handler(Action.SendLocalList, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def on_send_local_list(
+        self,
+        list_version: int,
+        update_type: UpdateType,
+        local_authorization_list: Optional[List[Dict]] = None,
+        status: UpdateStatus = UpdateStatus.not_supported,
+        **kwargs,
+    ):
+        return call_result.SendLocalListPayload(status=status)
+
+    @handler(Action.GetLocalListVersion, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def on_get_local_list_version(self, list_version: int = -1, **kwargs):
+        return call_result.GetLocalListVersionPayload(list_version=list_version)
@@ -42,7 +42,7 @@ class RemoteTriggerFeature:
             case MessageTrigger.boot_notification:
                 return self.boot_notification_payload(**kwargs)
             case MessageTrigger.status_notification:
-                return self.status_notification_payload(**kwargs)
+                return self.payload_for_status_notification(**kwargs)
             case _:
                 """
                 - MessageTrigger.heartbeat
@@ -50,5 +50,5 @@ class RemoteTriggerFeature:
                 - MessageTrigger.firmware_status_notification
                 """
                 raise NotImplementedError(
-                    "Nothing to do for %s", request.requested_message
+                    "Nothing to do for %s", trigger_message.requested_message
                 )
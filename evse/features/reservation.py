@@ -0,0 +1,53 @@
+"""
+ReserveNow
+CancelReservation
+"""
+from typing import Optional, Union
+
+from ocpp.messages import Call, CallError, CallResult
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action, CancelReservationStatus, ReservationStatus
+from structlog import get_logger
+from utils import HandlerType, handler
+
+logger = get_logger(__name__)
+
+
+class ReservationFeature:
+    @handler(Action.ReserveNow, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def on_reserve_now(
+        self,
+        connector_id: int,
+        expiry_date: str,
+        id_tag: str,
+        reservation_id: int,
+        parent_id_tag: Optional[str] = None,
+        status: ReservationStatus = ReservationStatus.rejected,
+        **kwargs,
+    ):
+        return call_result.ReserveNowPayload(status=status)
+
+    @handler(Action.CancelReservation, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def on_cancel_reservation(
+        self,
+        reservation_id: int,
+        status: CancelReservationStatus = CancelReservationStatus.rejected,
+        **kwargs,
+    ):
+        return call_result.CancelReservationPayload(status=status)
+
+    @handler(Action.ReserveNow, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_reserve_now(
+        self, request: Call, response: Union[CallResult, CallError], **kwargs
+    ):
+        if not kwargs:
+            return
+        return self.payload_for_status_notification(**kwargs)
+
+    @handler(Action.CancelReservation, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_cancel_reservation(
+        self, request: Call, response: Union[CallResult, CallError], **kwargs
+    ):
+        if not kwargs:
+            return
+        return self.payload_for_status_notification(**kwargs)
@@ -0,0 +1,115 @@
+"""
+Local stand-in for the file servers of a CSMS.
+
+Serves the files of a directory with GET and stores PUT uploads in it, both
+in chunks. Run it with:
+
+    python -m file_server --root /tmp/evse-files --firmware-size 52428800
+
+which also writes a synthetic `firmware.bin` of that size to download with
+UpdateFirmware at http://127.0.0.1:8080/firmware.bin, while GetDiagnostics
+can upload to http://127.0.0.1:8080/diagnostics/.
+"""
+import argparse
+import asyncio
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from structlog import get_logger
+from transfers import CHUNK_SIZE, read_body, read_headers
+
+logger = get_logger(__name__)
+
+
+def make_firmware(path: Path, size: int, chunk_size: int = CHUNK_SIZE):
+    chunk = bytes(range(256)) * (chunk_size // 256)
+    with path.open("wb") as file:
+        for offset in range(0, size, chunk_size):
+            file.write(chunk[: min(chunk_size, size - offset)])
+
+
+class FileServer:
+    def __init__(self, root: Path, chunk_size: int = CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.uploads = 0
+        self.downloads = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = await read_headers(reader)
+            path = self._path(target)
+            if path is None:
+                await self._respond(writer, 403)
+            elif method == "GET":
+                await self._send_file(writer, path)
+            elif method == "PUT":
+                await self._receive_file(reader, writer, headers, path)
+            else:
+                await self._respond(writer, 405)
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError) as error:
+            logger.info("File server request failed: %s", error)
+        finally:
+            writer.close()
+
+    def _path(self, target: str):
+        path = (self.root / unquote(urlsplit(target).path).lstrip("/")).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            return None
+        return path
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: Path):
+        if not path.is_file():
+            await self._respond(writer, 404)
+            return
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Length: {path.stat().st_size}\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        with path.open("rb") as file:
+            while chunk := file.read(self.chunk_size):
+                writer.write(chunk)
+                await writer.drain()
+        self.downloads += 1
+
+    async def _receive_file(self, reader, writer, headers: dict, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as file:
+            async for chunk in read_body(reader, headers, self.chunk_size):
+                file.write(chunk)
+        self.uploads += 1
+        await self._respond(writer, 201)
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int):
+        writer.write(
+            f"HTTP/1.1 {status} -\r\nContent-Length: 0\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+
+async def serve(root: Path, host: str, port: int):
+    server = await FileServer(root).start(host, port)
+    logger.info("Serving %s on %s:%s", root, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--root", type=Path, default=Path("/tmp/evse-files"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--firmware-size", type=int, default=0)
+    args = parser.parse_args()
+    if args.firmware_size:
+        args.root.mkdir(parents=True, exist_ok=True)
+        make_firmware(args.root / "firmware.bin", args.firmware_size)
+    asyncio.run(serve(args.root, args.host, args.port))
@@ -0,0 +1,235 @@
+"""
+Frames of the most frequent Calls, rendered from templates.
+
+Heartbeat, StatusNotification and MeterValues frames only differ in their
+unique id, timestamps and a few numbers. The first Call of a given shape
+goes through the full path of `ChargerHandler.create_call` (dataclass to
+dict, camel case, validation, JSON), and its frame is then cut into a
+template around the variable fields. Later Calls of the same shape render
+their frame by joining the template with those fields.
+
+The shape of a Call is everything but its variable fields, plus the types
+of the variable fields, so a Call whose variable fields would not validate
+never matches a template and takes the full path.
+"""
+import functools
+import json
+from collections import Counter
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ocpp.messages import Call, CallResult
+from ocpp.v16.enums import Action
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+Fields = List[Tuple[str, Any]]
+"""variable fields of a payload by their camel case key, in frame order"""
+
+RENDERERS: Dict[type, Callable[[Any], str]] = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+}
+
+
+def heartbeat_shape(payload) -> Tuple[Any, Fields]:
+    return (), []
+
+
+def status_notification_shape(payload) -> Tuple[Any, Fields]:
+    shape = (
+        payload.error_code,
+        payload.status,
+        payload.info,
+        payload.vendor_id,
+        payload.vendor_error_code,
+    )
+    return shape, [
+        ("connectorId", payload.connector_id),
+        ("timestamp", payload.timestamp),
+    ]
+
+
+def meter_values_shape(payload) -> Optional[Tuple[Any, Fields]]:
+    shape: List[Any] = []
+    fields: Fields = [("connectorId", payload.connector_id)]
+    for meter_value in payload.meter_value:
+        if not isinstance(meter_value, dict) or list(meter_value) != [
+            "timestamp",
+            "sampled_value",
+        ]:
+            return None
+        fields.append(("timestamp", meter_value["timestamp"]))
+        for sampled_value in meter_value["sampled_value"]:
+            shape.append(
+                tuple(
+                    (k, None if k == "value" else v) for k, v in sampled_value.items()
+                )
+            )
+            fields.append(("value", sampled_value.get("value")))
+        # where one meter value ends and the next starts
+        shape.append(None)
+    fields.append(("transactionId", payload.transaction_id))
+    return tuple(shape), fields
+
+
+SHAPES: Dict[str, Callable[[Any], Optional[Tuple[Any, Fields]]]] = {
+    Action.Heartbeat: heartbeat_shape,
+    Action.StatusNotification: status_notification_shape,
+    Action.MeterValues: meter_values_shape,
+}
+
+
+class RenderedCall(Call):
+    """Call that already has its frame, the payload is parsed if needed."""
+
+    def __init__(self, unique_id: str, action: str, frame: str):
+        self.unique_id = unique_id
+        self.action = action
+        self.frame = frame
+
+    @functools.cached_property
+    def payload(self) -> Dict:
+        return json.loads(self.frame)[3]
+
+    def to_json(self) -> str:
+        return self.frame
+
+    def __repr__(self):
+        return (
+            f"<Call - unique_id={self.unique_id}, action={self.action}, "
+            f"frame={self.frame}>"
+        )
+
+
+class SerializedPayload:
+    """Payload of a reply, already serialized to JSON."""
+
+    def __init__(self, payload: str):
+        self.payload = payload
+
+
+class RenderedCallResult(CallResult):
+    """CallResult that already has its frame, the payload is parsed if needed."""
+
+    def __init__(self, unique_id: str, action: str, payload: str):
+        self.unique_id = unique_id
+        self.action = action
+        self.frame = f"[3,{encode_basestring_ascii(unique_id)},{payload}]"
+
+    @functools.cached_property
+    def payload(self) -> Dict:
+        return json.loads(self.frame)[2]
+
+    def to_json(self) -> str:
+        return self.frame
+
+    def __repr__(self):
+        return (
+            f"<CallResult - unique_id={self.unique_id}, action={self.action}, "
+            f"frame={self.frame}>"
+        )
+
+
+class FrameTemplate:
+    def __init__(self, parts: List[str], renderers: List[Callable[[Any], str]]):
+        self.parts = parts
+        """parts: constant text around the unique id and each variable field"""
+        self.renderers = renderers
+
+    def render(self, unique_id: str, values: List[Any]) -> str:
+        pieces = [self.parts[0], encode_basestring_ascii(unique_id)]
+        for part, render, value in zip(self.parts[1:], self.renderers, values):
+            pieces.append(part)
+            pieces.append(render(value))
+        pieces.append(self.parts[-1])
+        return "".join(pieces)
+
+    @classmethod
+    def cut(cls, call: Call, fields: Fields) -> Optional["FrameTemplate"]:
+        """Template of a validated Call, None if a field can't be found in it."""
+        frame = call.to_json()
+        unique_id = encode_basestring_ascii(call.unique_id)
+        start = frame.index(unique_id)
+        parts, renderers = [frame[:start]], []
+        cursor = start + len(unique_id)
+        for key, value in fields:
+            render = RENDERERS[type(value)]
+            rendered = render(value)
+            try:
+                found = frame.index(f'"{key}":{rendered}', cursor)
+            except ValueError:
+                return None
+            value_start = found + len(key) + 3
+            parts.append(frame[cursor:value_start])
+            renderers.append(render)
+            cursor = value_start + len(rendered)
+        parts.append(frame[cursor:])
+        return cls(parts, renderers)
+
+
+class FrameTemplates:
+    """Templates of every shape seen so far, shared by all chargers."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._templates: Dict[Tuple, Optional[FrameTemplate]] = {}
+        self.rendered: Counter = Counter()
+        self.learned: Counter = Counter()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def render(self, action: str, payload, unique_id: str) -> Optional[RenderedCall]:
+        """Call for a payload of a known shape, None if it needs the full path."""
+        key_fields = self._key(action, payload)
+        if key_fields is None:
+            return None
+        template = self._templates.get(key_fields[0])
+        if template is None:
+            return None
+        values = [value for _, value in key_fields[1]]
+        self.rendered[action] += 1
+        return RenderedCall(unique_id, action, template.render(unique_id, values))
+
+    def learn(self, call: Call, payload):
+        """Keep the template of a Call that went through the full path."""
+        key_fields = self._key(call.action, payload)
+        if key_fields is None or key_fields[0] in self._templates:
+            return
+        if len(self._templates) >= self.max_size:
+            return
+        key, fields = key_fields
+        template = FrameTemplate.cut(call, fields)
+        if template is None:
+            logger.debug("No template for %s", call.action, action=call.action)
+        else:
+            self.learned[call.action] += 1
+        self._templates[key] = template
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "templates": len(self._templates),
+            "rendered": dict(self.rendered),
+            "learned": dict(self.learned),
+        }
+
+    @staticmethod
+    def _key(action: str, payload) -> Optional[Tuple[Tuple, Fields]]:
+        shape_of = SHAPES.get(action)
+        if shape_of is None:
+            return None
+        shaped = shape_of(payload)
+        if shaped is None:
+            return None
+        shape, fields = shaped
+        types = tuple(type(value) for _, value in fields)
+        if not all(t in RENDERERS or t is type(None) for t in types):
+            return None
+        # None fields are left out of frames, their absence is in the types
+        fields = [(key, value) for key, value in fields if value is not None]
+        return (action, shape, types), fields
+
+
+templates = FrameTemplates()
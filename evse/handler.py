@@ -1,30 +1,59 @@
 import asyncio
 import inspect
 from dataclasses import asdict
-from typing import Callable, Dict, Union
+from typing import Callable, Dict, Optional, Union
 
+import frames
 import structlog
 from exceptions import NoHandlerImplementedError
 from features.core import CoreFeature
+from features.firmware import FirmwareManagementFeature
+from features.local_auth import LocalAuthListManagementFeature
 from features.remote_trigger import RemoteTriggerFeature
+from features.reservation import ReservationFeature
 from features.smart_charging import SmartChargingFeature
 from ocpp.charge_point import camel_to_snake_case, remove_nones, snake_to_camel_case
 from ocpp.exceptions import NotSupportedError, OCPPError
 from ocpp.messages import Call, CallError, CallResult, MessageType, validate_payload
 from ocpp.v16 import ChargePoint
 from ocpp.v16.enums import Action
+from responses import ResponseCache
 from utils import HandlerType, create_route_map
 
 logger = structlog.get_logger(__name__)
 
 
+def call_error(msg: Call, error: Exception) -> CallError:
+    """The CallError replying to `msg`, with its action as CallResults have."""
+    response = msg.create_call_error(error)
+    response.action = msg.action
+    return response
+
+
 class ChargerHandler(
-    ChargePoint, CoreFeature, SmartChargingFeature, RemoteTriggerFeature
+    ChargePoint,
+    CoreFeature,
+    SmartChargingFeature,
+    RemoteTriggerFeature,
+    LocalAuthListManagementFeature,
+    ReservationFeature,
+    FirmwareManagementFeature,
 ):
-    def __init__(self, charger_id, connection, response_timeout=30):
+    def __init__(
+        self,
+        charger_id,
+        connection,
+        response_timeout=30,
+        clock=None,
+        responses: Optional[ResponseCache] = None,
+    ):
         super().__init__(
             id=charger_id, connection=connection, response_timeout=response_timeout
         )
+        if clock is not None:
+            self.clock = clock
+        self.responses = responses
+        """responses: where replies to CSMS Calls are kept for retransmits"""
         self.action_payload_map: Dict[Action, Callable] = create_route_map(
             self, HandlerType.BEFORE_CALL_REQUEST_FROM_CP
         )
@@ -41,14 +70,20 @@ class ChargerHandler(
 
     def create_payload(self, action, **kwargs):
         try:
-            logger.info(f"making payload for {action}")
+            logger.debug("making payload for %s", action, action=action)
             return self.action_payload_map[action](**kwargs)
         except KeyError:
             raise NoHandlerImplementedError(
                 "Nothing to do from models side for %s", action
             )
 
-    async def call_generator(self, payload, suppress=True, unique_id=None):
+    @staticmethod
+    def action_for(payload) -> str:
+        return payload.__class__.__name__[:-7]
+
+    async def call_generator(
+        self, payload, suppress=True, unique_id=None, timeout=None
+    ):
         """
         Generator that yields control:
         1. after Call for request is created
@@ -56,31 +91,45 @@ class ChargerHandler(
         """
         call: Call = self.create_call(payload, unique_id)
         yield call
-        response = await self.send_call(call)
+        response = await self.send_call(call, timeout)
         validated_response = self.handle_response(payload, call, response, suppress)
         yield validated_response
 
     def create_call(self, payload, unique_id=None) -> Call:
         """
         Create a Call for a given payload
+
+        Frequent Calls are rendered from a template when one of the same
+        shape was created before.
         """
-        camel_case_payload = snake_to_camel_case(asdict(payload))
+        action = self.action_for(payload)
         unique_id = (
             unique_id if unique_id is not None else str(self._unique_id_generator())
         )
+        call = frames.templates.render(action, payload, unique_id)
+        if call is not None:
+            return call
+        camel_case_payload = snake_to_camel_case(asdict(payload))
         call = Call(
             unique_id=unique_id,
-            action=payload.__class__.__name__[:-7],
+            action=action,
             payload=remove_nones(camel_case_payload),
         )
         validate_payload(call, self._ocpp_version)
+        frames.templates.learn(call, payload)
         return call
 
-    async def send_call(self, call: Union[Call, CallResult, CallError]):
+    async def send_call(
+        self, call: Union[Call, CallResult, CallError], timeout: Optional[float] = None
+    ):
         """
         Send a Call request and wait a response through a channel that only
         allows one call to go through at a time.
+
+        Waits `timeout` seconds for the response, or the handler's default.
         """
+        if timeout is None:
+            timeout = self._response_timeout
         # Use a lock to prevent make sure that only 1 message can be send at a
         # a time.
         async with self._call_lock:
@@ -89,16 +138,17 @@ class ChargerHandler(
             await self._send(message)
             if isinstance(call, CallError) or isinstance(call, CallResult):
                 logger.debug("Message is CallError | CallResult - not expecting reply")
+                if self.responses is not None:
+                    self.responses.put(
+                        call.unique_id, getattr(call, "action", None), message
+                    )
                 return
             try:
-                response = await self._get_specific_response(
-                    call.unique_id, self._response_timeout
-                )
+                response = await self._get_specific_response(call.unique_id, timeout)
                 return response
             except asyncio.TimeoutError:
                 raise asyncio.TimeoutError(
-                    f"Waited {self._response_timeout}s for response on "
-                    f"{call.to_json()}."
+                    f"Waited {timeout}s for response on {call.to_json()}."
                 )
 
     def handle_response(
@@ -124,12 +174,18 @@ class ChargerHandler(
     def put_in_response_queue(self, message):
         self._response_queue.put_nowait(message)
 
-    async def on_message_handler(self, msg: Call) -> Union[CallResult, CallError]:
+    async def on_message_handler(
+        self, msg: Call, **kwargs
+    ) -> Union[CallResult, CallError]:
         """
         Handles a message by using the handler function in `on_request_map`
         and returns a Call | CallError.
+
+        Keyword arguments are data from the abstraction and are passed to the
+        handler function along with the payload. The Call was validated on
+        its way in, validating it again would fail on the Decimals ocpp parses
+        SetChargingProfile and RemoteStartTransaction floats into.
         """
-        validate_payload(msg, self._ocpp_version)
         snake_case_payload = camel_to_snake_case(msg.payload)
         try:
             handler = self.on_request_map[msg.action]
@@ -140,18 +196,26 @@ class ChargerHandler(
             )
 
         try:
-            response = handler(**snake_case_payload)
+            response = handler(**snake_case_payload, **kwargs)
             if inspect.isawaitable(response):
                 response = await response
             return response
         except Exception as e:
-            logger.exception("Error while handling request '%s'", msg)
-            response = msg.create_call_error(e)
+            logger.exception(
+                "Error while handling request",
+                action=msg.action,
+                unique_id=msg.unique_id,
+            )
+            response = call_error(msg, e)
             return response
 
     def prepare_response(
         self, msg: Call, response: Union[CallResult, CallError]
     ) -> CallResult:
+        if isinstance(response, frames.SerializedPayload):
+            return frames.RenderedCallResult(
+                msg.unique_id, msg.action, response.payload
+            )
         temp_response_payload = asdict(response)
         response_payload = remove_nones(temp_response_payload)
         camel_case_payload = snake_to_camel_case(response_payload)
@@ -164,7 +228,9 @@ class ChargerHandler(
     async def _handle_call(self, msg: Call):
         self.handle_csms_call(msg=msg)
 
-    async def handle_csms_call(self, msg: Call) -> Union[CallResult, CallError]:
+    async def handle_csms_call(
+        self, msg: Call, **kwargs
+    ) -> Union[CallResult, CallError]:
         """
         Receives a Call and call the respective handler functions.
 
@@ -174,11 +240,18 @@ class ChargerHandler(
         4. follow_request function
         """
         try:
-            handled_output = await self.on_message_handler(msg)
+            handled_output = await self.on_message_handler(msg, **kwargs)
         except (OCPPError, NotSupportedError) as error:
-            logger.exception("Error while handling request '%s'", msg)
-            response = msg.create_call_error(error).to_json()
-            await self._send(response)
+            logger.exception(
+                "Error while handling request",
+                action=msg.action,
+                unique_id=msg.unique_id,
+            )
+            await self.send_call(call_error(msg, error))
+            return
+        if isinstance(handled_output, CallError):
+            # the handler failed, there is no payload to reply with
+            await self.send_call(handled_output)
             return
         response = self.prepare_response(msg, handled_output)
         logger.debug("%s sending: %s", self.id, response)
@@ -192,4 +265,4 @@ class ChargerHandler(
             handler = self.follow_request_map[request.action]
             return handler(request, response, **kwargs)
         except KeyError:
-            logger.debug(f"There is nothing to do after handling {request.action}")
+            logger.debug("There is nothing to do after handling %s", request.action)
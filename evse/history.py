@@ -0,0 +1,206 @@
+"""
+Exchanged messages, recorded column by column.
+
+Every message `EVSE.log_payload` sees becomes a row of fixed width columns
+(timestamp, latency, charger index, action code and message type) kept in
+`array`s, and the message itself is kept apart. Exporting turns the columns
+into NumPy arrays without copying them row by row, so per-action latency and
+throughput over millions of messages are vectorized.
+
+At most `EVSE_HISTORY_MAX_ROWS` rows are kept: once full, the oldest half
+is dropped, so recording stays amortized constant time.
+
+`save` writes the columns to a `.npz` file and the frames, one per line in
+row order, to a `.ndjson` file next to it, the format `corpus.read_frames`
+streams. NumPy is only needed to export and query, not to record.
+"""
+import math
+import os
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from ocpp.messages import Call, CallError, CallResult
+from ocpp.v16.enums import Action
+
+ACTIONS: List[str] = ["", *(action.value for action in Action)]
+"""ACTIONS: action names by code, 0 for messages without a known action"""
+ACTION_CODES: Dict[str, int] = {action: code for code, action in enumerate(ACTIONS)}
+DEFAULT_MAX_ROWS = int(os.getenv("EVSE_HISTORY_MAX_ROWS", 1_000_000))
+
+
+def numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError("Exporting the history needs numpy installed") from error
+    return numpy
+
+
+class History:
+    def __init__(self, max_rows: int = DEFAULT_MAX_ROWS):
+        self.max_rows = max_rows
+        self.dropped = 0
+        self.timestamps = array("d")
+        self.latencies = array("d")
+        """latencies: seconds to the response, NaN for rows that are not one"""
+        self.chargers = array("I")
+        self.actions = array("H")
+        self.message_types = array("B")
+        self.messages: List[Union[Call, CallResult, CallError]] = []
+        self.charger_ids: List[str] = []
+        self._charger_index: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.messages)
+
+    def record(
+        self,
+        charger_id: str,
+        message: Union[Call, CallResult, CallError],
+        timestamp: float,
+        latency: Optional[float] = None,
+        action: Optional[str] = None,
+    ):
+        if len(self.messages) >= self.max_rows:
+            self.drop_oldest(max(len(self.messages) // 2, 1))
+        index = self._charger_index.get(charger_id)
+        if index is None:
+            index = self._charger_index[charger_id] = len(self.charger_ids)
+            self.charger_ids.append(charger_id)
+        action = action or getattr(message, "action", None) or ""
+        self.timestamps.append(timestamp)
+        self.latencies.append(math.nan if latency is None else latency)
+        self.chargers.append(index)
+        self.actions.append(ACTION_CODES.get(action, 0))
+        self.message_types.append(message.message_type_id)
+        self.messages.append(message)
+
+    def drop_oldest(self, rows: int):
+        for column in (
+            self.timestamps,
+            self.latencies,
+            self.chargers,
+            self.actions,
+            self.message_types,
+            self.messages,
+        ):
+            del column[:rows]
+        self.dropped += rows
+
+    def clear(self):
+        self.__init__(self.max_rows)
+
+    def columns(self) -> "Columns":
+        np = numpy()
+        return Columns(
+            timestamp=np.frombuffer(self.timestamps, dtype=np.float64).copy(),
+            latency=np.frombuffer(self.latencies, dtype=np.float64).copy(),
+            charger=np.frombuffer(self.chargers, dtype=np.uint32).copy(),
+            action=np.frombuffer(self.actions, dtype=np.uint16).copy(),
+            message_type=np.frombuffer(self.message_types, dtype=np.uint8).copy(),
+            chargers=list(self.charger_ids),
+        )
+
+    def save(self, path: Path) -> Dict:
+        """Write the columns to `path`.npz and the frames to `path`.ndjson."""
+        columns = self.columns()
+        columns.save(path.with_suffix(".npz"))
+        with path.with_suffix(".ndjson").open("w") as file:
+            for message in self.messages:
+                file.write(message.to_json())
+                file.write("\n")
+        return {
+            "rows": len(columns),
+            "columns": str(path.with_suffix(".npz")),
+            "payloads": str(path.with_suffix(".ndjson")),
+        }
+
+
+@dataclass
+class Columns:
+    """NumPy arrays of a history, one entry per message."""
+
+    timestamp: "numpy.ndarray"
+    latency: "numpy.ndarray"
+    charger: "numpy.ndarray"
+    action: "numpy.ndarray"
+    message_type: "numpy.ndarray"
+    chargers: List[str]
+    """chargers: charger ids by index"""
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def save(self, path: Path):
+        np = numpy()
+        np.savez(
+            path,
+            timestamp=self.timestamp,
+            latency=self.latency,
+            charger=self.charger,
+            action=self.action,
+            message_type=self.message_type,
+            chargers=np.array(self.chargers, dtype=str),
+            actions=np.array(ACTIONS, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "Columns":
+        np = numpy()
+        with np.load(path) as data:
+            # action codes follow the Action enum of the ocpp that saved them
+            remap = np.array(
+                [ACTION_CODES.get(action, 0) for action in data["actions"]],
+                dtype=np.uint16,
+            )
+            return cls(
+                timestamp=data["timestamp"],
+                latency=data["latency"],
+                charger=data["charger"],
+                action=remap[data["action"]],
+                message_type=data["message_type"],
+                chargers=list(data["chargers"]),
+            )
+
+    def latency_by_action(self) -> Dict[str, Dict]:
+        """Latency statistics of the responses, by action."""
+        np = numpy()
+        answered = ~np.isnan(self.latency)
+        actions, latencies = self.action[answered], self.latency[answered]
+        order = np.argsort(actions, kind="stable")
+        actions, latencies = actions[order], latencies[order]
+        codes, starts, counts = np.unique(
+            actions, return_index=True, return_counts=True
+        )
+        stats = {}
+        for code, start, count in zip(codes, starts, counts):
+            samples = latencies[start : start + count]
+            p50, p95 = np.percentile(samples, [50, 95])
+            stats[ACTIONS[code]] = {
+                "count": int(count),
+                "mean": float(samples.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "max": float(samples.max()),
+            }
+        return stats
+
+    def throughput(self, interval: float = 1.0) -> Dict[str, "numpy.ndarray"]:
+        """Messages per `interval` seconds, by action, from the first message."""
+        np = numpy()
+        if not len(self):
+            return {}
+        buckets = ((self.timestamp - self.timestamp.min()) // interval).astype(np.int64)
+        width = int(buckets.max()) + 1
+        counts = np.bincount(
+            self.action.astype(np.int64) * width + buckets,
+            minlength=len(ACTIONS) * width,
+        ).reshape(len(ACTIONS), width)
+        return {
+            ACTIONS[code]: counts[code] for code in np.flatnonzero(counts.sum(axis=1))
+        }
+
+
+exchanges = History()
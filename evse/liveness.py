@@ -0,0 +1,152 @@
+"""
+Liveness of the connections to the CSMS, tracked from the traffic itself.
+
+Every frame received, pong and Heartbeat response marks a connection as
+seen. A single keepalive task per connection only pings the CSMS once the
+connection has been idle for `interval` seconds, so a charger sending
+MeterValues is never pinged, and asking whether a charger is up costs no
+round trip.
+
+A connection is `up` while it was seen in the last `interval + timeout`
+seconds, `stale` after that and `down` once closed. `fleet` keeps the
+liveness of every charger in the process.
+
+Configured with `EVSE_KEEPALIVE_INTERVAL` and `EVSE_KEEPALIVE_TIMEOUT`.
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from structlog import get_logger
+from websockets.exceptions import ConnectionClosed
+
+logger = get_logger(__name__)
+
+DEFAULT_INTERVAL = float(os.getenv("EVSE_KEEPALIVE_INTERVAL", 20))
+DEFAULT_TIMEOUT = float(os.getenv("EVSE_KEEPALIVE_TIMEOUT", 10))
+
+
+class LivenessState(str, Enum):
+    up = "up"
+    stale = "stale"
+    down = "down"
+
+
+class Liveness:
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        timeout: float = DEFAULT_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = clock
+        self.open = False
+        self.last_seen: Optional[float] = None
+        """last_seen: when anything was last received from the CSMS"""
+        self.last_pong: Optional[float] = None
+        self.last_heartbeat: Optional[float] = None
+        self.last_ping: Optional[float] = None
+        self.pings = 0
+        self.missed_pongs = 0
+
+    def opened(self):
+        self.open = True
+        self.last_seen = self.clock()
+
+    def closed(self):
+        self.open = False
+
+    def saw_frame(self):
+        self.last_seen = self.clock()
+
+    def saw_pong(self):
+        self.last_seen = self.last_pong = self.clock()
+
+    def saw_heartbeat(self):
+        self.last_seen = self.last_heartbeat = self.clock()
+
+    def state(self, now: Optional[float] = None) -> LivenessState:
+        if not self.open or self.last_seen is None:
+            return LivenessState.down
+        now = self.clock() if now is None else now
+        if now - self.last_seen > self.interval + self.timeout:
+            return LivenessState.stale
+        return LivenessState.up
+
+    def is_up(self) -> bool:
+        return self.state() == LivenessState.up
+
+    async def keepalive(self, connection):
+        """Ping the CSMS whenever the connection was idle for `interval`."""
+        while True:
+            idle = self.clock() - max(self.last_seen or 0, self.last_ping or 0)
+            if idle < self.interval:
+                await asyncio.sleep(self.interval - idle)
+                continue
+            self.pings += 1
+            self.last_ping = self.clock()
+            try:
+                pong = await connection.ping()
+                await asyncio.wait_for(pong, self.timeout)
+            except asyncio.TimeoutError:
+                self.missed_pongs += 1
+                logger.info("No pong in %ss", self.timeout)
+                continue
+            except ConnectionClosed:
+                self.closed()
+                return
+            self.saw_pong()
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        now = self.clock() if now is None else now
+
+        def ago(moment: Optional[float]) -> Optional[float]:
+            return None if moment is None else round(now - moment, 3)
+
+        return {
+            "state": self.state(now),
+            "last_seen": ago(self.last_seen),
+            "last_pong": ago(self.last_pong),
+            "last_heartbeat": ago(self.last_heartbeat),
+            "pings": self.pings,
+            "missed_pongs": self.missed_pongs,
+        }
+
+
+class Fleet:
+    """Liveness of every charger in the process, by charger id."""
+
+    def __init__(self):
+        self.chargers: Dict[str, Liveness] = {}
+
+    def __len__(self):
+        return len(self.chargers)
+
+    def register(self, charger_id: str, liveness: Liveness):
+        self.chargers[charger_id] = liveness
+
+    def unregister(self, charger_id: str):
+        self.chargers.pop(charger_id, None)
+
+    def health(self) -> Dict:
+        now = {}
+        chargers = {}
+        states: Counter = Counter()
+        for charger_id, liveness in self.chargers.items():
+            # chargers share a clock, read it once per clock
+            if liveness.clock not in now:
+                now[liveness.clock] = liveness.clock()
+            stats = chargers[charger_id] = liveness.stats(now[liveness.clock])
+            states[stats["state"]] += 1
+        return {
+            "summary": {state.value: states[state] for state in LivenessState},
+            "chargers": chargers,
+        }
+
+
+fleet = Fleet()
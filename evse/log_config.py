@@ -0,0 +1,189 @@
+"""
+Logging modes, selected at startup with `EVSE_LOG_MODE`.
+
+- default: structlog's development setup, rendered in the calling thread.
+- fast: level filtering before any formatting, per-action sampling and
+  rendering/writing in a background thread in batches.
+- off: every log call below critical is a no-op.
+
+Sampling is set with `EVSE_LOG_SAMPLING`, i.e.: "MeterValues=100,Heartbeat=10"
+keeps one in every 100 MeterValues events and one in every 10 Heartbeat
+events. Events are matched on their `action` key.
+"""
+import atexit
+import itertools
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from enum import Enum
+from typing import Dict, Optional, TextIO
+
+import structlog
+
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_MAX_QUEUED = 100_000
+
+
+class LogMode(str, Enum):
+    default = "default"
+    fast = "fast"
+    off = "off"
+
+
+class ActionSampler:
+    """Processor that keeps one in every N events of an action."""
+
+    def __init__(self, rates: Dict[str, int]):
+        self.rates = rates
+        self._counters = {action: itertools.count() for action in rates}
+
+    def __call__(self, logger, method_name, event_dict):
+        counter = self._counters.get(event_dict.get("action"))
+        if counter is not None and next(counter) % self.rates[event_dict["action"]]:
+            raise structlog.DropEvent
+        return event_dict
+
+
+def add_raw_timestamp(logger, method_name, event_dict):
+    """Cheaper than TimeStamper, the sink formats it later."""
+    event_dict["timestamp"] = time.time()
+    return event_dict
+
+
+class BackgroundSink:
+    """
+    structlog logger that renders and writes events in a separate thread.
+
+    Callers only pay for putting the event on a queue. The thread takes
+    everything that is queued, up to `batch_size` events, and writes them
+    with a single call. Beyond `max_queued` waiting events, new ones are
+    dropped and counted rather than piling up in memory.
+    """
+
+    _stop = object()
+
+    def __init__(
+        self,
+        file: TextIO = sys.stderr,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+    ):
+        self.file = file
+        self.batch_size = batch_size
+        self.renderer = structlog.dev.ConsoleRenderer(colors=False)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        """failed: events that could not be rendered"""
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __call__(self, *args):
+        """Act as logger factory too."""
+        return self
+
+    def msg(self, **event_dict):
+        try:
+            self._queue.put_nowait(event_dict)
+        except queue.Full:
+            self.dropped += 1
+
+    debug = info = warning = warn = error = critical = exception = msg
+    fatal = failure = err = log = msg
+
+    def close(self, timeout: float = 1):
+        if self._thread.is_alive():
+            try:
+                self._queue.put(self._stop, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def render(self, event_dict: Dict) -> str:
+        event_dict["timestamp"] = time.strftime(
+            "%Y-%m-%d %H:%M:%S", time.localtime(event_dict["timestamp"])
+        )
+        return self.renderer(None, None, event_dict)
+
+    def render_safely(self, event_dict: Dict) -> str:
+        try:
+            return self.render(event_dict)
+        except Exception as error:
+            # one bad event must not stop the thread and every later event
+            self.failed += 1
+            return f"Could not render {event_dict.get('event')!r}: {error!r}"
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = self._stop in batch
+            lines = [
+                self.render_safely(event) for event in batch if event is not self._stop
+            ]
+            if lines:
+                self.file.write("\n".join(lines) + "\n")
+                self.file.flush()
+                self.written += len(lines)
+            if stop:
+                return
+
+
+def parse_sampling(value: str) -> Dict[str, int]:
+    rates = {}
+    for item in filter(None, value.split(",")):
+        action, _, rate = item.partition("=")
+        rates[action.strip()] = max(int(rate), 1)
+    return rates
+
+
+def configure(
+    mode: LogMode = LogMode.default,
+    level: int = logging.INFO,
+    sampling: Optional[Dict[str, int]] = None,
+    file: TextIO = sys.stderr,
+) -> Optional[BackgroundSink]:
+    """Configure structlog for a mode, returning the sink of the fast mode."""
+    match LogMode(mode):
+        case LogMode.default:
+            structlog.reset_defaults()
+            return None
+        case LogMode.off:
+            # nothing in the emulator logs at critical
+            structlog.configure(
+                wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL),
+                cache_logger_on_first_use=True,
+            )
+            return None
+        case LogMode.fast:
+            sink = BackgroundSink(file)
+            structlog.configure(
+                processors=[
+                    ActionSampler(sampling or {}),
+                    structlog.processors.add_log_level,
+                    add_raw_timestamp,
+                    structlog.processors.format_exc_info,
+                    # no renderer: the event is handed over as keyword arguments
+                ],
+                wrapper_class=structlog.make_filtering_bound_logger(level),
+                logger_factory=sink,
+                cache_logger_on_first_use=True,
+            )
+            return sink
+
+
+def configure_from_env() -> Optional[BackgroundSink]:
+    return configure(
+        mode=os.getenv("EVSE_LOG_MODE", LogMode.default),
+        level=logging.getLevelName(os.getenv("EVSE_LOG_LEVEL", "INFO")),
+        sampling=parse_sampling(os.getenv("EVSE_LOG_SAMPLING", "")),
+    )
@@ -1,17 +1,51 @@
-import asyncio
 from copy import copy
+from pathlib import Path
 from typing import Optional
 
-import controller
-from fastapi import FastAPI, HTTPException, status
-from ocpp.v16.enums import Action, ChargePointErrorCode, ChargePointStatus
+import auth_store
+import connections
+import frames
+import history
+import liveness
+import log_config
+import models
+import provisioning
+import wire
+from client import ChargerClient
+from exceptions import TransactionError
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from meters import Resolution
+from ocpp.v16.enums import (
+    ChargePointErrorCode,
+    ChargePointStatus,
+    DiagnosticsStatus,
+    FirmwareStatus,
+    Reason,
+)
 from structlog import get_logger
 
+log_config.configure_from_env()
 logger = get_logger(__name__)
 
 BACKENDURL = "ws://localhost:8765"
 evse = FastAPI()
-charger = controller.EVSE()
+client = ChargerClient()
+charger = client.evse
+
+
+@evse.exception_handler(ConnectionError)
+async def not_connected(request: Request, error: ConnectionError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT, content={"detail": str(error)}
+    )
+
+
+@evse.exception_handler(TransactionError)
+async def invalid_transaction(request: Request, error: TransactionError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(error)}
+    )
 
 
 @evse.get("/whoami")
@@ -24,42 +58,142 @@ async def whoami():
 
 @evse.put("/setup")
 def setup(charger_id: str, number_connectors: int, password: str):
-    charger.create(charger_id, number_connectors, password)
-    return charger.abstraction
+    client.setup(charger_id, number_connectors, password)
+    return client.abstraction
 
 
 @evse.get("/is_up")
 async def connection_is_up():
-    if await charger.is_up():
-        return True
-    else:
-        return False
+    return await client.is_up()
+
+
+@evse.get("/fleet/health")
+async def fleet_health():
+    return liveness.fleet.health()
+
+
+@evse.put("/fleet/provision")
+def provision_fleet(path: str, replace: bool = False):
+    """Provision the chargers defined in a CSV, JSON Lines or JSON file."""
+    try:
+        report = provisioning.fleet.provision_file(Path(path), replace)
+    except (OSError, ValueError) as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return report.stats()
+
+
+@evse.get("/fleet/chargers")
+async def get_fleet_chargers():
+    return {
+        "chargers": len(provisioning.fleet),
+        "templates": len(provisioning.fleet.templates),
+    }
 
 
 @evse.get("/history")
 async def get_history():
-    return charger.exchange_buffer
+    return history.exchanges.messages
+
+
+@evse.put("/history/export")
+async def export_history(path: str):
+    """Write the history as NumPy columns and its frames next to them."""
+    try:
+        return history.exchanges.save(Path(path))
+    except ImportError as error:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(error)
+        )
+
+
+@evse.get("/configuration")
+async def get_configuration():
+    entries, _ = charger.abstraction.configuration.get_configuration()
+    return entries
+
+
+@evse.get("/outstanding_calls")
+async def get_outstanding_calls():
+    return charger.correlation.stats()
+
+
+@evse.get("/responses")
+async def get_responses():
+    return charger.responses.stats()
+
+
+@evse.get("/frames")
+async def get_frames():
+    return frames.templates.stats()
+
+
+@evse.get("/timeouts")
+async def get_timeouts():
+    return charger.timeouts.stats()
+
+
+@evse.put("/timeouts")
+async def configure_timeouts(floor: float, ceiling: float):
+    try:
+        charger.timeouts.configure(floor, ceiling)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return charger.timeouts.stats()
+
+
+@evse.get("/connections")
+async def get_connections():
+    return connections.dialer.stats()
+
+
+@evse.put("/connections")
+async def configure_connections(rate: float, burst: int, concurrency: int):
+    try:
+        connections.dialer.configure(rate, burst, concurrency)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return connections.dialer.stats()
+
+
+@evse.get("/outbound")
+async def get_outbound():
+    return charger.outbound.stats()
+
+
+@evse.get("/wire")
+async def get_wire(charger_id: Optional[str] = None, by_charger: bool = False):
+    """Raw and compressed bytes by direction, and by action or by charger."""
+    return wire.counters.stats(charger_id, by_charger)
+
+
+@evse.get("/wire/profiles")
+async def get_wire_profiles():
+    return wire.PROFILES
 
 
 @evse.post("/connect", status_code=status.HTTP_200_OK)
-async def connect(backend_url: str = BACKENDURL):
+async def connect(backend_url: str = BACKENDURL, compression: Optional[str] = None):
     try:
-        charger.connection = await charger.create_ws_connection(backend_url)
+        await client.connect(backend_url, compression)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
     except ConnectionRefusedError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    asyncio.create_task(charger.run())
 
 
 @evse.post("/bootnotification")
 async def boot_notification(model: str, vendor: str):
-    return await charger.send_message_to_backend(
-        Action.BootNotification, charge_point_model=model, charge_point_vendor=vendor
-    )
+    return await client.boot_notification(model, vendor)
 
 
 @evse.post("/authorize")
 async def authorize(rfid: str):
-    return await charger.send_message_to_backend(Action.Authorize, rfid=rfid)
+    return await client.authorize(rfid)
+
+
+@evse.get("/local_list")
+async def local_list():
+    return auth_store.store.stats()
 
 
 @evse.post("/data_transfer")
@@ -68,35 +202,73 @@ async def data_transfer():
 
 
 @evse.post("/diagnostics_status_notification")
-async def diagnostics_status_notification():
-    raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED)
+async def diagnostics_status_notification(status: Optional[DiagnosticsStatus] = None):
+    return await client.diagnostics_status_notification(status)
 
 
 @evse.post("/firmware_status_notification")
-async def firmware_status_notification():
-    raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED)
+async def firmware_status_notification(status: Optional[FirmwareStatus] = None):
+    return await client.firmware_status_notification(status)
 
 
 @evse.post("/heartbeat")
 async def heartbeat():
-    return await charger.send_message_to_backend(
-        Action.Heartbeat,
-    )
+    return await client.heartbeat()
+
+
+def meter_curves(
+    abstraction: models.Charger,
+    connector_id: Optional[int],
+    resolution: Resolution,
+    since: Optional[float],
+    until: Optional[float],
+):
+    """Energy and power curves of one connector, or of all by connector id."""
+    if connector_id is None:
+        return {
+            connector.id: connector.meter.query(resolution, since, until)
+            for connector in abstraction.connectors
+        }
+    try:
+        connector = abstraction.get_connector(connector_id)
+    except TransactionError as error:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+    return connector.meter.query(resolution, since, until)
+
+
+@evse.get("/meter_values")
+async def get_meter_values(
+    connector_id: Optional[int] = None,
+    resolution: Resolution = Resolution.raw,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    return meter_curves(client.abstraction, connector_id, resolution, since, until)
+
+
+@evse.get("/fleet/chargers/{charger_id}/meter_values")
+async def get_fleet_meter_values(
+    charger_id: str,
+    connector_id: Optional[int] = None,
+    resolution: Resolution = Resolution.raw,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    try:
+        abstraction = provisioning.fleet.chargers[charger_id]
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return meter_curves(abstraction, connector_id, resolution, since, until)
 
 
 @evse.post("/meter_values")
 async def meter_values(connector_id: int = 1, voltage: int = 230, current: int = 0):
-    return await charger.send_message_to_backend(
-        Action.MeterValues, connector_id, connector_id, voltage=voltage, current=current
-    )
+    return await client.meter_values(connector_id, voltage, current)
 
 
 @evse.post("/start_transaction")
 async def start_transaction(rfid: str, connector_id: int = 1, meter_start: int = 0):
-    # timestamp is required to send a start transaction
-    return await charger.send_message_to_backend(
-        Action.StartTransaction,
-    )
+    return await client.start_transaction(rfid, connector_id, meter_start)
 
 
 @evse.post("/status_notification")
@@ -105,18 +277,30 @@ async def status_notification(
     connector_id: int = 0,
     error: Optional[ChargePointErrorCode] = None,
 ):
-    return await charger.send_message_to_backend(
-        Action.StatusNotification,
-    )
+    return await client.status_notification(status, connector_id, error)
 
 
 @evse.post("/stop_transaction")
-async def stop_transaction():
-    return await charger.send_message_to_backend(
-        Action.StopTransaction,
+async def stop_transaction(
+    transaction_id: Optional[int] = None,
+    connector_id: Optional[int] = None,
+    meter_stop: Optional[int] = None,
+    reason: Optional[Reason] = None,
+    id_tag: Optional[str] = None,
+):
+    return await client.stop_transaction(
+        transaction_id, connector_id, meter_stop, reason, id_tag
     )
 
 
+@evse.get("/transactions/{transaction_id}")
+async def get_transaction(transaction_id: int):
+    key = charger.abstraction.transactions.find_by_transaction_id(transaction_id)
+    if key is None or key[0] != charger.abstraction.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return charger.abstraction.get_connector(key[1])
+
+
 @evse.get("/")
 async def root():
     return {"message": "Hello World"}
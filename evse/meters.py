@@ -0,0 +1,156 @@
+"""
+Meter readings of a connector, kept at several resolutions.
+
+Every MeterValues the charger sends is recorded on its connector: the power
+drawn (voltage times current) and the energy register, integrated from the
+power of the previous reading. Readings go to three ring buffers:
+
+- `raw`, the last `EVSE_METER_RAW_SAMPLES` readings;
+- `1m`, one row per minute, the last `EVSE_METER_MINUTES` of them;
+- `15m`, one row per quarter of an hour, the last `EVSE_METER_QUARTERS`.
+
+A downsampled row has the start of its interval, the energy register at its
+last reading and the mean power of its readings. Rows live in `array`s that
+stop growing once full and are then overwritten oldest first, so a connector
+never holds more than 24 bytes per row however long the run lasts. The
+arrays are only allocated on the first reading.
+"""
+import os
+from array import array
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_RAW_SAMPLES = int(os.getenv("EVSE_METER_RAW_SAMPLES", 720))
+DEFAULT_MINUTES = int(os.getenv("EVSE_METER_MINUTES", 1440))
+DEFAULT_QUARTERS = int(os.getenv("EVSE_METER_QUARTERS", 2976))
+
+
+class Resolution(str, Enum):
+    raw = "raw"
+    minute = "1m"
+    quarter = "15m"
+
+
+INTERVALS = {Resolution.minute: 60, Resolution.quarter: 900}
+"""INTERVALS: seconds covered by a row of each downsampled resolution"""
+
+Row = Tuple[float, float, float]
+
+
+class Ring:
+    """The last `capacity` rows of timestamp, energy (Wh) and power (W)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array("d")
+        self.energy = array("d")
+        self.power = array("d")
+        self._oldest = 0
+        """_oldest: once full, the slot the next row overwrites"""
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, energy: float, power: float):
+        if self.capacity <= 0:
+            return
+        if len(self.timestamps) < self.capacity:
+            self.timestamps.append(timestamp)
+            self.energy.append(energy)
+            self.power.append(power)
+            return
+        slot = self._oldest
+        self.timestamps[slot] = timestamp
+        self.energy[slot] = energy
+        self.power[slot] = power
+        self._oldest = (slot + 1) % self.capacity
+
+    def rows(self) -> Iterator[Row]:
+        """Rows from the oldest to the newest."""
+        size = len(self.timestamps)
+        for i in range(size):
+            slot = (self._oldest + i) % size
+            yield self.timestamps[slot], self.energy[slot], self.power[slot]
+
+
+class MeterSeries:
+    def __init__(
+        self,
+        raw: int = DEFAULT_RAW_SAMPLES,
+        minutes: int = DEFAULT_MINUTES,
+        quarters: int = DEFAULT_QUARTERS,
+    ):
+        self.capacities = {
+            Resolution.raw: raw,
+            Resolution.minute: minutes,
+            Resolution.quarter: quarters,
+        }
+        self.rings: Optional[Dict[Resolution, Ring]] = None
+        self._open: Dict[Resolution, List[float]] = {}
+        """_open: start, energy, power sum and readings of the rows filling up"""
+        self._last: Optional[Tuple[float, float]] = None
+        self.energy = 0.0
+        """energy: the register, in Wh"""
+
+    def __len__(self):
+        return 0 if self.rings is None else len(self.rings[Resolution.raw])
+
+    def record(self, timestamp: float, power: float, energy: Optional[float] = None):
+        """A reading of `power` W, and of the register if the meter has one."""
+        if self.rings is None:
+            self.rings = {
+                resolution: Ring(capacity)
+                for resolution, capacity in self.capacities.items()
+            }
+        if energy is None:
+            energy = self.energy
+            if self._last is not None:
+                # the previous power was drawn until this reading
+                last_timestamp, last_power = self._last
+                energy += last_power * max(timestamp - last_timestamp, 0) / 3600
+        self.energy = energy
+        self._last = (timestamp, power)
+        self.rings[Resolution.raw].append(timestamp, energy, power)
+        for resolution, seconds in INTERVALS.items():
+            start = timestamp - timestamp % seconds
+            row = self._open.get(resolution)
+            if row is not None and row[0] != start:
+                self._close(resolution)
+                row = None
+            if row is None:
+                row = self._open[resolution] = [start, energy, 0.0, 0]
+            row[1] = energy
+            row[2] += power
+            row[3] += 1
+
+    def _close(self, resolution: Resolution):
+        start, energy, power, readings = self._open.pop(resolution)
+        self.rings[resolution].append(start, energy, power / readings)
+
+    def rows(self, resolution: Resolution) -> List[Row]:
+        if self.rings is None:
+            return []
+        rows = list(self.rings[resolution].rows())
+        row = self._open.get(resolution)
+        if row is not None:
+            # the current interval, so far
+            rows.append((row[0], row[1], row[2] / row[3]))
+        return rows
+
+    def query(
+        self,
+        resolution: Resolution = Resolution.raw,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Dict[str, List[float]]:
+        """Energy and power curves between `since` and `until`, both included."""
+        rows = [
+            row
+            for row in self.rows(resolution)
+            if (since is None or row[0] >= since) and (until is None or row[0] <= until)
+        ]
+        return {
+            "timestamps": [row[0] for row in rows],
+            "energy": [row[1] for row in rows],
+            "power": [row[2] for row in rows],
+        }
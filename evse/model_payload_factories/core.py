@@ -1,35 +1,96 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 
-from ocpp.v16.enums import Action
+from clock import Clock, wall_clock
+from configuration import ConfigurationRegistry
+from ocpp.messages import Call, CallError, CallResult
+from ocpp.v16 import call_result
+from ocpp.v16.enums import (
+    Action,
+    AuthorizationStatus,
+    ChargePointStatus,
+    ConfigurationStatus,
+    Reason,
+    RegistrationStatus,
+    RemoteStartStopStatus,
+)
+from scheduler import ScheduledEvent, scheduler
 from structlog import get_logger
 from utils import HandlerType, handler
 
 logger = get_logger(__name__)
 
 DEFAULT_FIRMWARE = "virtual firmware 1.0.0"
-DEFAULT_HEARTBEAT_INTERVAL = 3600
-DEFAULT_METER_VALUES_INTERVAL = 30
-DEFAULT_METER_VALUES_SAMPLE_INTERVAL = ["Power.Active.Import"]
 
 
 class Core:
-    # configurations
-    heartbeat_interval: int
-    meter_values_interval: int
-    meter_values_sample_data: List
-    configuration: Dict
+    configuration: ConfigurationRegistry
+    firmware_version: str = DEFAULT_FIRMWARE
+    charge_point_vendor: Optional[str] = None
+    charge_point_model: Optional[str] = None
+    clock: Clock = wall_clock
 
     def __init__(self) -> None:
-        self.heartbeat_interval = DEFAULT_HEARTBEAT_INTERVAL
-        self.meter_values_interval = DEFAULT_METER_VALUES_INTERVAL
-        self.meter_values_sample_data = DEFAULT_METER_VALUES_SAMPLE_INTERVAL
-        self.configuration = {}
+        self.configuration = ConfigurationRegistry()
+        self._heartbeat: Optional[ScheduledEvent] = None
+        super().__init__()
+
+    @property
+    def heartbeat_interval(self) -> int:
+        return self.configuration["HeartbeatInterval"]
+
+    @property
+    def meter_values_interval(self) -> int:
+        return self.configuration["MeterValueSampleInterval"]
+
+    @property
+    def meter_values_sample_data(self) -> List[str]:
+        return self.configuration["MeterValuesSampledData"]
+
+    def schedule_heartbeat(self):
+        """Send a Heartbeat every HeartbeatInterval, from now on."""
+        if self._heartbeat is not None:
+            scheduler.cancel(self._heartbeat)
+            self._heartbeat = None
+        if self.heartbeat_interval > 0:
+            self._heartbeat = scheduler.call_later(
+                self.heartbeat_interval, self.send_heartbeat
+            )
+
+    def send_heartbeat(self):
+        self._heartbeat = None
+        if self.outbox is not None:
+            self.outbox(Action.Heartbeat)
+        self.schedule_heartbeat()
+
+    def schedule_meter_values(self, connector):
+        """Sample the connector every MeterValueSampleInterval during its transaction."""
+        if self.meter_values_interval > 0 and connector.transaction is not None:
+            scheduler.call_later(
+                self.meter_values_interval,
+                self.send_meter_values,
+                connector.id,
+                connector.transaction.id,
+            )
+
+    def send_meter_values(self, connector_id: int, transaction_id: int):
+        connector = self.get_connector(connector_id)
+        if connector.transaction is None or connector.transaction.id != transaction_id:
+            # the transaction is over, and so is sampling it
+            return
+        if self.outbox is not None:
+            self.outbox(Action.MeterValues, connector_id=connector_id)
+        self.schedule_meter_values(connector)
 
     # --------------- SENDING CALLS FROM THE CHARGE POINT
     @handler(Action.BootNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
     def payload_for_boot_notification(self, **kwargs):
-        logger.info("model boot notification before request from cp")
-        kwargs.update({"firmware": DEFAULT_FIRMWARE})
+        logger.debug("model boot notification before request from cp")
+        kwargs.update({"firmware": self.firmware_version})
+        # a vendor and model given with the Call win over provisioned ones
+        if self.charge_point_vendor is not None:
+            kwargs.setdefault("charge_point_vendor", self.charge_point_vendor)
+        if self.charge_point_model is not None:
+            kwargs.setdefault("charge_point_model", self.charge_point_model)
         return kwargs
 
     @handler(Action.Heartbeat, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
@@ -38,29 +99,149 @@ class Core:
 
     @handler(Action.StatusNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
     def payload_for_status_notification(self, **kwargs):
+        connector_id = kwargs.get("connector_id", 0)
+        if connector_id and "status" in kwargs:
+            self.get_connector(connector_id).status = kwargs["status"]
+        return kwargs
+
+    @handler(Action.StartTransaction, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_start_transaction(self, **kwargs):
+        connector = self.get_connector(kwargs.get("connector_id", 1))
+        kwargs["reservation_id"] = self.claim_reservation(connector, kwargs.get("rfid"))
+        connector.begin_transaction(kwargs.get("rfid"), kwargs.get("meter_start", 0))
         return kwargs
 
+    @handler(Action.StopTransaction, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_stop_transaction(
+        self,
+        transaction_id: Optional[int] = None,
+        connector_id: Optional[int] = None,
+        meter_stop: Optional[int] = None,
+        reason: Optional[Reason] = None,
+        id_tag: Optional[str] = None,
+        **kwargs,
+    ):
+        connector = self.connector_for_transaction(transaction_id, connector_id, id_tag)
+        transaction = connector.transaction
+        if meter_stop is None:
+            meter_stop = transaction.meter_stop
+        connector.finish_transaction(meter_stop)
+        return {
+            "transaction_id": transaction.id,
+            "meter_stop": meter_stop,
+            "id_tag": transaction.rfid,
+            "reason": reason,
+        }
+
+    @handler(Action.MeterValues, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_meter_values(self, **kwargs):
+        connector = self.get_connector(kwargs.get("connector_id", 1))
+        if connector.transaction is not None:
+            kwargs["transaction_id"] = connector.transaction.id
+        connector.meter.record(
+            self.clock.time(), kwargs.get("voltage", 230) * kwargs.get("current", 0)
+        )
+        return kwargs
+
+    # --------------- RECEIVING CALL RESPONSES FROM THE CENTRAL SYSTEM
+    @handler(Action.BootNotification, HandlerType.ON_CALL_RESPONSE_FROM_CSMS)
+    def handler_for_boot_notification_response(
+        self, call: Call, response: Optional[call_result.BootNotificationPayload]
+    ):
+        if response is None or response.status != RegistrationStatus.accepted:
+            return
+        if response.interval > 0:
+            self.configuration.override("HeartbeatInterval", response.interval)
+        self.schedule_heartbeat()
+
+    @handler(Action.StartTransaction, HandlerType.ON_CALL_RESPONSE_FROM_CSMS)
+    def handler_for_start_transaction_response(
+        self, call: Call, response: Optional[call_result.StartTransactionPayload]
+    ):
+        connector = self.get_connector(call.payload["connectorId"])
+        if response is None:
+            logger.warning("StartTransaction on connector %s failed", connector.id)
+            connector.end_transaction()
+            return
+        self.cache_authorization(call.payload["idTag"], response.id_tag_info)
+        accepted = response.id_tag_info.get("status") == AuthorizationStatus.accepted
+        connector.confirm_transaction(response.transaction_id, accepted)
+        self.transactions.add(
+            self.id, connector.id, response.transaction_id, call.payload["idTag"]
+        )
+        if accepted:
+            self.schedule_meter_values(connector)
+        elif self.configuration["StopTransactionOnInvalidId"]:
+            self.stop_deauthorized(connector)
+
+    def stop_deauthorized(self, connector):
+        """End a transaction the CSMS did not authorize."""
+        if self.outbox is None:
+            transaction = connector.end_transaction()
+            self.transactions.remove(transaction.id, transaction.rfid)
+            return
+        self.outbox(
+            Action.StopTransaction,
+            transaction_id=connector.transaction.id,
+            reason=Reason.de_authorized,
+        )
+
+    @handler(Action.StopTransaction, HandlerType.ON_CALL_RESPONSE_FROM_CSMS)
+    def handler_for_stop_transaction_response(
+        self, call: Call, response: Optional[call_result.StopTransactionPayload]
+    ):
+        transaction_id = call.payload["transactionId"]
+        if response is None:
+            # keep the transaction around so the StopTransaction can be retried
+            logger.warning("StopTransaction for %s failed", transaction_id)
+            return
+        key = self.transactions.find_by_transaction_id(transaction_id)
+        if key is None or key[0] != self.id:
+            return
+        transaction = self.get_connector(key[1]).end_transaction()
+        self.transactions.remove(transaction_id, transaction.rfid)
+
     # --------------- RECEIVING CALLS FROM THE CENTRAL SYSTEM
     @handler(Action.ChangeConfiguration, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
     def handler_for_change_configuration(self, key: str, value: str):
-        self.configuration[key] = value
-        return True
+        status = self.configuration.change(key, value)
+        if (
+            status == ConfigurationStatus.accepted
+            and key == "HeartbeatInterval"
+            and self._heartbeat is not None
+        ):
+            self.schedule_heartbeat()
+        return {"status": status}
 
     @handler(Action.GetConfiguration, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
-    def handler_for_get_configuration(self, **kwargs):
-        logger.info(f"Preparing payload for GetConfiguration with {kwargs}")
-        kwargs.update(
-            {
-                "HeartbeatInterval": self.heartbeat_interval,
-                "MeterValuesSampledData": self.meter_values_interval,
-                "MeterValueSampleInterval": self.meter_values_sample_data,
-                "NumberOfConnectors": 1,
-                "AuthorizeRemoteTxRequests": "false",
-            }
-        )
-        return kwargs
+    def handler_for_get_configuration(self, key: Optional[List[str]] = None):
+        logger.debug("Preparing payload for GetConfiguration with %s", key)
+        if not key:
+            return {"serialized": self.configuration.serialized_configuration()}
+        configuration_key, unknown_key = self.configuration.get_configuration(key)
+        return {"configuration_key": configuration_key, "unknown_key": unknown_key}
+
+    @handler(Action.RemoteStopTransaction, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_remote_stop_transaction(self, transaction_id: int):
+        key = self.transactions.find_by_transaction_id(transaction_id)
+        if key is None or key[0] != self.id:
+            return {"accepted": False}
+        connector = self.get_connector(key[1])
+        # a finishing transaction is already being stopped
+        return {
+            "accepted": connector.transaction is not None
+            and connector.status != ChargePointStatus.finishing
+        }
 
     # --------------- ACTIONS AFTER REPLYING TO CENTRAL SYSTEM
-    @handler(Action.StartTransaction, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
-    def handler_for_start_transaction_response(self, payload):
-        pass
+    @handler(Action.RemoteStopTransaction, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_remote_stop_transaction(
+        self, request: Call, response: Union[CallResult, CallError]
+    ):
+        if not isinstance(response, CallResult):
+            return {}
+        if response.payload.get("status") != RemoteStartStopStatus.accepted:
+            return {}
+        return self.payload_for_stop_transaction(
+            transaction_id=request.payload["transactionId"], reason=Reason.remote
+        )
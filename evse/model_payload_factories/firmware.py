@@ -0,0 +1,151 @@
+"""
+GetDiagnostics
+UpdateFirmware
+DiagnosticsStatusNotification
+FirmwareStatusNotification
+"""
+import asyncio
+from pathlib import PurePosixPath
+from typing import Optional, Set, Union
+from urllib.parse import urlsplit
+
+import transfers
+from ocpp.messages import Call, CallError, CallResult
+from ocpp.v16.enums import Action, DiagnosticsStatus, FirmwareStatus
+from scheduler import scheduler
+from structlog import get_logger
+from utils import HandlerType, handler, timestamp_from_iso
+
+logger = get_logger(__name__)
+
+
+class FirmwareManagement:
+    supports_firmware_management: bool = True
+    diagnostics_size: int = transfers.DIAGNOSTICS_SIZE
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.diagnostics_status = DiagnosticsStatus.idle
+        self.firmware_status = FirmwareStatus.idle
+        self._transfers: Set[asyncio.Task] = set()
+
+    def start_transfer(self, transfer, *args):
+        """Run a transfer coroutine function in the background."""
+        task = asyncio.ensure_future(transfer(*args))
+        self._transfers.add(task)
+        task.add_done_callback(self._transfers.discard)
+
+    def notify(self, action: Action, status: str):
+        if self.outbox is None:
+            logger.debug("No outbox to send %s %s", action, status)
+            return
+        self.outbox(action, status=status)
+
+    async def upload_diagnostics(
+        self,
+        location: str,
+        file_name: str,
+        retries: Optional[int] = None,
+        retry_interval: Optional[int] = None,
+    ):
+        url = f"{location.rstrip('/')}/{file_name}"
+        self.notify(Action.DiagnosticsStatusNotification, DiagnosticsStatus.uploading)
+        try:
+            await transfers.with_retries(
+                lambda: transfers.upload(
+                    url, transfers.diagnostics_chunks(self.id, self.diagnostics_size)
+                ),
+                retries,
+                retry_interval,
+            )
+        except transfers.TransferError as error:
+            logger.info("Diagnostics of %s not uploaded: %s", self.id, error)
+            status = DiagnosticsStatus.upload_failed
+        else:
+            status = DiagnosticsStatus.uploaded
+        self.notify(Action.DiagnosticsStatusNotification, status)
+
+    async def update_firmware(
+        self,
+        location: str,
+        retries: Optional[int] = None,
+        retry_interval: Optional[int] = None,
+    ):
+        self.notify(Action.FirmwareStatusNotification, FirmwareStatus.downloading)
+        try:
+            size, digest = await transfers.with_retries(
+                lambda: transfers.download(location), retries, retry_interval
+            )
+        except transfers.TransferError as error:
+            logger.info("Firmware of %s not downloaded: %s", self.id, error)
+            self.notify(
+                Action.FirmwareStatusNotification, FirmwareStatus.download_failed
+            )
+            return
+        logger.debug("Firmware of %s is %s bytes, sha256 %s", self.id, size, digest)
+        self.notify(Action.FirmwareStatusNotification, FirmwareStatus.downloaded)
+        self.notify(Action.FirmwareStatusNotification, FirmwareStatus.installing)
+        self.firmware_version = PurePosixPath(urlsplit(location).path).name
+        self.notify(Action.FirmwareStatusNotification, FirmwareStatus.installed)
+
+    # --------------- SENDING CALLS FROM THE CHARGE POINT
+    @handler(
+        Action.DiagnosticsStatusNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP
+    )
+    def payload_for_diagnostics_status_notification(self, **kwargs):
+        self.diagnostics_status = kwargs.get("status", self.diagnostics_status)
+        return {"status": self.diagnostics_status}
+
+    @handler(Action.FirmwareStatusNotification, HandlerType.BEFORE_CALL_REQUEST_FROM_CP)
+    def payload_for_firmware_status_notification(self, **kwargs):
+        self.firmware_status = kwargs.get("status", self.firmware_status)
+        return {"status": self.firmware_status}
+
+    # --------------- RECEIVING CALLS FROM THE CENTRAL SYSTEM
+    @handler(Action.GetDiagnostics, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_get_diagnostics(self, location: str, **kwargs):
+        if not self.supports_firmware_management:
+            return {}
+        return {"file_name": f"{self.id}-diagnostics-{int(self.clock.time())}.log"}
+
+    @handler(Action.UpdateFirmware, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_update_firmware(self, location: str, retrieve_date: str, **kwargs):
+        return {}
+
+    # --------------- ACTIONS AFTER REPLYING TO CENTRAL SYSTEM
+    @handler(Action.GetDiagnostics, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_get_diagnostics(
+        self, request: Call, response: Union[CallResult, CallError]
+    ):
+        if not isinstance(response, CallResult):
+            return {}
+        file_name = response.payload.get("fileName")
+        if file_name is None:
+            return {}
+        self.start_transfer(
+            self.upload_diagnostics,
+            request.payload["location"],
+            file_name,
+            request.payload.get("retries"),
+            request.payload.get("retryInterval"),
+        )
+        return {}
+
+    @handler(Action.UpdateFirmware, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_update_firmware(
+        self, request: Call, response: Union[CallResult, CallError]
+    ):
+        if (
+            not isinstance(response, CallResult)
+            or not self.supports_firmware_management
+        ):
+            return {}
+        scheduler.call_at(
+            timestamp_from_iso(request.payload["retrieveDate"]),
+            self.start_transfer,
+            self.update_firmware,
+            request.payload["location"],
+            request.payload.get("retries"),
+            request.payload.get("retryInterval"),
+        )
+        return {}
@@ -0,0 +1,96 @@
+"""
+SendLocalList
+GetLocalListVersion
+"""
+from typing import Dict, List, Optional
+
+import auth_store
+from ocpp.messages import Call
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action, UpdateStatus, UpdateType
+from structlog import get_logger
+from utils import HandlerType, handler
+
+logger = get_logger(__name__)
+
+
+class LocalAuthListManagement:
+    supports_local_auth_management: bool = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.local_auth_list = auth_store.store.list()
+        self.local_list_version = 0
+        """local_list_version: version of the last list this charger was sent"""
+        self.authorization_cache = auth_store.store.cache
+
+    def authorize_locally(self, id_tag: str) -> Optional[Dict]:
+        """idTagInfo of a tag that can be authorized without the CSMS."""
+        if not self.configuration["LocalPreAuthorize"]:
+            return None
+        info = None
+        if (
+            self.supports_local_auth_management
+            and self.configuration["LocalAuthListEnabled"]
+            and self.local_list_version == self.local_auth_list.version
+            and self.local_list_version > 0
+        ):
+            info = self.local_auth_list.get(id_tag)
+        if info is None and self.configuration["AuthorizationCacheEnabled"]:
+            info = self.authorization_cache.get(id_tag)
+        if info is None or not info.is_valid(self.clock.now()):
+            auth_store.store.remote_lookups += 1
+            return None
+        auth_store.store.local_hits += 1
+        return info.as_dict()
+
+    def cache_authorization(self, id_tag: str, id_tag_info: Optional[Dict]):
+        if id_tag_info and self.configuration["AuthorizationCacheEnabled"]:
+            self.authorization_cache.put(id_tag, id_tag_info)
+
+    # --------------- RECEIVING CALL RESPONSES FROM THE CENTRAL SYSTEM
+    @handler(Action.Authorize, HandlerType.ON_CALL_RESPONSE_FROM_CSMS)
+    def handler_for_authorize_response(
+        self, call: Call, response: Optional[call_result.AuthorizePayload]
+    ):
+        if response is not None:
+            self.cache_authorization(call.payload["idTag"], response.id_tag_info)
+
+    # --------------- RECEIVING CALLS FROM THE CENTRAL SYSTEM
+    @handler(Action.SendLocalList, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_send_local_list(
+        self,
+        list_version: int,
+        update_type: UpdateType,
+        local_authorization_list: Optional[List[Dict]] = None,
+    ):
+        entries = local_authorization_list or []
+        if not (
+            self.supports_local_auth_management
+            and self.configuration["LocalAuthListEnabled"]
+        ):
+            return {"status": UpdateStatus.not_supported}
+        if len(entries) > self.configuration["SendLocalListMaxLength"]:
+            return {"status": UpdateStatus.failed}
+        status, self.local_auth_list = auth_store.store.apply(
+            self.local_auth_list,
+            self.local_list_version,
+            self.id,
+            list_version,
+            update_type,
+            entries,
+            max_length=self.configuration["LocalAuthListMaxLength"],
+        )
+        if status == UpdateStatus.accepted:
+            self.local_list_version = list_version
+        logger.debug("SendLocalList version %s: %s", list_version, status)
+        return {"status": status}
+
+    @handler(Action.GetLocalListVersion, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_get_local_list_version(self):
+        if not (
+            self.supports_local_auth_management
+            and self.configuration["LocalAuthListEnabled"]
+        ):
+            return {"list_version": -1}
+        return {"list_version": self.local_list_version}
@@ -20,7 +20,9 @@ class RemoteTriggerFeature:
     def on_trigger_message(
         self, requested_message: MessageTrigger, connector_id: Optional[int] = None
     ):
-        logger.debug(f"Abstraction handles remote trigger here for {requested_message}")
+        logger.debug(
+            "Abstraction handles remote trigger here for %s", requested_message
+        )
         if not self.supports_remote_trigger:
             logger.info("does not support after trigger message")
 
@@ -46,5 +48,5 @@ class RemoteTriggerFeature:
                 - MessageTrigger.firmware_status_notification
                 """
                 raise NotImplementedError(
-                    "Nothing to do for %s", request.requested_message
+                    "Nothing to do for %s", trigger_message.requested_message
                 )
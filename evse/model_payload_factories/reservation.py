@@ -0,0 +1,129 @@
+"""
+ReserveNow
+CancelReservation
+"""
+from typing import Dict, Optional, Union
+
+from exceptions import TransactionError
+from ocpp.messages import Call, CallError, CallResult
+from ocpp.v16.enums import (
+    Action,
+    CancelReservationStatus,
+    ChargePointStatus,
+    ReservationStatus,
+)
+from scheduler import ScheduledEvent, scheduler
+from structlog import get_logger
+from utils import HandlerType, handler, timestamp_from_iso
+
+logger = get_logger(__name__)
+
+
+class ReservationManagement:
+    supports_reservation: bool = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.reservations: Dict[int, int] = {}
+        """reservations: reservation id to connector id"""
+        self._reservation_expiries: Dict[int, ScheduledEvent] = {}
+
+    def claim_reservation(self, connector, id_tag: Optional[str]) -> Optional[int]:
+        """Use the reservation of a connector to start a transaction."""
+        reservation = connector.reservation
+        if reservation is None:
+            return None
+        if id_tag not in (reservation.id_tag, reservation.parent_id_tag):
+            raise TransactionError(
+                f"Connector {connector.id} is reserved for another id tag"
+            )
+        self.remove_reservation(reservation.id)
+        return reservation.id
+
+    def remove_reservation(self, reservation_id: int):
+        connector_id = self.reservations.pop(reservation_id, None)
+        if connector_id is None:
+            return None
+        event = self._reservation_expiries.pop(reservation_id, None)
+        if event is not None:
+            scheduler.cancel(event)
+        connector = self.get_connector(connector_id)
+        connector.clear_reservation()
+        return connector
+
+    def expire_reservation(self, reservation_id: int):
+        self._reservation_expiries.pop(reservation_id, None)
+        connector = self.remove_reservation(reservation_id)
+        if connector is not None:
+            logger.debug("Reservation %s expired", reservation_id)
+            self.announce_status(connector)
+
+    # --------------- RECEIVING CALLS FROM THE CENTRAL SYSTEM
+    @handler(Action.ReserveNow, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_reserve_now(
+        self,
+        connector_id: int,
+        expiry_date: str,
+        id_tag: str,
+        reservation_id: int,
+        parent_id_tag: Optional[str] = None,
+    ):
+        if not self.supports_reservation or connector_id == 0:
+            # connector 0 needs ReserveConnectorZeroSupported, which is false
+            return {"status": ReservationStatus.rejected}
+        if not 0 < connector_id <= self.number_connectors:
+            return {"status": ReservationStatus.rejected}
+        expires_at = timestamp_from_iso(expiry_date)
+        if expires_at <= self.clock.time():
+            return {"status": ReservationStatus.rejected}
+        connector = self.get_connector(connector_id)
+        match connector.status:
+            case ChargePointStatus.faulted:
+                return {"status": ReservationStatus.faulted}
+            case ChargePointStatus.unavailable:
+                return {"status": ReservationStatus.unavailable}
+        if connector.transaction is not None or (
+            connector.reservation is not None
+            and connector.reservation.id != reservation_id
+        ):
+            return {"status": ReservationStatus.occupied}
+        # a ReserveNow with a known reservation id replaces that reservation
+        previous = self.remove_reservation(reservation_id)
+        if previous is not None and previous is not connector:
+            self.announce_status(previous)
+        connector.reserve(reservation_id, id_tag, expiry_date, parent_id_tag)
+        self.reservations[reservation_id] = connector_id
+        self._reservation_expiries[reservation_id] = scheduler.call_at(
+            expires_at, self.expire_reservation, reservation_id
+        )
+        return {"status": ReservationStatus.accepted}
+
+    @handler(Action.CancelReservation, HandlerType.ON_CALL_REQUEST_FROM_CSMS)
+    def handler_for_cancel_reservation(self, reservation_id: int):
+        if reservation_id in self.reservations:
+            return {"status": CancelReservationStatus.accepted}
+        return {"status": CancelReservationStatus.rejected}
+
+    # --------------- ACTIONS AFTER REPLYING TO CENTRAL SYSTEM
+    @handler(Action.ReserveNow, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_reserve_now(self, request: Call, response: Union[CallResult, CallError]):
+        if not isinstance(response, CallResult):
+            return {}
+        if response.payload.get("status") != ReservationStatus.accepted:
+            return {}
+        connector = self.get_connector(request.payload["connectorId"])
+        return {"connector_id": connector.id, "status": connector.status}
+
+    @handler(Action.CancelReservation, HandlerType.AFTER_CALL_RESPONSE_FROM_CP)
+    def after_cancel_reservation(
+        self, request: Call, response: Union[CallResult, CallError]
+    ):
+        if not isinstance(response, CallResult):
+            return {}
+        if response.payload.get("status") != CancelReservationStatus.accepted:
+            return {}
+        connector = self.remove_reservation(request.payload["reservationId"])
+        if connector is None:
+            # it expired in the meantime and was announced already
+            return {}
+        return {"connector_id": connector.id, "status": connector.status}
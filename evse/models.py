@@ -1,30 +1,38 @@
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
-from exceptions import NoModelImplementedError
+import transactions
+from configuration import ConfigurationRegistry
+from exceptions import NoModelImplementedError, TransactionError
+from meters import MeterSeries
 from model_payload_factories.core import Core
+from model_payload_factories.firmware import FirmwareManagement
+from model_payload_factories.local_auth import LocalAuthListManagement
 from model_payload_factories.remote_trigger import RemoteTriggerFeature
+from model_payload_factories.reservation import ReservationManagement
+from ocpp.charge_point import camel_to_snake_case
 from ocpp.messages import Call, CallError, CallResult, MessageType
 from ocpp.v16.enums import Action, ChargePointErrorCode, ChargePointStatus
 from structlog import get_logger
 from utils import HandlerType, create_route_map
+from wire import DEFAULT_PROFILE
 
 logger = get_logger(__name__)
 
 
-@dataclass
 class TransactionStatus(Enum):
-    starting: 1
-    ongoing: 2
-    halted_by_ev: 3
-    halted_by_cs: 4
-    finishing: 5
+    starting = 1
+    ongoing = 2
+    halted_by_ev = 3
+    halted_by_cs = 4
+    finishing = 5
 
 
 @dataclass
 class Transaction:
-    id: int
+    id: Optional[int]
+    """id: assigned by the CSMS on StartTransaction.CallResult"""
     status: TransactionStatus
     meter_start: int
     meter_stop: int
@@ -35,9 +43,24 @@ class Transaction:
     rfid: Optional[str]
     num_phases: Optional[int]
 
-    def __init__(self, transaction_id: int):
-        self.id = transaction_id
-        self.status = TransactionStatus.started
+    def __init__(self, rfid: Optional[str] = None, meter_start: int = 0):
+        self.id = None
+        self.status = TransactionStatus.starting
+        self.meter_start = meter_start
+        self.meter_stop = meter_start
+        self.state_of_charge = 0
+        self.current_consumption = 0.0
+        self.current_offered = 0.0
+        self.rfid = rfid
+        self.num_phases = None
+
+
+@dataclass
+class Reservation:
+    id: int
+    id_tag: str
+    expiry_date: str
+    parent_id_tag: Optional[str] = None
 
 
 @dataclass
@@ -46,6 +69,7 @@ class Connector:
     status: ChargePointStatus
     # optional
     transaction: Optional[Transaction]
+    reservation: Optional[Reservation]
     error: Optional[ChargePointErrorCode]
 
     def __init__(self, connector_id):
@@ -53,10 +77,69 @@ class Connector:
         self.status = ChargePointStatus.available
         self.error = ChargePointErrorCode.no_error
         self.transaction = None
+        self.reservation = None
+        self.meter = MeterSeries()
+        """meter: readings sent in MeterValues, not a field so not serialized"""
+
+    def reserve(
+        self,
+        reservation_id: int,
+        id_tag: str,
+        expiry_date: str,
+        parent_id_tag: Optional[str] = None,
+    ) -> Reservation:
+        self.reservation = Reservation(
+            reservation_id, id_tag, expiry_date, parent_id_tag
+        )
+        self.status = ChargePointStatus.reserved
+        return self.reservation
+
+    def clear_reservation(self) -> Optional[Reservation]:
+        reservation, self.reservation = self.reservation, None
+        if self.status == ChargePointStatus.reserved:
+            self.status = ChargePointStatus.available
+        return reservation
+
+    def begin_transaction(self, rfid: Optional[str], meter_start: int) -> Transaction:
+        if self.transaction is not None:
+            raise TransactionError(
+                f"Connector {self.id} already has a transaction "
+                f"({self.transaction.status.name})"
+            )
+        self.transaction = Transaction(rfid=rfid, meter_start=meter_start)
+        self.status = ChargePointStatus.preparing
+        return self.transaction
+
+    def confirm_transaction(self, transaction_id: int, accepted: bool) -> Transaction:
+        self.transaction.id = transaction_id
+        if accepted:
+            self.transaction.status = TransactionStatus.ongoing
+            self.status = ChargePointStatus.charging
+        else:
+            self.transaction.status = TransactionStatus.halted_by_cs
+            self.status = ChargePointStatus.suspended_evse
+        return self.transaction
+
+    def finish_transaction(self, meter_stop: int) -> Transaction:
+        self.transaction.status = TransactionStatus.finishing
+        self.transaction.meter_stop = meter_stop
+        self.status = ChargePointStatus.finishing
+        return self.transaction
+
+    def end_transaction(self) -> Optional[Transaction]:
+        transaction, self.transaction = self.transaction, None
+        self.status = ChargePointStatus.available
+        return transaction
 
 
 @dataclass
-class Charger(Core, RemoteTriggerFeature):
+class Charger(
+    Core,
+    RemoteTriggerFeature,
+    LocalAuthListManagement,
+    ReservationManagement,
+    FirmwareManagement,
+):
     ready: bool
     """ready: whether the model is ready to be used for a handler"""
     id: str
@@ -64,18 +147,16 @@ class Charger(Core, RemoteTriggerFeature):
     connectors: list[Connector]
     status: ChargePointStatus
     error: Optional[ChargePointErrorCode]
-    # configurations
-    heartbeat_interval: int
-    meter_values_interval: int
-    meter_values_sample_data: List
-    configuration: Dict
+    configuration: ConfigurationRegistry
     # features
     supports_core: bool = True
     supports_smart_charging: bool = False
     supports_remote_trigger: bool = True
-    supports_firmware_management: bool = False
-    supports_local_auth_management: bool = False
-    supports_reservation: bool = False
+    supports_firmware_management: bool = True
+    supports_local_auth_management: bool = True
+    supports_reservation: bool = True
+    compression: str = DEFAULT_PROFILE
+    """compression: name of the wire.PROFILES entry the charger connects with"""
 
     def __init__(
         self,
@@ -91,6 +172,7 @@ class Charger(Core, RemoteTriggerFeature):
         self.password = password
         self.number_connectors = number_connectors
         self.connectors = [Connector(i + 1) for i in range(number_connectors)]
+        self.configuration.override("NumberOfConnectors", number_connectors)
         self.status = ChargePointStatus.available
         self.error = ChargePointErrorCode.no_error
         self.action_payload_map: Dict[Action, Callable] = create_route_map(
@@ -105,7 +187,9 @@ class Charger(Core, RemoteTriggerFeature):
         self.follow_request_map: Dict[Action, Callable] = create_route_map(
             self, HandlerType.AFTER_CALL_RESPONSE_FROM_CP
         )
-        self.call_message_id_to_action_map: Dict[str, Action] = {}
+        self.transactions: transactions.TransactionIndex = transactions.index
+        self.outbox: Optional[Callable[..., Any]] = None
+        """outbox: queues a Call to the CSMS on behalf of the abstraction"""
         logger.debug("Charger %s with %s connectors", self.id, self.number_connectors)
 
     @classmethod
@@ -150,19 +234,83 @@ class Charger(Core, RemoteTriggerFeature):
         logger.debug("Model handle call response: %s", response)
 
     def handle_validated_call_response(
-        self, response: Union[Call, CallResult, CallError]
+        self, call: Call, response: Union[CallResult, CallError, None]
     ):
         logger.debug("Model validate call response: %s", response)
+        try:
+            self.after_response_map[call.action](call, response)
+        except KeyError:
+            logger.debug("Abstraction.%s.on_response not implemented.", call.action)
+
+    def handle_unanswered_call(self, call: Call):
+        """A Call timed out, so treat it as if the CSMS rejected it."""
+        self.handle_validated_call_response(call, None)
 
-    def receive_csms_call(self, message):
+    def receive_csms_call(self, message) -> Dict:
+        """
+        Let the abstraction look at a Call from the CSMS before the handler
+        replies to it. Any data returned is passed on to the handler.
+        """
         try:
-            self.on_request_map[message.action](message.payload)
+            data = self.on_request_map[message.action](
+                **camel_to_snake_case(message.payload)
+            )
         except (KeyError, NotImplementedError):
-            logger.debug(f"Abstraction.{message.action}.on_request not implemented.")
+            logger.debug("Abstraction.%s.on_request not implemented.", message.action)
+            return {}
+        return data or {}
+
+    def get_connector(self, connector_id: int) -> Connector:
+        if not 0 < connector_id <= self.number_connectors:
+            raise TransactionError(f"Charger {self.id} has no connector {connector_id}")
+        return self.connectors[connector_id - 1]
+
+    def announce_status(self, connector: Connector):
+        if self.outbox is None:
+            logger.debug("No outbox to announce connector %s status", connector.id)
+            return
+        self.outbox(
+            Action.StatusNotification,
+            connector_id=connector.id,
+            status=connector.status,
+            error=connector.error,
+        )
+
+    def connector_for_transaction(
+        self,
+        transaction_id: Optional[int] = None,
+        connector_id: Optional[int] = None,
+        id_tag: Optional[str] = None,
+    ) -> Connector:
+        """
+        Find the connector holding a transaction, by transaction id first,
+        then by the idTag that started it.
+        """
+        if transaction_id is not None:
+            key = self.transactions.find_by_transaction_id(transaction_id)
+            if key is None or key[0] != self.id:
+                raise TransactionError(f"Unknown transaction {transaction_id}")
+            connector_id = key[1]
+        elif id_tag is not None and connector_id is None:
+            connector_ids = [
+                key[1]
+                for key in self.transactions.find_by_id_tag(id_tag)
+                if key[0] == self.id
+            ]
+            if not connector_ids:
+                raise TransactionError(f"No transaction for {id_tag}")
+            connector_id = min(connector_ids)
+        connector = self.get_connector(connector_id if connector_id else 1)
+        if connector.transaction is None or connector.transaction.id is None:
+            raise TransactionError(f"No transaction on connector {connector.id}")
+        return connector
 
     def after_cs_response(self, request: Call, response: Union[CallResult, CallError]):
         try:
-            logger.debug(f"Checking abstraction.{request.action}.after_request.")
+            logger.debug("Checking abstraction.%s.after_request.", request.action)
             return self.follow_request_map[request.action](request, response)
         except (KeyError, NotImplementedError):
-            logger.debug(f"Abstraction.{request.action}.after_request not implemented.")
+            logger.debug(
+                "Abstraction.%s.after_request not implemented.", request.action
+            )
+            return {}
@@ -0,0 +1,163 @@
+import asyncio
+from collections import Counter, deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from ocpp.v16.enums import Action
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HIGH_WATER = 100
+DEFAULT_MAX_SIZE = 1000
+
+
+class Priority(IntEnum):
+    """Lower values are sent first."""
+
+    transactional = 0
+    control = 1
+    telemetry = 2
+
+
+ACTION_PRIORITY: Dict[str, Priority] = {
+    Action.Authorize: Priority.transactional,
+    Action.StartTransaction: Priority.transactional,
+    Action.StopTransaction: Priority.transactional,
+    Action.MeterValues: Priority.telemetry,
+    Action.StatusNotification: Priority.telemetry,
+    Action.Heartbeat: Priority.telemetry,
+}
+
+
+def priority_for(action: str, payload: Any) -> Priority:
+    # meter values of a transaction must reach the CSMS before its
+    # StopTransaction, and must not be dropped
+    if action == Action.MeterValues and payload.transaction_id is not None:
+        return Priority.transactional
+    return ACTION_PRIORITY.get(action, Priority.control)
+
+
+@dataclass
+class OutboundMessage:
+    action: str
+    payload: Any
+    priority: Priority
+    done: asyncio.Future
+
+
+class OutboundQueue:
+    """
+    Calls waiting to be sent to the CSMS, by priority.
+
+    Only one Call can be in flight at a time, so when the CSMS is slow the
+    queue fills up. To keep it short, messages that only report the latest
+    state of a connector are coalesced:
+
+    - a StatusNotification replaces the queued one of the same connector.
+    - above `high_water`, MeterValues of the same connector and transaction
+      are merged into the queued message.
+    - above `max_size`, the oldest telemetry is dropped. MeterValues of a
+      transaction are queued as transactional, so they are never dropped and
+      keep their place before the StopTransaction.
+
+    Every `put` returns a future that is done once the (possibly coalesced)
+    message was sent.
+    """
+
+    def __init__(
+        self, high_water: int = DEFAULT_HIGH_WATER, max_size: int = DEFAULT_MAX_SIZE
+    ):
+        self.high_water = high_water
+        self.max_size = max_size
+        self._queues: Dict[Priority, Deque[OutboundMessage]] = {
+            priority: deque() for priority in Priority
+        }
+        self._status_notifications: Dict[int, OutboundMessage] = {}
+        self._meter_values: Dict[Tuple[int, Optional[int]], OutboundMessage] = {}
+        self._not_empty = asyncio.Event()
+        self.enqueued: Counter = Counter()
+        self.coalesced: Counter = Counter()
+        self.dropped: Counter = Counter()
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def put(self, action: str, payload: Any) -> asyncio.Future:
+        self.enqueued[action] += 1
+        coalesced = self._coalesce(action, payload)
+        if coalesced is not None:
+            self.coalesced[action] += 1
+            return coalesced.done
+
+        priority = priority_for(action, payload)
+        done = asyncio.get_running_loop().create_future()
+        message = OutboundMessage(action, payload, priority, done)
+        self._queues[priority].append(message)
+        match action:
+            case Action.StatusNotification:
+                self._status_notifications[payload.connector_id] = message
+            case Action.MeterValues:
+                key = (payload.connector_id, payload.transaction_id)
+                self._meter_values[key] = message
+        while len(self) > self.max_size and self._queues[Priority.telemetry]:
+            self._drop(self._queues[Priority.telemetry].popleft())
+        self._not_empty.set()
+        return done
+
+    async def get(self) -> OutboundMessage:
+        while True:
+            for queue in self._queues.values():
+                if queue:
+                    message = queue.popleft()
+                    self._unindex(message)
+                    return message
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": {
+                priority.name: len(queue) for priority, queue in self._queues.items()
+            },
+            "high_water": self.high_water,
+            "max_size": self.max_size,
+            "enqueued": dict(self.enqueued),
+            "coalesced": dict(self.coalesced),
+            "dropped": dict(self.dropped),
+        }
+
+    def _coalesce(self, action: str, payload: Any) -> Optional[OutboundMessage]:
+        match action:
+            case Action.StatusNotification:
+                queued = self._status_notifications.get(payload.connector_id)
+                if queued is not None:
+                    queued.payload = payload
+                return queued
+            case Action.MeterValues if len(self) >= self.high_water:
+                key = (payload.connector_id, payload.transaction_id)
+                queued = self._meter_values.get(key)
+                if queued is not None:
+                    queued.payload.meter_value.extend(payload.meter_value)
+                return queued
+        return None
+
+    def _unindex(self, message: OutboundMessage):
+        match message.action:
+            case Action.StatusNotification:
+                index, key = self._status_notifications, message.payload.connector_id
+            case Action.MeterValues:
+                index = self._meter_values
+                key = (message.payload.connector_id, message.payload.transaction_id)
+            case _:
+                return
+        if index.get(key) is message:
+            del index[key]
+
+    def _drop(self, message: OutboundMessage):
+        self._unindex(message)
+        self.dropped[message.action] += 1
+        logger.debug("Dropped %s, outbound queue is full", message.action)
+        if not message.done.done():
+            message.done.set_result(None)
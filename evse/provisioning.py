@@ -0,0 +1,415 @@
+"""
+Fleets of chargers provisioned from a definition file.
+
+A definition has an id, a password, a number of connectors, a vendor and a
+model, feature flags and configuration overrides. Files are streamed, one
+definition at a time, from:
+
+- CSV, with `id`, `password`, `connectors`, `vendor`, `model`, `features`
+  and `compression` columns, and a `config.<Key>` column per overridden
+  configuration key;
+- JSON Lines, one object per line, or a JSON array, with the same fields and
+  `features` and `configuration` as objects.
+
+`features` lists feature names, i.e.: `smart_charging,-reservation` turns
+SmartCharging on and Reservation off, and `compression` names one of the
+`wire.PROFILES`. Definitions with the same vendor, model, features,
+compression and overrides share a template, so parsing and validating
+them happens once per template rather than once per charger. Chargers are
+built and registered in batches of `EVSE_PROVISION_BATCH`.
+
+    $ python -m provisioning fleet.csv
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import models
+import wire
+from configuration import STANDARD_KEYS
+from exceptions import ProvisioningError
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_BATCH = int(os.getenv("EVSE_PROVISION_BATCH", 1000))
+FEATURES = (
+    "core",
+    "smart_charging",
+    "remote_trigger",
+    "firmware_management",
+    "local_auth_management",
+    "reservation",
+)
+CONFIG_PREFIX = "config."
+MAX_ERRORS = 100
+READ_SIZE = 64 * 1024
+MAX_DEFINITION_SIZE = 1024 * 1024
+"""MAX_DEFINITION_SIZE: characters of a JSON array entry read before giving up"""
+
+
+@dataclass(frozen=True)
+class ChargerTemplate:
+    """What chargers of the same kind share, validated once."""
+
+    vendor: Optional[str] = None
+    model: Optional[str] = None
+    features: Tuple[Tuple[str, bool], ...] = ()
+    configuration: Tuple[Tuple[str, Any], ...] = ()
+    compression: Optional[str] = None
+
+    @classmethod
+    def parse(
+        cls,
+        vendor: Optional[str],
+        model: Optional[str],
+        features: Any,
+        configuration: Dict[str, Any],
+        compression: Optional[str] = None,
+    ) -> "ChargerTemplate":
+        if compression:
+            try:
+                wire.profile(compression)
+            except ValueError as error:
+                raise ProvisioningError(str(error))
+        return cls(
+            vendor or None,
+            model or None,
+            tuple(sorted(parse_features(features).items())),
+            tuple(sorted(parse_configuration(configuration).items())),
+            compression or None,
+        )
+
+    def build(
+        self, charger_id: str, number_connectors: int, password: Optional[str]
+    ) -> models.Charger:
+        charger = models.Charger.create(charger_id, number_connectors, password)
+        charger.charge_point_vendor = self.vendor
+        charger.charge_point_model = self.model
+        if self.compression is not None:
+            charger.compression = self.compression
+        for feature, enabled in self.features:
+            setattr(charger, f"supports_{feature}", enabled)
+        for key, value in self.configuration:
+            charger.configuration.override(key, value)
+        return charger
+
+
+@dataclass
+class ChargerDefinition:
+    line: int
+    charger_id: str
+    number_connectors: int
+    password: Optional[str]
+    template: ChargerTemplate
+
+
+@dataclass
+class ProvisioningReport:
+    provisioned: int = 0
+    failed: int = 0
+    templates: int = 0
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    """errors: the first MAX_ERRORS, with the line of their definition"""
+
+    @property
+    def rate(self) -> float:
+        return self.provisioned / self.elapsed if self.elapsed else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "provisioned": self.provisioned,
+            "failed": self.failed,
+            "templates": self.templates,
+            "seconds": round(self.elapsed, 3),
+            "per_second": round(self.rate),
+            "errors": self.errors,
+        }
+
+
+def parse_features(features: Any) -> Dict[str, bool]:
+    if not features:
+        return {}
+    if isinstance(features, dict):
+        flags = {name: bool(enabled) for name, enabled in features.items()}
+    else:
+        if isinstance(features, str):
+            features = features.split(",")
+        if not isinstance(features, list) or not all(
+            isinstance(name, str) for name in features
+        ):
+            raise ProvisioningError(f"Invalid features {features}")
+        flags = {}
+        for name in (name.strip() for name in features):
+            if name:
+                flags[name.lstrip("+-")] = not name.startswith("-")
+    unknown = set(flags) - set(FEATURES)
+    if unknown:
+        raise ProvisioningError(f"Unknown features {sorted(unknown)}")
+    return flags
+
+
+def parse_configuration(configuration: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(configuration, dict):
+        raise ProvisioningError(f"Invalid configuration {configuration}")
+    parsed = {}
+    for key, value in configuration.items():
+        try:
+            definition = STANDARD_KEYS[key]
+        except KeyError:
+            raise ProvisioningError(f"Unknown configuration key {key}")
+        if isinstance(value, str):
+            try:
+                value = definition.type.parse(value)
+            except ValueError as error:
+                raise ProvisioningError(f"{key}: {error}")
+        parsed[key] = value
+    return parsed
+
+
+def freeze(value: Any) -> Any:
+    """A hashable stand-in for a definition's field, to look templates up."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def read_csv(file: io.TextIOBase) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    reader = csv.DictReader(file)
+    for row in reader:
+        configuration = {
+            name[len(CONFIG_PREFIX) :]: value
+            for name, value in row.items()
+            if name.startswith(CONFIG_PREFIX) and value not in (None, "")
+        }
+        row["configuration"] = configuration
+        yield reader.line_num, row
+
+
+def read_json_lines(file: io.TextIOBase) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for line, text in enumerate(file, start=1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError:
+                # reported with the line, the rest of the file still counts
+                yield line, None
+
+
+def element_end(buffer: str, start: int) -> Optional[int]:
+    """Where the array entry at `start` ends, at the `,` or `]` after it."""
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(buffer)):
+        character = buffer[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif character == "\\":
+                escaped = True
+            elif character == '"':
+                in_string = False
+        elif character == '"':
+            in_string = True
+        elif character in "[{":
+            depth += 1
+        elif character in "]}":
+            if depth == 0:
+                return i
+            depth -= 1
+        elif character == "," and depth == 0:
+            return i
+    return None
+
+
+def read_json_array(
+    file: io.TextIOBase, read_size: int = READ_SIZE
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Objects of a JSON array, decoded as the file is read. An entry that isn't
+    valid JSON is yielded as None and reading goes on after it.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, index = "", 0, 0
+    started = False
+    while True:
+        chunk = file.read(read_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != "[":
+                    raise ProvisioningError("A JSON fleet definition is an array")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                definition, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = element_end(buffer, position)
+                if end is None:
+                    # the entry goes on in the next chunk, unless it never ends
+                    if chunk and len(buffer) - position > MAX_DEFINITION_SIZE:
+                        raise ProvisioningError(
+                            f"Definition {index + 1} is longer than "
+                            f"{MAX_DEFINITION_SIZE} characters"
+                        )
+                    break
+                index += 1
+                yield index, None
+                position = end
+                continue
+            index += 1
+            yield index, definition
+            position = end
+        if not chunk:
+            if buffer[position:].strip():
+                raise ProvisioningError("Truncated JSON fleet definition")
+            return
+
+
+def read_definitions(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    with path.open(newline="") as file:
+        match path.suffix:
+            case ".csv":
+                yield from read_csv(file)
+            case ".jsonl" | ".ndjson":
+                yield from read_json_lines(file)
+            case ".json":
+                yield from read_json_array(file)
+            case _:
+                raise ProvisioningError(f"Unknown fleet definition format {path}")
+
+
+class Provisioner:
+    def __init__(self, batch_size: int = DEFAULT_BATCH):
+        self.batch_size = batch_size
+        self.chargers: Dict[str, models.Charger] = {}
+        self.templates: Dict[Tuple, ChargerTemplate] = {}
+
+    def __len__(self):
+        return len(self.chargers)
+
+    def template(self, row: Dict[str, Any]) -> ChargerTemplate:
+        features = row.get("features")
+        configuration = row.get("configuration") or {}
+        key = (
+            row.get("vendor"),
+            row.get("model"),
+            freeze(features),
+            freeze(configuration),
+            row.get("compression"),
+        )
+        try:
+            return self.templates[key]
+        except KeyError:
+            pass
+        template = self.templates[key] = ChargerTemplate.parse(
+            row.get("vendor"),
+            row.get("model"),
+            features,
+            configuration,
+            row.get("compression"),
+        )
+        return template
+
+    def definition(self, line: int, row: Dict[str, Any]) -> ChargerDefinition:
+        if not isinstance(row, dict):
+            raise ProvisioningError("Invalid definition")
+        charger_id = row.get("id")
+        if not charger_id:
+            raise ProvisioningError("Missing id")
+        if not isinstance(charger_id, str):
+            raise ProvisioningError(f"Invalid id {charger_id}")
+        try:
+            number_connectors = int(row.get("connectors") or 1)
+        except ValueError:
+            raise ProvisioningError(f"Invalid connectors {row.get('connectors')}")
+        if number_connectors < 1:
+            raise ProvisioningError(f"Invalid connectors {number_connectors}")
+        return ChargerDefinition(
+            line,
+            charger_id,
+            number_connectors,
+            row.get("password") or None,
+            self.template(row),
+        )
+
+    def provision(
+        self, rows: Iterable[Tuple[int, Dict[str, Any]]], replace: bool = False
+    ) -> ProvisioningReport:
+        """
+        Provision the chargers of `rows`. An id already provisioned, by this
+        run or an earlier one, fails its row unless `replace` is set.
+        """
+        report = ProvisioningReport()
+        templates = len(self.templates)
+        start = time.perf_counter()
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, self.batch_size)):
+            built = {}
+            for line, row in batch:
+                try:
+                    definition = self.definition(line, row)
+                    if not replace and (
+                        definition.charger_id in built
+                        or definition.charger_id in self.chargers
+                    ):
+                        raise ProvisioningError(f"Duplicate id {definition.charger_id}")
+                except (ProvisioningError, TypeError) as error:
+                    report.failed += 1
+                    if len(report.errors) < MAX_ERRORS:
+                        report.errors.append(f"line {line}: {error}")
+                    continue
+                built[definition.charger_id] = definition.template.build(
+                    definition.charger_id,
+                    definition.number_connectors,
+                    definition.password,
+                )
+                report.provisioned += 1
+            self.chargers.update(built)
+        report.elapsed = time.perf_counter() - start
+        report.templates = len(self.templates) - templates
+        logger.info(
+            "Provisioned %s chargers (%s failed) in %.2fs, %.0f/s",
+            report.provisioned,
+            report.failed,
+            report.elapsed,
+            report.rate,
+        )
+        return report
+
+    def provision_file(self, path: Path, replace: bool = False) -> ProvisioningReport:
+        return self.provision(read_definitions(path), replace)
+
+
+fleet = Provisioner()
+
+
+if __name__ == "__main__":
+    import log_config
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument(
+        "--replace", action="store_true", help="replace chargers with the same id"
+    )
+    args = parser.parse_args()
+    log_config.configure(log_config.LogMode.off)
+    report = Provisioner(args.batch).provision_file(args.path, args.replace)
+    print(json.dumps(report.stats(), indent=2))
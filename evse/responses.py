@@ -0,0 +1,87 @@
+"""
+Replies to recent CSMS Calls, by unique id.
+
+A CSMS that timed out waiting for a reply may send the same Call again,
+with the same unique id. Handling it twice would run its feature handler
+and its follow-ups twice, i.e.: a second BootNotification after a
+TriggerMessage. Instead, the frame sent the first time is sent again, as
+long as the Call has the same action and came on the same connection.
+
+Entries expire after `EVSE_RESPONSE_CACHE_TTL` seconds and at most
+`EVSE_RESPONSE_CACHE_SIZE` are kept, the oldest are evicted first.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TTL = float(os.getenv("EVSE_RESPONSE_CACHE_TTL", 300))
+DEFAULT_MAX_SIZE = int(os.getenv("EVSE_RESPONSE_CACHE_SIZE", 1000))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._frames: OrderedDict[str, Tuple[float, Optional[str], str]] = OrderedDict()
+        self.hits = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get(self, unique_id: str, action: Optional[str]) -> Optional[str]:
+        """The reply sent to the `action` Call `unique_id`, while it is fresh."""
+        self.sweep()
+        try:
+            _, replied_action, frame = self._frames[unique_id]
+        except KeyError:
+            return None
+        if replied_action != action:
+            # a new Call reusing the id, not a retransmit
+            del self._frames[unique_id]
+            return None
+        self.hits += 1
+        logger.info("Replaying the response to %s", unique_id)
+        return frame
+
+    def put(self, unique_id: str, action: Optional[str], frame: str):
+        if self.max_size <= 0:
+            return
+        self._frames[unique_id] = (self.clock(), action, frame)
+        self._frames.move_to_end(unique_id)
+        while len(self._frames) > self.max_size:
+            self._frames.popitem(last=False)
+            self.evicted += 1
+
+    def sweep(self):
+        # entries are in reply order, expired ones are at the front
+        deadline = self.clock() - self.ttl
+        while self._frames:
+            unique_id, (replied_at, _, _) = next(iter(self._frames.items()))
+            if replied_at > deadline:
+                return
+            del self._frames[unique_id]
+            self.expired += 1
+
+    def clear(self):
+        self._frames.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached": len(self._frames),
+            "hits": self.hits,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+from typing import Any, Callable, List, Optional
+
+import clock
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+
+class ScheduledEvent:
+    __slots__ = ("when", "seq", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, seq: int, callback: Callable, args: tuple):
+        self.when = when
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other: "ScheduledEvent"):
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class Scheduler:
+    """
+    Runs callbacks at a given time, for every charger in the process.
+
+    All events live in one heap and a single task sleeps until the earliest
+    one is due, so tens of thousands of pending events cost one task.
+    Cancelled events stay in the heap until they reach the top, or until
+    they make up half of it.
+
+    Without a `clock`, time is read from the clock of the running loop, so
+    events follow virtual time too.
+    """
+
+    def __init__(self, clock: Optional[Callable[[], float]] = None):
+        self.clock = clock if clock is not None else self._loop_time
+        self._heap: List[ScheduledEvent] = []
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def call_at(self, when: float, callback: Callable, *args: Any) -> ScheduledEvent:
+        """Run `callback(*args)` at `when`, a timestamp of the clock."""
+        event = ScheduledEvent(when, next(self._seq), callback, args)
+        heapq.heappush(self._heap, event)
+        self._wake(earliest=self._heap[0] is event)
+        return event
+
+    def call_later(
+        self, delay: float, callback: Callable, *args: Any
+    ) -> ScheduledEvent:
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def cancel(self, event: ScheduledEvent):
+        if event.cancelled:
+            return
+        event.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > len(self._heap) // 2:
+            self._heap = [event for event in self._heap if not event.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def clear(self):
+        """Drop every pending event."""
+        for event in self._heap:
+            event.cancelled = True
+        self._heap = []
+        self._cancelled = 0
+
+    def next_due(self) -> Optional[float]:
+        self._discard_cancelled()
+        return self._heap[0].when if self._heap else None
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Run every event due at `now`, returns how many ran."""
+        now = self.clock() if now is None else now
+        ran = 0
+        while (when := self.next_due()) is not None and when <= now:
+            event = heapq.heappop(self._heap)
+            # so a late `cancel` does not count it as sitting in the heap
+            event.cancelled = True
+            ran += 1
+            try:
+                result = event.callback(*event.args)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception:
+                logger.exception("Scheduled callback failed", callback=event.callback)
+        return ran
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            self.run_due()
+            self._wakeup.clear()
+            when = self.next_due()
+            timeout = None if when is None else max(when - self.clock(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _wake(self, earliest: bool = True):
+        """
+        Make sure a task runs the heap on the running loop, and wakes up for
+        the event just scheduled if it is the `earliest`.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # nothing to wake without a loop, `run_due` has to be called
+            return
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            # the task of an earlier loop, if any, is gone with it
+            self._task = loop.create_task(self.run())
+        elif earliest and self._wakeup is not None:
+            self._wakeup.set()
+
+    @staticmethod
+    def _loop_time() -> float:
+        return clock.current().time()
+
+    def _discard_cancelled(self):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+
+scheduler = Scheduler()
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import models
+from auth_store import AuthorizationCache, AuthStore, IdTagInfo, LocalAuthList
+
+
+def entry(id_tag, status="Accepted"):
+    return {"id_tag": id_tag, "id_tag_info": {"status": status}}
+
+
+def test_full_and_differential_updates(tmp_path):
+    local_list = LocalAuthList(tmp_path / "default.authlist")
+    assert local_list.update(1, "Full", [entry("a"), entry("b")]) == "Accepted"
+    assert local_list.update(2, "Differential", [{"id_tag": "a"}, entry("c")])
+    assert "a" not in local_list
+    assert local_list.get("c").status == "Accepted"
+    assert local_list.update(1, "Differential", []) == "VersionMismatch"
+    assert local_list.update(3, "Full", [entry("a"), entry("b")], max_length=1) == (
+        "Failed"
+    )
+
+
+def test_list_is_reloaded_from_file(tmp_path):
+    path = tmp_path / "default.authlist"
+    local_list = LocalAuthList(path)
+    local_list.update(1, "Full", [entry("a"), entry("b")])
+    local_list.update(2, "Differential", [{"id_tag": "a"}, entry("c", "Blocked")])
+    reloaded = LocalAuthList(path)
+    assert reloaded.version == 2
+    assert len(reloaded) == 2
+    assert reloaded.get("c").status == "Blocked"
+
+
+def test_expired_tags_are_not_valid():
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert IdTagInfo("Accepted").is_valid(now)
+    assert not IdTagInfo("Blocked").is_valid(now)
+    assert not IdTagInfo("Accepted", "2023-12-31T00:00:00Z").is_valid(now)
+
+
+def test_cache_drops_least_recently_used():
+    cache = AuthorizationCache(max_size=2)
+    cache.put("a", {"status": "Accepted"})
+    cache.put("b", {"status": "Accepted"})
+    cache.get("a")
+    cache.put("c", {"status": "Accepted"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_same_list_is_applied_once_for_the_fleet():
+    store = AuthStore()
+    shared = store.list()
+    status, first = store.apply(shared, 0, "cp1", 1, "Full", [entry("a")])
+    assert (status, first) == ("Accepted", shared)
+    status, second = store.apply(shared, 0, "cp2", 1, "Full", [entry("a")])
+    assert (status, second) == ("Accepted", shared)
+    assert store.lists.keys() == {"default"}
+
+
+def test_different_list_with_the_same_version_is_kept_apart():
+    store = AuthStore()
+    shared = store.list()
+    store.apply(shared, 0, "cp1", 1, "Full", [entry("a")])
+    status, own = store.apply(shared, 0, "cp2", 1, "Full", [entry("b")])
+    assert status == "Accepted"
+    assert own is store.lists["cp2"]
+    assert "a" in shared and "b" not in shared
+    assert "b" in own
+    status, _ = store.apply(shared, 0, "cp3", 2, "Differential", [entry("c")])
+    assert status == "Failed"
+
+
+def test_list_version_is_kept_per_charger():
+    first = models.Charger.create("list_version_1", 1)
+    fresh = models.Charger.create("list_version_2", 1)
+    first.handler_for_send_local_list(
+        list_version=1000, update_type="Full", local_authorization_list=[entry("a")]
+    )
+    assert first.handler_for_get_local_list_version() == {"list_version": 1000}
+    assert fresh.handler_for_get_local_list_version() == {"list_version": 0}
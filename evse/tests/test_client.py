@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from client import ChargerClient, FleetClient
+from exceptions import TransactionError
+from ocpp.messages import Call
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action
+from provisioning import Provisioner
+from websockets.server import serve
+
+REPLIES = {
+    "BootNotification": {
+        "currentTime": "2024-01-01T00:00:00+00:00",
+        "interval": 0,
+        "status": "Accepted",
+    },
+    "Heartbeat": {"currentTime": "2024-01-01T00:00:00+00:00"},
+    "MeterValues": {},
+}
+
+
+class CSMS:
+    def __init__(self):
+        self.chargers = {}
+
+    async def __call__(self, websocket):
+        self.chargers[websocket.path.strip("/")] = websocket
+        async for message in websocket:
+            frame = json.loads(message)
+            if frame[0] == 2:
+                reply = REPLIES.get(frame[2])
+                if reply is None:
+                    reply = [4, frame[1], "NotImplemented", "", {}]
+                else:
+                    reply = [3, frame[1], reply]
+                await websocket.send(json.dumps(reply))
+
+    async def start(self):
+        server = await serve(self, "127.0.0.1", 0, subprotocols=["ocpp1.6"])
+        return server, f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def run(scenario):
+    async def with_csms():
+        csms = CSMS()
+        server, url = await csms.start()
+        try:
+            return await scenario(csms, url)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(asyncio.wait_for(with_csms(), timeout=20))
+
+
+def test_calls_return_typed_results():
+    async def scenario(csms, url):
+        async with ChargerClient.create("client-1", 1, "secret") as client:
+            await client.connect(url)
+            assert await client.is_up()
+            boot = await client.boot_notification(model="Fast", vendor="Acme")
+            heartbeat = await client.heartbeat()
+            # the CSMS answers StartTransaction with a CallError
+            started = await client.start_transaction("tag")
+            return boot, heartbeat, started
+
+    boot, heartbeat, started = run(scenario)
+    assert isinstance(boot, call_result.BootNotificationPayload)
+    assert boot.status == "Accepted"
+    assert isinstance(heartbeat, call_result.HeartbeatPayload)
+    assert started is None
+
+
+def test_calls_that_cannot_be_sent_raise():
+    async def scenario(csms, url):
+        client = ChargerClient.create("client-2", 1, "secret")
+        with pytest.raises(ConnectionError):
+            await client.heartbeat()
+        async with client:
+            await client.connect(url)
+            with pytest.raises(TransactionError):
+                await client.stop_transaction(connector_id=1)
+
+    run(scenario)
+
+
+def test_subscriptions_get_the_calls_of_their_actions():
+    async def scenario(csms, url):
+        async with ChargerClient.create("client-3", 1, "secret") as client:
+            await client.connect(url)
+            with client.subscribe(Action.GetConfiguration) as calls:
+                websocket = csms.chargers["client-3"]
+                await websocket.send(
+                    Call(
+                        "c1", Action.ChangeConfiguration, {"key": "a", "value": "b"}
+                    ).to_json()
+                )
+                await websocket.send(
+                    Call(
+                        "c2", Action.GetConfiguration, {"key": ["HeartbeatInterval"]}
+                    ).to_json()
+                )
+                inbound = await calls.get(timeout=5)
+            assert client.evse.inbound_listeners == []
+            return inbound
+
+    inbound = run(scenario)
+    assert inbound.call.unique_id == "c2"
+    assert inbound.reply.payload["configurationKey"][0]["key"] == "HeartbeatInterval"
+
+
+def test_a_provisioned_fleet_is_driven_in_bulk():
+    fleet = Provisioner()
+    fleet.provision((i, {"id": f"bulk-{i}", "connectors": 2}) for i in range(20))
+
+    async def scenario(csms, url):
+        chargers = FleetClient.provisioned(fleet)
+        assert await chargers.connect(url) == {}
+        results = await chargers.map(
+            lambda client: asyncio.gather(
+                *(client.meter_values(current=i) for i in range(10))
+            )
+        )
+        heartbeats = await chargers.send(Action.Heartbeat)
+        await chargers.close()
+        return chargers, results, heartbeats
+
+    chargers, results, heartbeats = run(scenario)
+    assert len(chargers) == 20
+    assert all(len(replies) == 10 for replies in results.values())
+    assert all(
+        isinstance(reply, call_result.HeartbeatPayload) for reply in heartbeats.values()
+    )
+    assert len(chargers["bulk-3"].abstraction.get_connector(1).meter) == 10
@@ -0,0 +1,70 @@
+import asyncio
+import socket
+import threading
+import time
+
+import clock
+from models import Charger
+from ocpp.v16.enums import Action
+
+
+def test_virtual_time_skips_sleeps():
+    virtual_clock = clock.VirtualClock(start=0)
+
+    async def sleep():
+        await asyncio.sleep(3600)
+        return clock.current().time()
+
+    start = time.perf_counter()
+    assert clock.run_virtual(sleep(), virtual_clock, real_wait=0) == 3600
+    assert time.perf_counter() - start < 1
+    assert virtual_clock.now().isoformat() == "1970-01-01T01:00:00+00:00"
+
+
+def test_timeouts_run_on_virtual_time():
+    async def wait():
+        try:
+            await asyncio.wait_for(asyncio.Event().wait(), timeout=30)
+        except asyncio.TimeoutError:
+            return clock.current().monotonic()
+
+    assert clock.run_virtual(wait(), real_wait=0) == 30
+
+
+def test_heartbeats_follow_virtual_time():
+    virtual_clock = clock.VirtualClock()
+    charger = Charger("virtual", 1)
+    charger.clock = virtual_clock
+    sent = []
+    charger.outbox = lambda action, **kwargs: sent.append(action)
+    charger.configuration.override("HeartbeatInterval", 60)
+
+    async def hour():
+        charger.schedule_heartbeat()
+        await asyncio.sleep(3630)
+
+    clock.run_virtual(hour(), virtual_clock, real_wait=0)
+
+    assert sent == [Action.Heartbeat] * 60
+
+
+def test_replies_in_flight_are_waited_for_in_real_time():
+    virtual_clock = clock.VirtualClock(start=0)
+
+    async def slow_reply():
+        # a slow CSMS replying after 100ms of real time
+        reader, writer = await asyncio.open_connection(sock=csms)
+        with virtual_clock.in_flight():
+            reply = await asyncio.wait_for(reader.read(5), timeout=30)
+        writer.close()
+        return reply
+
+    charger, csms = socket.socketpair()
+    timer = threading.Timer(0.1, charger.send, [b"reply"])
+    timer.start()
+    try:
+        assert clock.run_virtual(slow_reply(), virtual_clock) == b"reply"
+    finally:
+        timer.join()
+        charger.close()
+    assert virtual_clock.monotonic() < 30
@@ -0,0 +1,49 @@
+from configuration import ConfigurationKey, ConfigurationRegistry, KeyType
+from frames import SerializedPayload
+from handler import ChargerHandler
+from ocpp.messages import Call
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action, ConfigurationStatus
+
+
+def test_change_configuration_checks_keys():
+    configuration = ConfigurationRegistry()
+    assert configuration.change("HeartbeatInterval", "60") == "Accepted"
+    assert configuration["HeartbeatInterval"] == 60
+    assert configuration.change("HeartbeatInterval", "often") == "Rejected"
+    assert configuration.change("NumberOfConnectors", "3") == "Rejected"
+    assert configuration.change("Unknown", "1") == ConfigurationStatus.not_supported
+
+
+def test_get_configuration_filters_and_reports_unknown_keys():
+    configuration = ConfigurationRegistry()
+    configuration.define(ConfigurationKey("Custom", KeyType.string, "value"))
+    entries, unknown = configuration.get_configuration(["Custom", "Unknown"])
+    assert entries == [{"key": "Custom", "readonly": False, "value": "value"}]
+    assert unknown == ["Unknown"]
+
+
+def test_get_configuration_is_cached_until_changed():
+    configuration = ConfigurationRegistry()
+    entries, _ = configuration.get_configuration()
+    assert configuration.get_configuration()[0] is entries
+    configuration.change("MeterValuesSampledData", "Voltage,Current.Import")
+    entries, _ = configuration.get_configuration(["MeterValuesSampledData"])
+    assert entries[0]["value"] == "Voltage,Current.Import"
+
+
+def test_serialized_configuration_matches_the_full_path_until_changed():
+    configuration = ConfigurationRegistry()
+    handler = ChargerHandler("cp", connection=None)
+    msg = Call("1", Action.GetConfiguration, {})
+    entries, _ = configuration.get_configuration()
+    full = handler.prepare_response(
+        msg, call_result.GetConfigurationPayload(configuration_key=entries)
+    )
+    serialized = configuration.serialized_configuration()
+    reply = handler.prepare_response(msg, SerializedPayload(serialized))
+    assert reply.to_json() == full.to_json()
+    assert reply.payload == full.payload
+    assert configuration.serialized_configuration() is serialized
+    configuration.change("HeartbeatInterval", "60")
+    assert '"value":"60"' in configuration.serialized_configuration()
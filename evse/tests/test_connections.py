@@ -0,0 +1,134 @@
+import asyncio
+import shutil
+import ssl
+import subprocess
+import threading
+
+import pytest
+import websockets.exceptions
+import websockets.server
+from clock import VirtualClock, run_virtual
+from connections import Dialer, TokenBucket, failure_reason
+
+
+def test_bucket_lets_a_burst_through_then_paces():
+    clock = VirtualClock()
+    times = []
+
+    async def scenario():
+        bucket = TokenBucket(rate=10, burst=5)
+        for _ in range(105):
+            await bucket.acquire()
+            times.append(clock.monotonic())
+
+    # a bucket that never fills up again spins without advancing virtual time
+    runner = threading.Thread(
+        target=run_virtual, args=(scenario(), clock, 0), daemon=True
+    )
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert times[:5] == [0] * 5
+    assert times[-1] == pytest.approx(10.0)
+
+
+def test_bucket_used_on_another_clock_does_not_stall():
+    bucket = TokenBucket(rate=1, burst=1)
+    asyncio.run(bucket.acquire())
+    clock = VirtualClock()
+
+    async def scenario():
+        await bucket.acquire()
+        await bucket.acquire()
+
+    # the wall clock is far ahead of a virtual clock starting at 0
+    runner = threading.Thread(
+        target=run_virtual, args=(scenario(), clock, 0), daemon=True
+    )
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert clock.monotonic() == pytest.approx(2.0)
+
+
+def test_configure_rejects_invalid_values():
+    dialer = Dialer()
+    with pytest.raises(ValueError):
+        dialer.configure(rate=0, burst=1, concurrency=1)
+    with pytest.raises(ValueError):
+        dialer.configure(rate=1, burst=1, concurrency=0)
+
+
+def test_failure_reasons():
+    assert failure_reason(ConnectionRefusedError()) == "refused"
+    assert failure_reason(asyncio.TimeoutError()) == "timeout"
+    assert failure_reason(ssl.SSLCertVerificationError()) == "certificate"
+    assert failure_reason(websockets.exceptions.InvalidStatusCode(401, {})) == (
+        "http 401"
+    )
+    assert failure_reason(OSError()) == "network"
+    assert failure_reason(KeyError()) == "KeyError"
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not available")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+def test_wss_connects_share_the_tls_context(certificate):
+    cert, key = certificate
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(cert, key)
+
+    async def echo(websocket):
+        await websocket.wait_closed()
+
+    async def scenario():
+        async with websockets.server.serve(
+            echo, "127.0.0.1", 0, ssl=server_context
+        ) as server:
+            port = server.sockets[0].getsockname()[1]
+            url = f"wss://127.0.0.1:{port}"
+            trusting = Dialer(rate=100, burst=2, concurrency=1, ca_file=cert)
+            first = await trusting.connect(url)
+            connections = await asyncio.gather(
+                *(trusting.connect(url) for _ in range(3))
+            )
+            for connection in [first, *connections]:
+                await connection.close()
+            untrusting = Dialer()
+            with pytest.raises(ssl.SSLCertVerificationError):
+                await untrusting.connect(url)
+            return trusting, untrusting
+
+    trusting, untrusting = asyncio.run(scenario())
+    assert trusting.stats()["connected"] == 4
+    assert trusting.stats()["in_flight"] == 0
+    assert trusting.stats()["resumed"] == 3
+    assert trusting.stats()["handshake_latency"]["max"] > 0
+    assert untrusting.stats()["failures"] == {"certificate": 1}
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import corpus
+import pytest
+from benchmarks.bench_inbound import replay
+from ocpp.messages import MessageType
+
+
+@pytest.mark.parametrize(
+    "message_type_id, actions",
+    [(MessageType.Call, corpus.CSMS_CALLS), (MessageType.CallResult, corpus.CP_CALLS)],
+)
+def test_generated_payloads_validate(message_type_id, actions):
+    generator = corpus.CorpusGenerator(seed=1)
+    for action in actions:
+        for _ in range(20):
+            payload = generator.payload(message_type_id, action.value)
+            assert corpus.is_valid(message_type_id, action.value, payload), payload
+
+
+def test_sizes_set_the_mean_array_length():
+    generator = corpus.CorpusGenerator(seed=1, sizes={"GetConfiguration": 100})
+    payloads = (
+        generator.payload(MessageType.CallResult, "GetConfiguration")
+        for _ in range(400)
+    )
+    lengths = [
+        len(payload["configurationKey"])
+        for payload in payloads
+        if "configurationKey" in payload
+    ]
+    assert 70 < sum(lengths) / len(lengths) < 130
+
+
+def test_invalid_frames_fail_validation():
+    generator = corpus.CorpusGenerator(seed=2, invalid=1.0)
+    for _ in range(200):
+        message_type_id, action, payload = generator.message()
+        mutation, mutated = generator.mutate(message_type_id, action, payload)
+        if mutation != "malformed":
+            assert not corpus.is_valid(message_type_id, action, mutated), mutation
+    assert sum(generator.mutations.values()) == 200
+
+
+def test_read_frames_streams_what_was_written(tmp_path):
+    path = tmp_path / "corpus.ndjson"
+    metadata = corpus.write(path, corpus.CorpusGenerator(seed=3, invalid=0.2), 300)
+    frames = list(corpus.read_frames(path))
+    assert len(frames) == metadata["frames"] == 300
+    assert sum(map(len, frames)) + 300 == metadata["bytes"]
+    assert json.loads(corpus.metadata_path(path).read_text()) == metadata
+    valid = set(range(300)) - set(metadata["invalid_lines"])
+    for line in valid:
+        json.loads(frames[line])
+
+
+def test_the_controller_survives_an_invalid_corpus(tmp_path):
+    path = tmp_path / "corpus.ndjson"
+    metadata = corpus.write(path, corpus.CorpusGenerator(seed=4, invalid=0.5), 500)
+    charger, _ = asyncio.run(replay(path))
+    assert charger.malformed_frames == metadata["mutations"]["malformed"]
+    calls = 0
+    for frame in corpus.read_frames(path):
+        try:
+            calls += json.loads(frame)[0] == MessageType.Call
+        except json.JSONDecodeError:
+            pass
+    # every Call gets a reply, CallResults to nothing pending are dropped
+    assert charger.connection.sent == calls
@@ -0,0 +1,47 @@
+from correlation import CorrelationTable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_resolve_returns_call():
+    table = CorrelationTable()
+    table.add("1", "Heartbeat", {})
+    pending = table.resolve("1")
+    assert pending.action == "Heartbeat"
+    assert len(table) == 0
+
+
+def test_late_duplicate_and_unknown_responses():
+    clock = Clock()
+    table = CorrelationTable(ttl=10, clock=clock)
+    table.add("1", "Heartbeat", {})
+    table.add("2", "Heartbeat", {})
+    table.resolve("2")
+    clock.now = 11
+    table.sweep()
+    assert table.resolve("1") is None
+    assert table.resolve("2") is None
+    assert table.resolve("3") is None
+    stats = table.stats()
+    assert stats["expired"] == 1
+    assert stats["late_responses"] == 1
+    assert stats["duplicate_responses"] == 1
+    assert stats["unknown_responses"] == 1
+
+
+def test_sweep_is_batched_and_size_is_bounded():
+    clock = Clock()
+    table = CorrelationTable(ttl=10, max_size=50, sweep_batch=5, clock=clock)
+    for i in range(60):
+        table.add(str(i), "Heartbeat", {})
+    assert len(table) == 50
+    assert table.evicted == 10
+    clock.now = 11
+    table.sweep()
+    assert len(table) == 45
@@ -0,0 +1,111 @@
+import json
+
+import frames
+import pytest
+from correlation import CorrelationTable
+from ocpp.charge_point import remove_nones, snake_to_camel_case
+from ocpp.messages import Call, validate_payload
+from ocpp.v16 import call
+from ocpp.v16.enums import ChargePointErrorCode, ChargePointStatus
+
+
+def full_path(action, payload, unique_id):
+    message = Call(unique_id, action, remove_nones(snake_to_camel_case(payload)))
+    validate_payload(message, "1.6")
+    return message
+
+
+def meter_values(connector_id, transaction_id, voltage, timestamp):
+    return call.MeterValuesPayload(
+        connector_id=connector_id,
+        transaction_id=transaction_id,
+        meter_value=[
+            {
+                "timestamp": timestamp,
+                "sampled_value": [
+                    {"value": voltage, "measurand": "Voltage", "unit": "V"}
+                ],
+            }
+        ],
+    )
+
+
+def status_notification(connector_id, status, timestamp=None):
+    return call.StatusNotificationPayload(
+        connector_id=connector_id,
+        error_code=ChargePointErrorCode.no_error,
+        status=status,
+        timestamp=timestamp,
+    )
+
+
+@pytest.mark.parametrize(
+    "action, first, second",
+    [
+        ("Heartbeat", call.HeartbeatPayload(), call.HeartbeatPayload()),
+        (
+            "StatusNotification",
+            status_notification(1, ChargePointStatus.available, "2023-01-01T00:00:00"),
+            status_notification(2, "Available", "2023-01-01T00:00:30"),
+        ),
+        (
+            "MeterValues",
+            meter_values(1, 10, "230", "2023-01-01T00:00:00"),
+            meter_values(2, 11, "229.5", "2023-01-01T00:00:30"),
+        ),
+    ],
+)
+def test_rendered_frame_matches_full_path(action, first, second):
+    templates = frames.FrameTemplates()
+    assert templates.render(action, first, "1") is None
+    templates.learn(full_path(action, first.__dict__, "1"), first)
+
+    rendered = templates.render(action, second, "2")
+
+    assert rendered.to_json() == full_path(action, second.__dict__, "2").to_json()
+    assert rendered.payload == json.loads(rendered.to_json())[3]
+
+
+def test_other_shapes_take_the_full_path():
+    templates = frames.FrameTemplates()
+    first = status_notification(1, ChargePointStatus.available)
+    templates.learn(full_path("StatusNotification", first.__dict__, "1"), first)
+
+    assert templates.render("StatusNotification", first, "2") is not None
+    assert (
+        templates.render(
+            "StatusNotification",
+            status_notification(1, ChargePointStatus.charging),
+            "3",
+        )
+        is None
+    )
+    assert (
+        templates.render(
+            "StatusNotification",
+            status_notification(1, ChargePointStatus.available, "2023-01-01T00:00:00"),
+            "4",
+        )
+        is None
+    )
+    assert (
+        templates.render(
+            "StatusNotification", status_notification("1", "Available"), "5"
+        )
+        is None
+    )
+    assert templates.render("BootNotification", first, "6") is None
+
+
+def test_sending_a_rendered_call_does_not_parse_its_frame():
+    templates = frames.FrameTemplates()
+    first = call.HeartbeatPayload()
+    templates.learn(full_path("Heartbeat", {}, "1"), first)
+    rendered = templates.render("Heartbeat", first, "2")
+
+    pending = CorrelationTable().add(rendered.unique_id, rendered.action, rendered)
+    repr(rendered)
+    rendered.to_json()
+
+    assert "payload" not in rendered.__dict__
+    assert pending.payload == {}
@@ -0,0 +1,66 @@
+import corpus
+import pytest
+from history import ACTIONS, Columns, History
+from ocpp.messages import Call, CallResult, MessageType
+
+
+def exchange(history, charger_id, unique_id, action, sent_at, latency):
+    history.record(charger_id, Call(unique_id, action, {}), sent_at)
+    history.record(
+        charger_id, CallResult(unique_id, {}), sent_at + latency, latency, action
+    )
+
+
+@pytest.fixture
+def history():
+    history = History()
+    for i in range(10):
+        exchange(history, "CP1", f"h{i}", "Heartbeat", i, 0.1)
+        exchange(history, "CP2", f"m{i}", "MeterValues", i + 0.5, 0.1 * (i + 1))
+    history.record("CP1", CallResult("unknown", {}), 20)
+    return history
+
+
+def test_recording_needs_no_numpy(history):
+    assert len(history) == 41
+    assert history.charger_ids == ["CP1", "CP2"]
+    assert list(history.chargers[:4]) == [0, 0, 1, 1]
+    assert ACTIONS[history.actions[0]] == "Heartbeat"
+    assert ACTIONS[history.actions[-1]] == ""
+    assert list(history.message_types[:2]) == [MessageType.Call, MessageType.CallResult]
+
+
+def test_latency_and_throughput_by_action(history):
+    pytest.importorskip("numpy")
+    columns = history.columns()
+    latency = columns.latency_by_action()
+    assert set(latency) == {"Heartbeat", "MeterValues"}
+    assert latency["Heartbeat"]["count"] == 10
+    assert latency["Heartbeat"]["p95"] == pytest.approx(0.1)
+    assert latency["MeterValues"]["max"] == pytest.approx(1.0)
+    assert latency["MeterValues"]["mean"] == pytest.approx(0.55)
+    throughput = columns.throughput(interval=5)
+    assert list(throughput["Heartbeat"]) == [10, 10, 0, 0, 0]
+    assert throughput[""].sum() == 1
+
+
+def test_save_keeps_columns_and_frames_apart(history, tmp_path):
+    pytest.importorskip("numpy")
+    saved = history.save(tmp_path / "history")
+    assert saved["rows"] == 41
+    columns = Columns.load(tmp_path / "history.npz")
+    assert columns.chargers == ["CP1", "CP2"]
+    assert (columns.action == history.columns().action).all()
+    frames = list(corpus.read_frames(tmp_path / "history.ndjson"))
+    assert len(frames) == len(columns)
+    assert frames[0] == Call("h0", "Heartbeat", {}).to_json().encode()
+
+
+def test_a_full_history_drops_its_oldest_half():
+    history = History(max_rows=10)
+    for i in range(15):
+        history.record("CP1", Call(str(i), "Heartbeat", {}), i)
+    assert len(history) == 10
+    assert history.dropped == 5
+    assert list(history.timestamps) == list(range(5, 15))
+    assert history.messages[0].unique_id == "5"
@@ -0,0 +1,82 @@
+import asyncio
+
+import clock
+from liveness import Fleet, Liveness, LivenessState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class PingedConnection:
+    def __init__(self, answers: bool):
+        self.answers = answers
+        self.pings = 0
+
+    async def ping(self):
+        self.pings += 1
+        pong = asyncio.get_running_loop().create_future()
+        if self.answers:
+            pong.set_result(None)
+        return pong
+
+
+def test_state_follows_received_traffic():
+    fake_clock = FakeClock()
+    liveness = Liveness(interval=20, timeout=10, clock=fake_clock)
+    assert liveness.state() == LivenessState.down
+    liveness.opened()
+    fake_clock.now = 29
+    assert liveness.is_up()
+    fake_clock.now = 31
+    assert liveness.state() == LivenessState.stale
+    liveness.saw_heartbeat()
+    assert liveness.is_up()
+    liveness.closed()
+    assert liveness.state() == LivenessState.down
+
+
+def test_keepalive_only_pings_idle_connections():
+    async def scenario(connection, traffic):
+        liveness = Liveness(interval=20, timeout=10, clock=clock.current().monotonic)
+        liveness.opened()
+        keepalive = asyncio.create_task(liveness.keepalive(connection))
+        for _ in range(20):
+            await asyncio.sleep(5)
+            if traffic:
+                liveness.saw_frame()
+        keepalive.cancel()
+        return liveness
+
+    busy = PingedConnection(answers=True)
+    clock.run_virtual(scenario(busy, traffic=True), real_wait=0)
+    assert busy.pings == 0
+
+    idle = PingedConnection(answers=True)
+    liveness = clock.run_virtual(scenario(idle, traffic=False), real_wait=0)
+    assert idle.pings == 5
+    assert liveness.is_up()
+
+    silent = PingedConnection(answers=False)
+    liveness = clock.run_virtual(scenario(silent, traffic=False), real_wait=0)
+    assert 0 < liveness.missed_pongs <= silent.pings
+    assert liveness.state() == LivenessState.stale
+
+
+def test_fleet_health_summary():
+    fake_clock = FakeClock()
+    fleet = Fleet()
+    for i in range(3):
+        liveness = Liveness(interval=20, timeout=10, clock=fake_clock)
+        liveness.opened()
+        fleet.register(f"cp{i}", liveness)
+    fake_clock.now = 40
+    fleet.chargers["cp0"].saw_frame()
+    fleet.chargers["cp2"].closed()
+    health = fleet.health()
+    assert health["summary"] == {"up": 1, "stale": 1, "down": 1}
+    assert health["chargers"]["cp1"]["last_seen"] == 40
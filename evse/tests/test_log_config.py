@@ -0,0 +1,67 @@
+import io
+import threading
+import time
+
+import structlog
+from log_config import ActionSampler, BackgroundSink, parse_sampling
+
+
+def test_parse_sampling():
+    assert parse_sampling("MeterValues=100, Heartbeat=10") == {
+        "MeterValues": 100,
+        "Heartbeat": 10,
+    }
+    assert parse_sampling("") == {}
+
+
+def test_sampler_keeps_one_in_n():
+    sampler = ActionSampler({"MeterValues": 3})
+    kept = 0
+    for _ in range(9):
+        try:
+            sampler(None, "info", {"action": "MeterValues"})
+            kept += 1
+        except structlog.DropEvent:
+            pass
+    assert kept == 3
+    assert sampler(None, "info", {"action": "Heartbeat"})
+
+
+class Unrenderable:
+    def __repr__(self):
+        raise RuntimeError("no repr")
+
+
+def test_sink_survives_unrenderable_events():
+    file = io.StringIO()
+    sink = BackgroundSink(file=file)
+    sink.msg(event="bad", value=Unrenderable(), timestamp=time.time())
+    sink.msg(event="good", timestamp=time.time())
+    sink.close()
+    assert sink.failed == 1
+    assert "good" in file.getvalue()
+
+
+class BlockingFile(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.release.wait()
+        return super().write(text)
+
+
+def test_sink_drops_events_beyond_max_queued():
+    file = BlockingFile()
+    sink = BackgroundSink(file=file, max_queued=2)
+    sink.msg(event="written", timestamp=time.time())
+    assert file.writing.wait(1)
+    for i in range(5):
+        sink.msg(event=f"queued {i}", timestamp=time.time())
+    file.release.set()
+    sink.close()
+    assert sink.dropped == 3
+    assert sink.written == 3
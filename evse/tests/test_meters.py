@@ -0,0 +1,65 @@
+import models
+import pytest
+from clock import VirtualClock
+from meters import MeterSeries, Resolution, Ring
+from ocpp.v16.enums import Action
+
+
+def test_a_full_ring_overwrites_its_oldest_rows():
+    ring = Ring(3)
+    for i in range(5):
+        ring.append(i, i * 10, i * 100)
+    assert len(ring) == 3
+    assert list(ring.rows()) == [(2, 20, 200), (3, 30, 300), (4, 40, 400)]
+
+
+def test_energy_is_integrated_from_power():
+    meter = MeterSeries()
+    meter.record(0, 3600)
+    meter.record(60, 7200)
+    meter.record(120, 0)
+    assert meter.query()["energy"] == [0, 60, 180]
+    meter.record(180, 0, energy=1000)
+    assert meter.energy == 1000
+
+
+def test_readings_are_downsampled():
+    meter = MeterSeries()
+    for second in range(0, 1800, 10):
+        meter.record(second, 1000 if second < 900 else 2000)
+    minutes = meter.query(Resolution.minute)
+    assert len(minutes["timestamps"]) == 30
+    assert minutes["timestamps"][:2] == [0, 60]
+    assert minutes["power"][0] == pytest.approx(1000)
+    quarters = meter.query(Resolution.quarter)
+    assert quarters["timestamps"] == [0, 900]
+    assert quarters["power"] == pytest.approx([1000, 2000])
+    assert quarters["energy"][0] == pytest.approx(1000 * 890 / 3600)
+    assert meter.query(Resolution.minute, since=600, until=660)["timestamps"] == [
+        600,
+        660,
+    ]
+
+
+def test_memory_is_bounded_however_long_the_run():
+    meter = MeterSeries(raw=10, minutes=5, quarters=2)
+    assert meter.rings is None
+    for second in range(0, 86400, 10):
+        meter.record(second, 1000)
+    assert [len(meter.rings[resolution]) for resolution in Resolution] == [10, 5, 2]
+    assert len(meter.query(Resolution.quarter)["timestamps"]) == 3
+    assert meter.energy == pytest.approx(1000 * 86390 / 3600)
+
+
+def test_meter_values_are_recorded_on_their_connector():
+    charger = models.Charger.create("CP1", 2)
+    charger.clock = VirtualClock(start=0)
+    for _ in range(3):
+        charger.create_data_for_payload(
+            Action.MeterValues, connector_id=2, voltage=230, current=16
+        )
+        charger.clock.advance(60)
+    assert len(charger.get_connector(1).meter) == 0
+    curves = charger.get_connector(2).meter.query()
+    assert curves["power"] == [3680] * 3
+    assert curves["energy"][-1] == pytest.approx(3680 * 120 / 3600)
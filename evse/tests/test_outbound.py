@@ -0,0 +1,83 @@
+import asyncio
+
+from ocpp.v16 import call
+from outbound import OutboundQueue, Priority
+
+
+def meter_values(connector_id, value, transaction_id=None):
+    return call.MeterValuesPayload(
+        connector_id=connector_id,
+        meter_value=[{"value": value}],
+        transaction_id=transaction_id,
+    )
+
+
+def test_transactional_messages_go_first():
+    async def scenario():
+        queue = OutboundQueue()
+        queue.put("Heartbeat", call.HeartbeatPayload())
+        queue.put("Authorize", call.AuthorizePayload(id_tag="rfid"))
+        message = await queue.get()
+        assert message.priority == Priority.transactional
+
+    asyncio.run(scenario())
+
+
+def test_status_notifications_are_coalesced():
+    async def scenario():
+        queue = OutboundQueue()
+        first = queue.put(
+            "StatusNotification",
+            call.StatusNotificationPayload(1, "NoError", "Preparing"),
+        )
+        second = queue.put(
+            "StatusNotification",
+            call.StatusNotificationPayload(1, "NoError", "Charging"),
+        )
+        assert first is second
+        assert len(queue) == 1
+        assert (await queue.get()).payload.status == "Charging"
+        assert queue.coalesced["StatusNotification"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_meter_values_are_merged_when_congested():
+    async def scenario():
+        queue = OutboundQueue(high_water=2)
+        queue.put("MeterValues", meter_values(1, 1))
+        queue.put("MeterValues", meter_values(1, 2))
+        assert len(queue) == 2
+        queue.put("MeterValues", meter_values(1, 3))
+        assert len(queue) == 2
+        assert queue.coalesced["MeterValues"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_telemetry_is_dropped_when_full():
+    async def scenario():
+        queue = OutboundQueue(high_water=10, max_size=2)
+        dropped = queue.put("MeterValues", meter_values(1, 1))
+        queue.put("MeterValues", meter_values(2, 1))
+        queue.put("StartTransaction", call.StartTransactionPayload(1, "rfid", 0, ""))
+        assert len(queue) == 2
+        assert queue.dropped["MeterValues"] == 1
+        assert dropped.done()
+
+    asyncio.run(scenario())
+
+
+def test_transaction_meter_values_stay_before_stop_transaction():
+    async def scenario():
+        queue = OutboundQueue(high_water=10, max_size=2)
+        queue.put("MeterValues", meter_values(1, 1, transaction_id=5))
+        queue.put("StopTransaction", call.StopTransactionPayload(10, "", 5))
+        queue.put("MeterValues", meter_values(2, 1))
+        assert [(await queue.get()).action for _ in range(2)] == [
+            "MeterValues",
+            "StopTransaction",
+        ]
+        assert queue.dropped["MeterValues"] == 1
+
+    asyncio.run(scenario())
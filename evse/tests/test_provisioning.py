@@ -0,0 +1,155 @@
+import json
+
+import pytest
+from exceptions import ProvisioningError
+from provisioning import Provisioner, read_definitions, read_json_array
+
+
+def write_csv(path, rows):
+    header = "id,password,connectors,vendor,model,features,config.HeartbeatInterval"
+    path.write_text("\n".join([header, *rows]) + "\n")
+    return path
+
+
+def test_csv_chargers_share_templates(tmp_path):
+    path = write_csv(
+        tmp_path / "fleet.csv",
+        [
+            f"CP{i},secret,2,Acme,{'Fast' if i % 2 else 'Slow'},smart_charging,60"
+            for i in range(10)
+        ],
+    )
+    fleet = Provisioner(batch_size=3)
+    report = fleet.provision_file(path)
+    assert report.provisioned == 10
+    assert report.templates == 2
+    charger = fleet.chargers["CP1"]
+    assert charger.password == "secret"
+    assert len(charger.connectors) == 2
+    assert charger.supports_smart_charging
+    assert charger.configuration["HeartbeatInterval"] == 60
+    payload = charger.payload_for_boot_notification()
+    assert payload["charge_point_vendor"] == "Acme"
+    assert payload["charge_point_model"] == "Fast"
+
+
+def test_json_lines_and_arrays_are_streamed(tmp_path):
+    definitions = [
+        {
+            "id": f"CP{i}",
+            "connectors": 1,
+            "features": {"reservation": False},
+            "configuration": {"MeterValueSampleInterval": 10},
+        }
+        for i in range(50)
+    ]
+    lines = tmp_path / "fleet.jsonl"
+    lines.write_text("\n".join(json.dumps(d) for d in definitions))
+    array = tmp_path / "fleet.json"
+    array.write_text(json.dumps(definitions, indent=1))
+    with array.open() as file:
+        # chunks smaller than a definition
+        assert [d for _, d in read_json_array(file, read_size=7)] == definitions
+    for path in (lines, array):
+        fleet = Provisioner()
+        assert fleet.provision_file(path).provisioned == 50
+        assert not fleet.chargers["CP49"].supports_reservation
+
+
+def test_invalid_definitions_are_reported_by_line(tmp_path):
+    path = write_csv(
+        tmp_path / "fleet.csv",
+        [
+            "CP1,,1,,,,",
+            ",,1,,,,",
+            "CP3,,none,,,,",
+            "CP4,,1,,,teleport,",
+            "CP5,,1,,,,often",
+        ],
+    )
+    report = Provisioner().provision_file(path)
+    assert report.provisioned == 1
+    assert report.failed == 4
+    assert report.errors[0] == "line 3: Missing id"
+    assert [error.split(":")[0] for error in report.errors] == [
+        "line 3",
+        "line 4",
+        "line 5",
+        "line 6",
+    ]
+
+
+def test_unknown_formats_are_refused(tmp_path):
+    path = tmp_path / "fleet.xml"
+    path.write_text("<fleet/>")
+    with pytest.raises(ProvisioningError):
+        list(read_definitions(path))
+
+
+def test_provisioning_is_quick(tmp_path):
+    path = write_csv(
+        tmp_path / "fleet.csv",
+        [f"CP{i},secret,2,Acme,Fast,,60" for i in range(2000)],
+    )
+    report = Provisioner().provision_file(path)
+    assert report.provisioned == 2000
+    assert report.rate > 2000
+
+
+def test_compression_profiles_are_provisioned(tmp_path):
+    path = tmp_path / "fleet.jsonl"
+    path.write_text(
+        '{"id": "CP1", "compression": "small"}\n{"id": "CP2", "compression": "zstd"}\n'
+    )
+    fleet = Provisioner()
+    report = fleet.provision_file(path)
+    assert fleet.chargers["CP1"].compression == "small"
+    assert report.failed == 1
+    assert report.errors[0].startswith("line 2: Unknown compression profile zstd")
+
+
+def test_mistyped_fields_are_reported_by_line(tmp_path):
+    path = tmp_path / "fleet.jsonl"
+    path.write_text(
+        '{"id": "CP1", "configuration": [1]}\n'
+        '{"id": "CP2", "features": ["core", 1]}\n'
+        '{"id": 3}\n'
+        '{"id": "CP4"}\n'
+    )
+    fleet = Provisioner()
+    report = fleet.provision_file(path)
+    assert report.provisioned == 1
+    assert [error.split(":")[0] for error in report.errors] == [
+        "line 1",
+        "line 2",
+        "line 3",
+    ]
+
+
+def test_duplicate_ids_are_reported_unless_replaced(tmp_path):
+    path = write_csv(tmp_path / "fleet.csv", ["CP1,a,1,,,,", "CP1,b,1,,,,"])
+    fleet = Provisioner()
+    report = fleet.provision_file(path)
+    assert report.provisioned == 1
+    assert report.errors == ["line 3: Duplicate id CP1"]
+    assert fleet.chargers["CP1"].password == "a"
+    assert fleet.provision_file(path).failed == 2
+    report = fleet.provision_file(path, replace=True)
+    assert report.provisioned == 2
+    assert fleet.chargers["CP1"].password == "b"
+
+
+def test_malformed_array_entries_are_skipped(tmp_path):
+    path = tmp_path / "fleet.json"
+    entries = [{"id": f"CP{i}", "features": "core"} for i in range(100)]
+    text = json.dumps(entries)
+    # the second entry is broken, with a string holding `,` and `}`
+    text = text.replace('{"id": "CP1", ', '{"id": "CP1", "x": ",}" oops, ', 1)
+    path.write_text(text)
+    with path.open() as file:
+        read = list(read_json_array(file, read_size=16))
+    assert read[1] == (2, None)
+    assert [d for _, d in read if d is not None] == entries[:1] + entries[2:]
+    path.write_text(text[:-30])
+    with pytest.raises(ProvisioningError, match="Truncated"), path.open() as file:
+        list(read_json_array(file, read_size=16))
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import models
+from ocpp.v16.enums import Action, ChargePointStatus
+
+
+def in_an_hour():
+    return (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+
+
+def charger_with_outbox(charger_id):
+    charger = models.Charger.create(charger_id, 2)
+    sent = []
+    charger.outbox = lambda action, **kwargs: sent.append((action, kwargs))
+    return charger, sent
+
+
+def test_rejected_reserve_now_keeps_the_reservation():
+    charger, _ = charger_with_outbox("reserve_rejected")
+    charger.handler_for_reserve_now(1, in_an_hour(), "tag", 9)
+    charger.get_connector(2).status = ChargePointStatus.faulted
+    assert charger.handler_for_reserve_now(2, in_an_hour(), "tag", 9) == {
+        "status": "Faulted"
+    }
+    assert charger.reservations == {9: 1}
+    assert charger.get_connector(1).status == ChargePointStatus.reserved
+    charger.remove_reservation(9)
+
+
+def test_moved_reservation_frees_and_announces_the_old_connector():
+    charger, sent = charger_with_outbox("reserve_moved")
+    charger.handler_for_reserve_now(2, in_an_hour(), "tag", 9)
+    assert charger.handler_for_reserve_now(1, in_an_hour(), "tag", 9) == {
+        "status": "Accepted"
+    }
+    assert charger.reservations == {9: 1}
+    assert sent == [
+        (
+            Action.StatusNotification,
+            {
+                "connector_id": 2,
+                "status": ChargePointStatus.available,
+                "error": "NoError",
+            },
+        )
+    ]
+    charger.remove_reservation(9)
+
+
+def test_reservation_expiring_in_the_past_is_rejected():
+    charger, _ = charger_with_outbox("reserve_past")
+    expired = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    assert charger.handler_for_reserve_now(1, expired, "tag", 9) == {
+        "status": "Rejected"
+    }
+    assert charger.reservations == {}
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import controller
+from ocpp.messages import Call
+from ocpp.v16.enums import Action
+from responses import ResponseCache
+from websockets.server import serve
+
+
+def test_cached_replies_expire():
+    now = [0]
+    cache = ResponseCache(ttl=10, clock=lambda: now[0])
+    cache.put("1", "Reset", "frame")
+    assert cache.get("1", "Reset") == "frame"
+    assert cache.get("2", "Reset") is None
+    now[0] = 11
+    assert cache.get("1", "Reset") is None
+    assert cache.stats() == {"cached": 0, "hits": 1, "expired": 1, "evicted": 0}
+
+
+def test_oldest_replies_are_evicted():
+    cache = ResponseCache(max_size=2)
+    for unique_id in "123":
+        cache.put(unique_id, "Reset", unique_id)
+    assert cache.get("1", "Reset") is None
+    assert cache.get("3", "Reset") == "3"
+    assert cache.evicted == 1
+
+
+def test_only_the_same_action_is_replayed():
+    cache = ResponseCache()
+    cache.put("1", "Reset", "frame")
+    assert cache.get("1", "UnlockConnector") is None
+    assert cache.get("1", "Reset") is None
+    cache.put("1", "Reset", "frame")
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_a_retransmitted_trigger_message_is_handled_once():
+    received = []
+    trigger = Call(
+        "trigger",
+        Action.TriggerMessage,
+        {"requestedMessage": "BootNotification"},
+    ).to_json()
+
+    async def csms(websocket):
+        await websocket.send(trigger)
+        await websocket.send(trigger)
+        async for message in websocket:
+            frame = json.loads(message)
+            received.append(frame)
+            if frame[0] == 2:
+                await websocket.send(
+                    json.dumps(
+                        [
+                            3,
+                            frame[1],
+                            {
+                                "currentTime": "2024-01-01T00:00:00+00:00",
+                                "interval": 300,
+                                "status": "Accepted",
+                            },
+                        ]
+                    )
+                )
+
+    async def scenario():
+        async with serve(csms, "127.0.0.1", 0, subprotocols=["ocpp1.6"]) as server:
+            port = server.sockets[0].getsockname()[1]
+            charger = controller.EVSE()
+            charger.create("retransmit", 1, "password")
+            charger.connection = await charger.create_ws_connection(
+                f"ws://127.0.0.1:{port}"
+            )
+            running = asyncio.create_task(charger.run())
+            while not any(frame[0] == 2 for frame in received):
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            running.cancel()
+            await charger.connection.close()
+            return charger
+
+    charger = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    replies = [frame for frame in received if frame[1] == "trigger"]
+    boots = [frame for frame in received if frame[0] == 2]
+    assert len(replies) == 2
+    assert replies[0] == replies[1] == [3, "trigger", {"status": "Accepted"}]
+    assert [frame[2] for frame in boots] == ["BootNotification"]
+    assert charger.responses.hits == 1
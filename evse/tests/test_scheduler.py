@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from scheduler import Scheduler
+
+
+def test_run_due_in_order():
+    scheduler = Scheduler(clock=lambda: 0)
+    ran = []
+    scheduler.call_at(20, ran.append, "second")
+    scheduler.call_at(10, ran.append, "first")
+    scheduler.call_at(30, ran.append, "third")
+
+    assert scheduler.run_due(now=5) == 0
+    assert scheduler.run_due(now=20) == 2
+    assert ran == ["first", "second"]
+    assert scheduler.next_due() == 30
+    assert len(scheduler) == 1
+
+
+def test_cancelled_events_do_not_run():
+    scheduler = Scheduler(clock=lambda: 0)
+    ran = []
+    event = scheduler.call_at(10, ran.append, "cancelled")
+    scheduler.call_at(10, ran.append, "kept")
+    scheduler.cancel(event)
+
+    assert scheduler.run_due(now=10) == 1
+    assert ran == ["kept"]
+    assert scheduler.next_due() is None
+
+
+def test_cancel_compacts_heap():
+    scheduler = Scheduler(clock=lambda: 0)
+    events = [scheduler.call_at(when, print) for when in range(10)]
+    for event in events[:6]:
+        scheduler.cancel(event)
+
+    assert len(scheduler._heap) == 4
+    assert len(scheduler) == 4
+
+
+def test_clear_drops_pending_events():
+    scheduler = Scheduler(clock=lambda: 0)
+    event = scheduler.call_at(10, print)
+    scheduler.clear()
+    assert len(scheduler) == 0
+    assert event.cancelled
+    assert scheduler.run_due(now=10) == 0
+
+
+def test_events_run_on_a_new_loop_behind_stale_ones():
+    scheduler = Scheduler(clock=time.monotonic)
+    ran = []
+
+    async def stale():
+        scheduler.call_later(0.01, ran.append, "stale")
+
+    async def scenario():
+        scheduler.call_later(0.02, ran.append, "new")
+        await asyncio.sleep(0.1)
+
+    # the first loop is gone before its event is due, which stays on top
+    asyncio.run(stale())
+    asyncio.run(scenario())
+    assert ran == ["stale", "new"]
@@ -0,0 +1,49 @@
+import history
+import pytest
+from benchmarks.soak import Probe, fit, run
+
+HOURS = [hour * 3600 for hour in range(24)]
+
+
+def test_linear_growth_fails():
+    growth = fit(HOURS, [100 + 10 * hour for hour in range(24)], 0.1, 10)
+    assert growth.failed
+    assert growth.slope == pytest.approx(10)
+    assert growth.r2 == pytest.approx(1)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [100 + (hour % 3) for hour in range(24)],
+        # a bounded structure dropping its oldest half when full
+        [50 + (hour * 10) % 50 for hour in range(24)],
+        # grows, but by less than the threshold
+        [1000 + hour for hour in range(24)],
+    ],
+)
+def test_bounded_or_slow_growth_passes(values):
+    assert not fit(HOURS, values, 0.1, 10).failed
+
+
+def test_a_virtual_soak_finds_the_leak(monkeypatch):
+    monkeypatch.setattr(history.exchanges, "max_rows", 200)
+    leak = []
+    sampler = run(
+        chargers=2,
+        duration=6 * 3600,
+        interval=900,
+        session=1800,
+        objects=False,
+        extra_probes=[Probe("leak", lambda: leak.append(0) or len(leak))],
+    )
+    report = sampler.report()
+    assert report.duration == pytest.approx(6 * 3600, rel=0.01)
+    assert [growth.name for growth in report.failed] == ["leak"]
+    assert {growth.name for growth in report.growth} >= {
+        "tasks",
+        "history",
+        "follow_tasks",
+        "correlation",
+        "transactions",
+    }
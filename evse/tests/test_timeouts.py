@@ -0,0 +1,47 @@
+from timeouts import DEFAULT_WINDOW, MIN_SAMPLES, AdaptiveTimeouts
+
+
+def test_initial_timeout_until_enough_samples():
+    timeouts = AdaptiveTimeouts(floor=1, ceiling=30, initial=10)
+    timeouts.observe("MeterValues", 0.1)
+    assert timeouts.timeout_for("MeterValues") == 10
+
+
+def test_timeout_follows_latency_within_bounds():
+    timeouts = AdaptiveTimeouts(floor=1, ceiling=30, percentile=0.5, margin=1)
+    for _ in range(MIN_SAMPLES):
+        timeouts.observe("StartTransaction", 4)
+    assert timeouts.timeout_for("StartTransaction") == 8
+    for _ in range(MIN_SAMPLES):
+        timeouts.observe("Heartbeat", 0.01)
+    assert timeouts.timeout_for("Heartbeat") == 1
+    for _ in range(MIN_SAMPLES):
+        timeouts.observe("MeterValues", 60)
+    assert timeouts.timeout_for("MeterValues") == 30
+
+
+def test_slow_responses_and_timeouts_are_counted_apart():
+    timeouts = AdaptiveTimeouts()
+    for _ in range(MIN_SAMPLES):
+        timeouts.observe("MeterValues", 1)
+    timeouts.observe("MeterValues", 2)
+    timeouts.record_timeout("MeterValues")
+    stats = timeouts.stats()["MeterValues"]
+    assert stats["slow_responses"] == 1
+    assert stats["timeouts"] == 1
+
+
+def test_timeout_grows_when_the_csms_slows_down():
+    timeouts = AdaptiveTimeouts(floor=1, ceiling=30)
+    for _ in range(DEFAULT_WINDOW):
+        timeouts.observe("Heartbeat", 0.1)
+    assert timeouts.timeout_for("Heartbeat") == 1
+    expired = 0
+    for _ in range(20):
+        if timeouts.timeout_for("Heartbeat") < 1.5:
+            timeouts.record_timeout("Heartbeat")
+            expired += 1
+        else:
+            timeouts.observe("Heartbeat", 1.5)
+    assert expired <= 3
+    assert timeouts.timeout_for("Heartbeat") > 1.5
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import controller
+import models
+from ocpp.messages import Call, CallResult
+from ocpp.v16 import call_result
+from ocpp.v16.enums import Action, Reason
+from transactions import TransactionIndex
+from websockets.server import serve
+
+
+def test_index_lookup():
+    index = TransactionIndex()
+    index.add("charger_id", 2, 100, "rfid")
+    assert index.find_by_transaction_id(100) == ("charger_id", 2)
+    assert index.find_by_id_tag("rfid") == {("charger_id", 2)}
+    index.remove(100, "rfid")
+    assert index.find_by_transaction_id(100) is None
+    assert index.find_by_id_tag("rfid") == set()
+
+
+def test_tag_on_several_connectors():
+    index = TransactionIndex()
+    index.add("charger_id", 1, 100, "rfid")
+    index.add("charger_id", 2, 101, "rfid")
+    assert index.find_by_id_tag("rfid") == {("charger_id", 1), ("charger_id", 2)}
+    index.remove(100, "rfid")
+    assert index.find_by_id_tag("rfid") == {("charger_id", 2)}
+
+
+def test_connector_transaction_flow():
+    charger = models.Charger.create("charger_id", 2)
+    connector = charger.get_connector(2)
+    connector.begin_transaction("rfid", 10)
+    connector.confirm_transaction(1, accepted=True)
+    charger.transactions.add(charger.id, connector.id, 1, "rfid")
+    assert charger.connector_for_transaction(transaction_id=1) is connector
+    assert connector.transaction.status == models.TransactionStatus.ongoing
+    connector.finish_transaction(20)
+    assert connector.end_transaction().meter_stop == 20
+    assert connector.status == models.ChargePointStatus.available
+    charger.transactions.remove(1, "rfid")
+
+
+def test_stop_transaction_by_id_tag():
+    charger = models.Charger.create("stop_by_tag", 2)
+    connector = charger.get_connector(2)
+    connector.begin_transaction("tag", 0)
+    connector.confirm_transaction(7, accepted=True)
+    charger.transactions.add(charger.id, connector.id, 7, "tag")
+    data = charger.payload_for_stop_transaction(id_tag="tag", meter_stop=5)
+    assert data["transaction_id"] == 7
+    charger.transactions.remove(7, "tag")
+
+
+def test_remote_stop_of_a_finishing_transaction_is_rejected():
+    charger = models.Charger.create("remote_stop_finishing", 1)
+    connector = charger.get_connector(1)
+    connector.begin_transaction("tag", 0)
+    connector.confirm_transaction(11, accepted=True)
+    charger.transactions.add(charger.id, connector.id, 11, "tag")
+    assert charger.handler_for_remote_stop_transaction(11) == {"accepted": True}
+    charger.payload_for_stop_transaction(transaction_id=11)
+    assert charger.handler_for_remote_stop_transaction(11) == {"accepted": False}
+    charger.transactions.remove(11, "tag")
+
+
+def test_a_follow_up_that_cant_be_sent_is_logged():
+    charger = controller.EVSE()
+    charger.create("follow_up", 1, "password")
+    request = Call("1", Action.RemoteStopTransaction, {"transactionId": 12})
+    accepted = CallResult("1", {"status": "Accepted"}, Action.RemoteStopTransaction)
+    # the transaction is unknown: the StopTransaction raises a TransactionError
+    asyncio.run(charger.follow_incoming_messages(request, accepted))
+    assert len(charger.outbound) == 0
+
+
+def test_invalid_id_tag_stops_the_transaction():
+    charger = models.Charger.create("invalid_tag", 1)
+    sent = []
+    charger.outbox = lambda action, **kwargs: sent.append((action, kwargs))
+    charger.payload_for_start_transaction(connector_id=1, rfid="stolen")
+    call = Call("1", Action.StartTransaction, {"connectorId": 1, "idTag": "stolen"})
+    response = call_result.StartTransactionPayload(
+        transaction_id=8, id_tag_info={"status": "Invalid"}
+    )
+    charger.handle_validated_call_response(call, response)
+    assert sent == [
+        (
+            Action.StopTransaction,
+            {"transaction_id": 8, "reason": Reason.de_authorized},
+        )
+    ]
+    charger.transactions.remove(8, "stolen")
+
+
+def test_remote_stop_right_after_start_transaction():
+    """The StartTransaction response is applied before the next frame is read."""
+    replies = {}
+
+    async def csms(websocket):
+        async for message in websocket:
+            message_type, unique_id, *rest = json.loads(message)
+            if message_type == 3:
+                replies[unique_id] = rest[0]
+                continue
+            if rest[0] == Action.StartTransaction:
+                start = CallResult(
+                    unique_id, {"transactionId": 9, "idTagInfo": {"status": "Accepted"}}
+                )
+                stop = Call(
+                    "remote", Action.RemoteStopTransaction, {"transactionId": 9}
+                )
+                await websocket.send(start.to_json())
+                await websocket.send(stop.to_json())
+            elif rest[0] == Action.StopTransaction:
+                await websocket.send(CallResult(unique_id, {}).to_json())
+
+    async def scenario():
+        async with serve(csms, "127.0.0.1", 0, subprotocols=["ocpp1.6"]) as server:
+            port = server.sockets[0].getsockname()[1]
+            charger = controller.EVSE()
+            charger.create("remote_stop", 1, "password")
+            charger.connection = await charger.create_ws_connection(
+                f"ws://127.0.0.1:{port}"
+            )
+            running = asyncio.create_task(charger.run())
+            while charger.handler is None:
+                await asyncio.sleep(0)
+            await charger.send_message_to_backend(
+                Action.StartTransaction, rfid="tag", connector_id=1, meter_start=0
+            )
+            while "remote" not in replies:
+                await asyncio.sleep(0.01)
+            running.cancel()
+            await charger.connection.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert replies["remote"] == {"status": "Accepted"}
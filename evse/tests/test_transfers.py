@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+
+import pytest
+import transfers
+from file_server import FileServer, make_firmware
+
+
+def test_diagnostics_chunks_have_exact_size():
+    chunks = list(transfers.diagnostics_chunks("cp", size=1000, chunk_size=64))
+
+    assert sum(len(chunk) for chunk in chunks) == 1000
+    assert all(len(chunk) == 64 for chunk in chunks[:-1])
+
+
+def test_upload_and_download(tmp_path):
+    make_firmware(tmp_path / "firmware.bin", 300_000)
+
+    async def transfer():
+        server = await FileServer(tmp_path).start()
+        url = "http://127.0.0.1:%s" % server.sockets[0].getsockname()[1]
+        async with server:
+            sent = await transfers.upload(
+                f"{url}/diagnostics/cp.log",
+                transfers.diagnostics_chunks("cp", size=200_000),
+            )
+            received = await transfers.download(f"{url}/firmware.bin")
+        return sent, received
+
+    sent, (size, digest) = asyncio.run(transfer())
+
+    assert sent == 200_000
+    assert (tmp_path / "diagnostics" / "cp.log").stat().st_size == 200_000
+    assert size == 300_000
+    assert (
+        digest == hashlib.sha256((tmp_path / "firmware.bin").read_bytes()).hexdigest()
+    )
+
+
+def test_download_of_missing_file_fails(tmp_path):
+    async def transfer():
+        server = await FileServer(tmp_path).start()
+        url = "http://127.0.0.1:%s" % server.sockets[0].getsockname()[1]
+        async with server:
+            await transfers.with_retries(
+                lambda: transfers.download(f"{url}/missing.bin"), 1, 0
+            )
+
+    with pytest.raises(transfers.TransferError):
+        asyncio.run(transfer())
+
+
+@pytest.mark.parametrize(
+    "head",
+    [
+        b"Transfer-Encoding: chunked\r\n\r\nzz\r\n",
+        b"Transfer-Encoding: chunked\r\n\r\n",
+        b"Content-Length: lots\r\n\r\n",
+    ],
+)
+def test_bad_body_framing_is_a_transfer_error(head):
+    async def respond(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\n" + head)
+        await writer.drain()
+        writer.close()
+
+    async def transfer():
+        server = await asyncio.start_server(respond, "127.0.0.1", 0)
+        url = "http://127.0.0.1:%s/firmware.bin" % server.sockets[0].getsockname()[1]
+        async with server:
+            await transfers.with_retries(lambda: transfers.download(url), 1, 0)
+
+    with pytest.raises(transfers.TransferError, match="after 2 attempts"):
+        asyncio.run(transfer())
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import controller
+import pytest
+import wire
+from ocpp.v16.enums import Action
+from websockets.frames import OP_CONT, OP_TEXT, Frame
+from websockets.server import serve
+
+
+def test_replies_are_counted_under_the_action_of_their_call():
+    counters = wire.ByteCounters()
+    meter = wire.MessageMeter("CP1", counters)
+    call = b'[2,"1","Heartbeat",{}]'
+    meter.observe(wire.Direction.sent, True, Frame(OP_TEXT, call))
+    meter.observe(wire.Direction.sent, False, Frame(OP_TEXT, call[:10]))
+    reply = b'[3,"1",{"currentTime":"2024-01-01T00:00:00Z"}]'
+    meter.observe(wire.Direction.received, False, Frame(OP_TEXT, reply[:20]))
+    meter.observe(wire.Direction.received, True, Frame(OP_TEXT, reply))
+    # a Call from the CSMS with the same id, in two fragments
+    trigger = b'[2,"1","TriggerMessage",{"requestedMessage":"Heartbeat"}]'
+    first, second = trigger[:30], trigger[30:]
+    for fragment in (Frame(OP_TEXT, first, fin=False), Frame(OP_CONT, second)):
+        meter.observe(wire.Direction.received, False, fragment)
+        meter.observe(wire.Direction.received, True, fragment)
+    meter.observe(wire.Direction.sent, True, Frame(OP_TEXT, b'[3,"1",{}]'))
+    meter.observe(wire.Direction.sent, False, Frame(OP_TEXT, b'[3,"1",{}]'))
+    by_action = counters.stats("CP1")["by_action"]
+    assert by_action["sent"]["Heartbeat"]["raw"] == len(call)
+    assert by_action["sent"]["Heartbeat"]["wire"] == 10
+    assert by_action["received"]["Heartbeat"]["raw"] == len(reply)
+    assert by_action["received"]["TriggerMessage"]["raw"] == len(trigger)
+    assert by_action["sent"]["TriggerMessage"]["messages"] == 1
+    assert counters.stats()["total"]["sent"]["messages"] == 2
+
+
+def test_unknown_profiles_are_refused():
+    with pytest.raises(ValueError):
+        wire.profile("zstd")
+    assert wire.PROFILES["off"].connect_kwargs() == {"compression": None}
+
+
+async def csms(websocket):
+    async for message in websocket:
+        frame = json.loads(message)
+        if frame[0] == 2:
+            await websocket.send(json.dumps([3, frame[1], {}]))
+
+
+@pytest.mark.parametrize("compression", list(wire.PROFILES))
+def test_meter_values_are_measured_on_the_wire(compression):
+    charger_id = f"wire-{compression}"
+
+    async def scenario():
+        async with serve(csms, "127.0.0.1", 0, subprotocols=["ocpp1.6"]) as server:
+            port = server.sockets[0].getsockname()[1]
+            charger = controller.EVSE()
+            charger.create(charger_id, 1, "password")
+            charger.abstraction.compression = compression
+            charger.connection = await charger.create_ws_connection(
+                f"ws://127.0.0.1:{port}"
+            )
+            running = asyncio.create_task(charger.run())
+            while charger.handler is None:
+                await asyncio.sleep(0.01)
+            for current in range(20):
+                await charger.send_message_to_backend(
+                    Action.MeterValues, connector_id=1, current=current
+                )
+            running.cancel()
+            await charger.connection.close()
+            return charger.connection.compressed
+
+    compressed = asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert compressed == (compression != "off")
+    sent = wire.counters.stats(charger_id)["by_action"]["sent"]["MeterValues"]
+    received = wire.counters.stats(charger_id)["by_action"]["received"]
+    assert sent["messages"] == 20
+    assert received["MeterValues"]["messages"] == 20
+    if compressed:
+        assert sent["wire"] < sent["raw"] / 2
+    else:
+        assert sent["wire"] == sent["raw"]
@@ -0,0 +1,124 @@
+import math
+from collections import Counter, deque
+from typing import Deque, Dict
+
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_FLOOR = 1.0
+DEFAULT_CEILING = 30.0
+DEFAULT_INITIAL = 10.0
+DEFAULT_PERCENTILE = 0.99
+DEFAULT_MARGIN = 0.5
+DEFAULT_WINDOW = 256
+MIN_SAMPLES = 10
+TIMEOUT_BACKOFF = 2.0
+
+
+class AdaptiveTimeouts:
+    """
+    Response timeouts per action, derived from the latency of recent responses.
+
+    The timeout of an action is a percentile of its last `window` latencies
+    plus a relative `margin`, clamped between `floor` and `ceiling`. Until an
+    action has `MIN_SAMPLES` latencies it gets the `initial` timeout.
+
+    A timed out Call never gets its latency observed, so each timeout counts
+    as a latency of `TIMEOUT_BACKOFF` times the timeout: when the CSMS gets
+    slower than the timeout, the timeout grows instead of expiring every Call.
+    """
+
+    def __init__(
+        self,
+        floor: float = DEFAULT_FLOOR,
+        ceiling: float = DEFAULT_CEILING,
+        initial: float = DEFAULT_INITIAL,
+        percentile: float = DEFAULT_PERCENTILE,
+        margin: float = DEFAULT_MARGIN,
+        window: int = DEFAULT_WINDOW,
+    ):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.initial = initial
+        self.percentile = percentile
+        self.margin = margin
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._timeouts: Dict[str, float] = {}
+        self._estimates: Dict[str, float] = {}
+        self.responses: Counter = Counter()
+        self.slow_responses: Counter = Counter()
+        self.timeouts: Counter = Counter()
+
+    def timeout_for(self, action: str) -> float:
+        try:
+            return self._timeouts[action]
+        except KeyError:
+            pass
+        latencies = self._latencies.get(action, ())
+        if len(latencies) < MIN_SAMPLES:
+            timeout = self.initial
+        else:
+            timeout = self.estimate(action) * (1 + self.margin)
+        timeout = min(max(timeout, self.floor), self.ceiling)
+        self._timeouts[action] = timeout
+        return timeout
+
+    def estimate(self, action: str) -> float:
+        """The configured percentile of the latencies seen for an action."""
+        try:
+            return self._estimates[action]
+        except KeyError:
+            pass
+        latencies = sorted(self._latencies.get(action, ()))
+        if not latencies:
+            return 0.0
+        rank = math.ceil(self.percentile * len(latencies)) - 1
+        self._estimates[action] = latencies[max(rank, 0)]
+        return self._estimates[action]
+
+    def observe(self, action: str, latency: float):
+        latencies = self._latencies.get(action)
+        if latencies is None:
+            latencies = self._latencies[action] = deque(maxlen=self.window)
+        # a response slower than what we would expect without the margin
+        # still made it in time, but is worth knowing about
+        if len(latencies) >= MIN_SAMPLES and latency > self.estimate(action):
+            self.slow_responses[action] += 1
+        latencies.append(latency)
+        self.responses[action] += 1
+        self._estimates.pop(action, None)
+        self._timeouts.pop(action, None)
+
+    def record_timeout(self, action: str):
+        timeout = self.timeout_for(action)
+        self.timeouts[action] += 1
+        logger.debug("Timeout for %s after %ss", action, timeout)
+        latencies = self._latencies.get(action)
+        if latencies is None:
+            latencies = self._latencies[action] = deque(maxlen=self.window)
+        # the response takes at least the timeout, likely longer
+        latencies.append(timeout * TIMEOUT_BACKOFF)
+        self._estimates.pop(action, None)
+        self._timeouts.pop(action, None)
+
+    def configure(self, floor: float, ceiling: float):
+        if floor > ceiling:
+            raise ValueError(f"floor {floor} is above ceiling {ceiling}")
+        self.floor = floor
+        self.ceiling = ceiling
+        self._timeouts.clear()
+
+    def stats(self) -> Dict[str, Dict]:
+        actions = set(self._latencies) | set(self.timeouts)
+        return {
+            action: {
+                "timeout": self.timeout_for(action),
+                "estimate": self.estimate(action),
+                "responses": self.responses[action],
+                "slow_responses": self.slow_responses[action],
+                "timeouts": self.timeouts[action],
+            }
+            for action in actions
+        }
@@ -0,0 +1,58 @@
+from typing import Dict, Optional, Set, Tuple
+
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+ConnectorKey = Tuple[str, int]
+"""(charger id, connector id)"""
+
+
+class TransactionIndex:
+    """
+    Lookup of ongoing transactions for every charger in the process.
+
+    Transactions are indexed by the transactionId the CSMS assigned and by
+    the idTag that started them, so Calls that only carry one of those
+    (RemoteStopTransaction, StopTransaction, ...) can find their connector
+    without going through every charger. A tag can be charging on several
+    connectors at once.
+    """
+
+    def __init__(self):
+        self.by_transaction_id: Dict[int, ConnectorKey] = {}
+        self.by_id_tag: Dict[str, Set[ConnectorKey]] = {}
+
+    def __len__(self):
+        return len(self.by_transaction_id)
+
+    def add(
+        self,
+        charger_id: str,
+        connector_id: int,
+        transaction_id: int,
+        id_tag: Optional[str] = None,
+    ):
+        key = (charger_id, connector_id)
+        self.by_transaction_id[transaction_id] = key
+        if id_tag is not None:
+            self.by_id_tag.setdefault(id_tag, set()).add(key)
+        logger.debug("Indexed transaction %s on %s", transaction_id, key)
+
+    def remove(self, transaction_id: int, id_tag: Optional[str] = None):
+        key = self.by_transaction_id.pop(transaction_id, None)
+        if id_tag is None or id_tag not in self.by_id_tag:
+            return
+        keys = self.by_id_tag[id_tag]
+        keys.discard(key)
+        if not keys:
+            del self.by_id_tag[id_tag]
+
+    def find_by_transaction_id(self, transaction_id: int) -> Optional[ConnectorKey]:
+        return self.by_transaction_id.get(transaction_id)
+
+    def find_by_id_tag(self, id_tag: str) -> Set[ConnectorKey]:
+        return set(self.by_id_tag.get(id_tag, ()))
+
+
+index = TransactionIndex()
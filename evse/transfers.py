@@ -0,0 +1,180 @@
+"""
+Streaming HTTP transfers for diagnostics and firmware.
+
+Files are never held in memory: uploads are sent with chunked transfer
+encoding from a chunk iterator and downloads are read `CHUNK_SIZE` bytes at
+a time, so a transfer costs one chunk however large the file is.
+
+Only `http` and `https` locations are supported, which is what the local
+file server (see `file_server.py`) stands in for.
+"""
+import asyncio
+import hashlib
+import itertools
+from typing import AsyncIterator, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from structlog import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+DIAGNOSTICS_SIZE = 1024 * 1024
+
+
+class TransferError(Exception):
+    pass
+
+
+def diagnostics_chunks(
+    charger_id: str, size: int = DIAGNOSTICS_SIZE, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Synthetic diagnostics log of `size` bytes, produced chunk by chunk."""
+    lines = (
+        f"{number:010d} {charger_id} diagnostics line\n".encode()
+        for number in itertools.count()
+    )
+    sent = 0
+    buffer = bytearray()
+    while sent < size:
+        while len(buffer) < chunk_size:
+            buffer += next(lines)
+        chunk = bytes(buffer[: min(chunk_size, size - sent)])
+        del buffer[: len(chunk)]
+        sent += len(chunk)
+        yield chunk
+
+
+async def _open(url: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, str]:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise TransferError(f"Unsupported location {url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=parts.scheme == "https" or None
+    )
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    return reader, writer, path
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, dict]:
+    status_line = await reader.readline()
+    try:
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise TransferError(f"Bad status line {status_line!r}")
+    return status, await read_headers(reader)
+
+
+async def read_headers(reader: asyncio.StreamReader) -> dict:
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+async def _close(writer: asyncio.StreamWriter):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        # the peer may have reset the connection, it is closed either way
+        pass
+
+
+def _size(text: bytes, base: int = 10) -> int:
+    try:
+        size = int(text, base)
+    except ValueError:
+        raise TransferError(f"Bad body size {text!r}")
+    if size < 0:
+        raise TransferError(f"Bad body size {text!r}")
+    return size
+
+
+async def read_body(
+    reader: asyncio.StreamReader, headers: dict, chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """The body of a response, raises a TransferError if its framing is bad."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while size := _size((await reader.readline()).split(b";")[0], 16):
+            while size:
+                chunk = await reader.readexactly(min(size, chunk_size))
+                size -= len(chunk)
+                yield chunk
+            await reader.readline()
+        await reader.readline()
+        return
+    if "content-length" in headers:
+        remaining = _size(headers["content-length"].encode("latin-1"))
+        while remaining:
+            chunk = await reader.readexactly(min(remaining, chunk_size))
+            remaining -= len(chunk)
+            yield chunk
+        return
+    while chunk := await reader.read(chunk_size):
+        yield chunk
+
+
+async def upload(url: str, chunks: Iterator[bytes]) -> int:
+    """PUT `chunks` to `url`, returns the number of bytes sent."""
+    reader, writer, path = await _open(url)
+    sent = 0
+    try:
+        writer.write(
+            f"PUT {path} HTTP/1.1\r\nHost: {urlsplit(url).netloc}\r\n"
+            "Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode()
+        )
+        for chunk in chunks:
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            sent += len(chunk)
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        status, _ = await _read_head(reader)
+    finally:
+        await _close(writer)
+    if not 200 <= status < 300:
+        raise TransferError(f"Upload to {url} failed with {status}")
+    logger.debug("Uploaded %s bytes to %s", sent, url)
+    return sent
+
+
+async def download(url: str, chunk_size: int = CHUNK_SIZE) -> Tuple[int, str]:
+    """GET `url` without keeping it, returns its size and sha256."""
+    reader, writer, path = await _open(url)
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {urlsplit(url).netloc}\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status, headers = await _read_head(reader)
+        if status != 200:
+            raise TransferError(f"Download of {url} failed with {status}")
+        async for chunk in read_body(reader, headers, chunk_size):
+            digest.update(chunk)
+            received += len(chunk)
+    except asyncio.IncompleteReadError as error:
+        raise TransferError(f"Download of {url} was cut short") from error
+    finally:
+        await _close(writer)
+    logger.debug("Downloaded %s bytes from %s", received, url)
+    return received, digest.hexdigest()
+
+
+async def with_retries(transfer, retries: Optional[int], retry_interval: Optional[int]):
+    """Await `transfer()` up to `retries` more times when it fails."""
+    for attempt in range((retries or 0) + 1):
+        if attempt:
+            await asyncio.sleep(retry_interval or 0)
+        try:
+            return await transfer()
+        except (OSError, TransferError) as error:
+            logger.info("Transfer attempt %s failed: %s", attempt + 1, error)
+    raise TransferError(f"Transfer failed after {attempt + 1} attempts")
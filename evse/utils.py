@@ -1,5 +1,7 @@
 import functools
+from datetime import datetime, timezone
 from enum import Enum
+from typing import Any, Tuple
 
 from structlog import get_logger
 
@@ -42,20 +44,32 @@ def handler(action, handler: HandlerType):
     return decorator
 
 
-def create_route_map(obj, handler: HandlerType):
+@functools.lru_cache(maxsize=None)
+def _routes(cls: type, handler: HandlerType, known: int) -> Tuple[Tuple[Any, str], ...]:
     routes = {}
-    for attr_name in routables:
-        try:
-            attr = getattr(obj, attr_name)
-            action = getattr(attr, str(handler))
-
-            if action not in routes:
-                routes[action] = {}
-            routes[action] = attr
-
-        except AttributeError:
-            continue
-    logger.debug(
-        f"Routes for {obj.__class__.__name__}.{handler.value} are {[str(route) for route in routes]}"
-    )
-    return routes
+    for attr_name in routables[:known]:
+        attr = getattr(cls, attr_name, None)
+        action = getattr(attr, str(handler), None)
+        if action is not None:
+            routes[action] = attr_name
+    logger.debug("Routes for %s.%s are %s", cls.__name__, handler.value, list(routes))
+    return tuple(routes.items())
+
+
+def create_route_map(obj, handler: HandlerType):
+    """
+    Bound methods of `obj` by the action they handle. Routes are looked up
+    once per class, and again only when more handlers were declared since.
+    """
+    return {
+        action: getattr(obj, attr_name)
+        for action, attr_name in _routes(type(obj), handler, len(routables))
+    }
+
+
+def timestamp_from_iso(date: str) -> float:
+    """Timestamp of an OCPP date, which is UTC when it has no offset."""
+    parsed = datetime.fromisoformat(date)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
@@ -0,0 +1,254 @@
+"""
+Websocket compression and the bytes chargers send and receive.
+
+A fleet behind one uplink can trade CPU for bandwidth with permessage-deflate.
+A `CompressionProfile` sets whether it is offered to the CSMS and how hard
+it compresses:
+
+- `off`, no compression;
+- `default`, what websockets offers unless told otherwise;
+- `light`, the fastest level, for hosts short on CPU;
+- `small`, a small window and hash table, for hosts with many connections;
+- `bandwidth`, the best level and the largest window, for thin uplinks.
+
+`python -m benchmarks.bench_wire` compares them on MeterValues traffic.
+
+A charger connects with its `compression` profile, `EVSE_COMPRESSION` unless
+provisioned otherwise. Its connection measures every message before and
+after compression, whether deflate was negotiated or not, and `counters`
+adds them up by charger, direction and action.
+"""
+import os
+import re
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from websockets.client import WebSocketClientProtocol
+from websockets.extensions.base import Extension
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+from websockets.frames import OP_CONT, OP_TEXT, Frame, Opcode
+
+DEFAULT_PROFILE = os.getenv("EVSE_COMPRESSION", "default")
+HEADER_BYTES = 128
+"""HEADER_BYTES: enough of a frame to read its message type, id and action"""
+MAX_OPEN_CALLS = 1024
+HEADER = re.compile(rb'\[\s*(\d)\s*,\s*"((?:[^"\\]|\\.)*)"\s*(?:,\s*"(\w+)")?')
+
+
+@dataclass(frozen=True)
+class CompressionProfile:
+    name: str
+    deflate: bool = True
+    level: int = -1
+    """level: zlib compression level, -1 for zlib's default"""
+    mem_level: int = 5
+    client_max_window_bits: Optional[int] = None
+    server_max_window_bits: Optional[int] = None
+
+    @property
+    def memory(self) -> int:
+        """Bytes zlib needs to compress a connection's messages."""
+        if not self.deflate:
+            return 0
+        window_bits = self.client_max_window_bits or 15
+        return (1 << (window_bits + 2)) + (1 << (self.mem_level + 9))
+
+    def connect_kwargs(self) -> Dict[str, Any]:
+        """Arguments of `websockets.client.connect` offering this profile."""
+        if not self.deflate:
+            return {"compression": None}
+        factory = ClientPerMessageDeflateFactory(
+            server_max_window_bits=self.server_max_window_bits,
+            client_max_window_bits=self.client_max_window_bits or True,
+            compress_settings={"level": self.level, "memLevel": self.mem_level},
+        )
+        return {"compression": None, "extensions": [factory]}
+
+
+PROFILES: Dict[str, CompressionProfile] = {
+    profile.name: profile
+    for profile in (
+        CompressionProfile("off", deflate=False),
+        CompressionProfile("default"),
+        CompressionProfile("light", level=1),
+        CompressionProfile("small", mem_level=4, client_max_window_bits=10),
+        CompressionProfile("bandwidth", level=9, mem_level=9),
+    )
+}
+
+
+def profile(name: str) -> CompressionProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression profile {name}, one of {list(PROFILES)}")
+
+
+class Direction(str, Enum):
+    sent = "sent"
+    received = "received"
+
+
+@dataclass
+class ByteCount:
+    messages: int = 0
+    raw: int = 0
+    wire: int = 0
+    """wire: payload bytes on the connection, after compression"""
+
+    def add(self, other: "ByteCount"):
+        self.messages += other.messages
+        self.raw += other.raw
+        self.wire += other.wire
+
+    def stats(self) -> Dict[str, Any]:
+        return {**asdict(self), "ratio": self.wire / self.raw if self.raw else None}
+
+
+class ByteCounters:
+    def __init__(self):
+        self.counts: Dict[Tuple[str, Direction, str], ByteCount] = {}
+
+    def record(
+        self, charger_id: str, direction: Direction, action: str, raw: int, wire: int
+    ):
+        key = (charger_id, direction, action)
+        count = self.counts.get(key)
+        if count is None:
+            count = self.counts[key] = ByteCount()
+        count.messages += 1
+        count.raw += raw
+        count.wire += wire
+
+    def clear(self):
+        self.counts.clear()
+
+    def total(
+        self, charger_id: Optional[str] = None, by_charger: bool = False
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Counts by direction, then by action or by charger."""
+        totals: Dict[Direction, Dict[str, ByteCount]] = {
+            direction: {} for direction in Direction
+        }
+        for (charger, direction, action), count in self.counts.items():
+            if charger_id is not None and charger != charger_id:
+                continue
+            key = charger if by_charger else action
+            totals[direction].setdefault(key, ByteCount()).add(count)
+        return {
+            direction.value: {key: count.stats() for key, count in counts.items()}
+            for direction, counts in totals.items()
+        }
+
+    def stats(
+        self, charger_id: Optional[str] = None, by_charger: bool = False
+    ) -> Dict[str, Any]:
+        summary = {}
+        for direction in Direction:
+            count = ByteCount()
+            for (charger, counted, _), value in self.counts.items():
+                if counted is direction and charger_id in (None, charger):
+                    count.add(value)
+            summary[direction.value] = count.stats()
+        by = "by_charger" if by_charger else "by_action"
+        return {"total": summary, by: self.total(charger_id, by_charger)}
+
+
+counters = ByteCounters()
+
+
+class MessageMeter:
+    """
+    Sizes of the messages of one connection, before and after compression.
+
+    A message is complete once its last frame went through both stages: the
+    raw stage then the wire stage when sending, the other way around when
+    receiving. CallResults and CallErrors get the action of their Call.
+    """
+
+    def __init__(self, charger_id: str, counters: ByteCounters = counters):
+        self.charger_id = charger_id
+        self.counters = counters
+        self._raw = {direction: 0 for direction in Direction}
+        self._wire = {direction: 0 for direction in Direction}
+        self._header = {direction: b"" for direction in Direction}
+        self._calls: OrderedDict[Tuple[Direction, str], str] = OrderedDict()
+        """_calls: actions of the Calls waiting for a reply, by direction and id"""
+
+    def observe(self, direction: Direction, raw: bool, frame: Frame):
+        if frame.opcode not in (OP_CONT, OP_TEXT, Opcode.BINARY):
+            return
+        if raw:
+            if frame.opcode is not OP_CONT:
+                self._header[direction] = bytes(frame.data[:HEADER_BYTES])
+            self._raw[direction] += len(frame.data)
+        else:
+            self._wire[direction] += len(frame.data)
+        last_stage = raw if direction is Direction.received else not raw
+        if frame.fin and last_stage:
+            self.complete(direction)
+
+    def complete(self, direction: Direction):
+        raw, wire = self._raw[direction], self._wire[direction]
+        self._raw[direction] = self._wire[direction] = 0
+        self.counters.record(
+            self.charger_id, direction, self.action(direction), raw, wire
+        )
+
+    def action(self, direction: Direction) -> str:
+        match = HEADER.match(self._header[direction])
+        if match is None:
+            return ""
+        message_type, unique_id, action = match.groups()
+        unique_id = unique_id.decode(errors="replace")
+        if message_type == b"2" and action is not None:
+            action = action.decode()
+            self._calls[(direction, unique_id)] = action
+            if len(self._calls) > MAX_OPEN_CALLS:
+                # the oldest Calls were never replied to
+                self._calls.popitem(last=False)
+            return action
+        replied = Direction.received if direction is Direction.sent else Direction.sent
+        return self._calls.pop((replied, unique_id), "")
+
+
+class _Stage(Extension):
+    name = "x-evse-meter"
+
+    def __init__(self, meter: MessageMeter, raw: bool):
+        self.meter = meter
+        self.raw = raw
+
+    def encode(self, frame: Frame) -> Frame:
+        self.meter.observe(Direction.sent, self.raw, frame)
+        return frame
+
+    def decode(self, frame: Frame, *, max_size: Optional[int] = None) -> Frame:
+        self.meter.observe(Direction.received, self.raw, frame)
+        return frame
+
+
+class MeteredClientProtocol(WebSocketClientProtocol):
+    """A client connection measuring its messages around its extensions."""
+
+    def __init__(self, *, meter: MessageMeter, **kwargs):
+        super().__init__(**kwargs)
+        self.meter = meter
+
+    async def handshake(self, *args, **kwargs):
+        await super().handshake(*args, **kwargs)
+        # extensions encode in order and decode in reverse order
+        self.extensions: List[Extension] = [
+            _Stage(self.meter, raw=True),
+            *self.extensions,
+            _Stage(self.meter, raw=False),
+        ]
+
+    @property
+    def compressed(self) -> bool:
+        return any(
+            extension.name == ClientPerMessageDeflateFactory.name
+            for extension in self.extensions
+        )